@@ -1,33 +1,63 @@
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 import subprocess
 import sys
 import os
 
-# 创建 Celery 应用
-app = Celery(
-    'code_runner',
-    broker='redis://redis:6379/0',  # 使用 Redis 作为消息代理
-    backend='redis://redis:6379/0',  # 使用 Redis 存储结果
-    include=['tasks']  # 包含任务模块
-)
+# 本地模式（CELERY_LOCAL=1）：使用内存队列，任务在调用进程中同步执行，无需Redis，用于本地调试和测试
+LOCAL_MODE = os.environ.get('CELERY_LOCAL') == '1'
 
-# 备用配置：使用内存队列（无 Redis 时使用）
-# app = Celery(
-#     'code_runner',
-#     broker='memory://',  # 内存消息代理
-#     backend='cache+memory://',  # 内存结果存储
-#     include=['tasks']
-# )
+if LOCAL_MODE:
+    app = Celery(
+        'code_runner',
+        broker='memory://',  # 内存消息代理
+        backend='cache+memory://',  # 内存结果存储
+        include=['tasks']
+    )
+else:
+    # 创建 Celery 应用
+    app = Celery(
+        'code_runner',
+        broker='redis://redis:6379/0',  # 使用 Redis 作为消息代理
+        backend='redis://redis:6379/0',  # 使用 Redis 存储结果
+        include=['tasks']  # 包含任务模块
+    )
 
 # 配置 Celery
 app.conf.update(
     result_expires=3600,  # 结果过期时间
     task_serializer='json',
     accept_content=['json'],
-    result_serializer='json',
+    result_serializer='json',  # 大体积的回测结果单独以二进制格式存储，结果中只有清单（见result_store.py）
     timezone='Asia/Shanghai',
     enable_utc=True,
+    # 每个worker额外监听自己的专属队列，参数扫描按数据位置把子任务发往指定worker（见sweep.py）
+    worker_direct=True,
+    task_always_eager=LOCAL_MODE,
+    task_eager_propagates=LOCAL_MODE,
 )
 
+
+def redis_client():
+    """结果后端为Redis时返回其连接（用于发布输出、存储结果等），否则返回None"""
+    if LOCAL_MODE:
+        return None
+    from celery.backends.redis import RedisBackend
+    
+    return app.backend.client if isinstance(app.backend, RedisBackend) else None
+
+
+@worker_init.connect
+@worker_process_init.connect
+def preload_sdk(**kwargs):
+    """
+    worker启动时预先导入QWeSDK及其依赖，任务从预热的进程fork子进程执行（见sandbox.py）
+    
+    gevent/solo池在worker主进程中预加载，prefork池在每个子进程初始化时预加载
+    """
+    import sandbox
+    sandbox.preload()
+
+
 if __name__ == '__main__':
     app.start()
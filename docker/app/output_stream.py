@@ -0,0 +1,194 @@
+"""
+任务输出流
+
+sandbox.run的on_output回调，用于在任务运行过程中转发用户代码的输出：
+- 每个输出流（stdout/stderr）只保留最近的一段（环形缓冲区，超出容量时丢弃最早的输出），
+  无论用户代码打印多少，worker内存占用都是固定的，最终结果中也只包含保留的部分
+- 输出按块（不超过CHUNK_CHARS个字符或每PUBLISH_INTERVAL秒一次）发布到Redis频道
+  run_code:output:<任务ID>，客户端订阅该频道可以实时看到完整输出
+- 每PROGRESS_INTERVAL秒调用一次task.update_state(state='PROGRESS')，
+  结果后端中保存已输出的行数、字符数和最近的输出，客户端轮询AsyncResult.info即可查看进度
+- 用户代码没有新输出时，sandbox.run通过on_idle回调调用tick，
+  已缓冲的输出和进度仍按间隔发布，不会等到下一次输出
+"""
+import collections
+import json
+import os
+import time
+
+# 每个输出流保留的最大字符数
+BUFFER_CHARS = int(os.environ.get('OUTPUT_BUFFER_KB', '1024')) * 1024
+# 进度更新中包含的最近输出字符数
+TAIL_CHARS = 4096
+# 发布到Redis的单个消息的最大字符数
+CHUNK_CHARS = 16384
+# 发布间隔和进度更新间隔（秒）
+PUBLISH_INTERVAL = float(os.environ.get('OUTPUT_PUBLISH_INTERVAL', '0.2'))
+PROGRESS_INTERVAL = float(os.environ.get('OUTPUT_PROGRESS_INTERVAL', '1.0'))
+# Redis频道前缀
+CHANNEL_PREFIX = 'run_code:output:'
+
+
+class RingBuffer:
+    """按字符数限制容量的文本环形缓冲区"""
+
+    def __init__(self, capacity=BUFFER_CHARS):
+        self.capacity = capacity
+        self.chunks = collections.deque()
+        self.size = 0
+        # 被丢弃的字符数
+        self.dropped = 0
+
+    def append(self, text):
+        self.chunks.append(text)
+        self.size += len(text)
+        while self.size > self.capacity:
+            excess = self.size - self.capacity
+            head = self.chunks[0]
+            if len(head) <= excess:
+                self.chunks.popleft()
+                removed = len(head)
+            else:
+                self.chunks[0] = head[excess:]
+                removed = excess
+            self.size -= removed
+            self.dropped += removed
+
+    def tail(self, chars):
+        """最近的chars个字符"""
+        parts = []
+        count = 0
+        for chunk in reversed(self.chunks):
+            parts.append(chunk)
+            count += len(chunk)
+            if count >= chars:
+                break
+        return ''.join(reversed(parts))[-chars:]
+
+    def getvalue(self):
+        """保留的全部内容，有内容被丢弃时在开头注明"""
+        text = ''.join(self.chunks)
+        if self.dropped:
+            text = f"...[已省略前 {self.dropped} 个字符]...\n" + text
+        return text
+
+
+class OutputStream:
+    """
+    任务输出流，作为sandbox.run的on_output回调使用
+
+    用法:
+    stream = OutputStream(task, program_id, redis=redis_client())
+    result = sandbox.run(code, env, on_output=stream, on_idle=stream.tick)
+    stream.close(result['returncode'])
+    stdout, stderr = stream.getvalue('stdout'), stream.getvalue('stderr')
+    """
+
+    def __init__(self, task, program_id, redis=None, buffer_chars=BUFFER_CHARS):
+        self.task = task
+        self.program_id = program_id
+        self.task_id = task.request.id
+        self.buffers = {'stdout': RingBuffer(buffer_chars), 'stderr': RingBuffer(buffer_chars)}
+        self.lines = {'stdout': 0, 'stderr': 0}
+        self.chars = {'stdout': 0, 'stderr': 0}
+        self.start = time.monotonic()
+
+        # 发布输出用的Redis连接，为None或设置了OUTPUT_PUBSUB=0时不发布
+        self.redis = redis if self.task_id and os.environ.get('OUTPUT_PUBSUB', '1') != '0' else None
+        self.channel = f"{CHANNEL_PREFIX}{self.task_id}"
+        # 待发布的输出：[(stream, text)]，相邻的同一流的输出会合并
+        self.pending = []
+        self.pending_chars = 0
+        # 已发布消息的序号，客户端可以据此发现丢失的消息
+        self.seq = 0
+        self.last_publish = self.start
+        self.last_progress = self.start
+
+    def __call__(self, stream, text):
+        self.write(stream, text)
+
+    def write(self, stream, text):
+        """记录一段输出，到达间隔时发布和更新进度"""
+        self.buffers[stream].append(text)
+        self.lines[stream] += text.count('\n')
+        self.chars[stream] += len(text)
+
+        if self.redis is not None:
+            if self.pending and self.pending[-1][0] == stream:
+                self.pending[-1] = (stream, self.pending[-1][1] + text)
+            else:
+                self.pending.append((stream, text))
+            self.pending_chars += len(text)
+
+        now = time.monotonic()
+        if self.pending_chars >= CHUNK_CHARS or now - self.last_publish >= PUBLISH_INTERVAL:
+            self.flush()
+        if now - self.last_progress >= PROGRESS_INTERVAL:
+            self.update_progress()
+
+    def tick(self):
+        """没有新输出时调用（sandbox.run的on_idle回调），到达间隔时发布待发布的输出和更新进度"""
+        now = time.monotonic()
+        if self.pending and now - self.last_publish >= PUBLISH_INTERVAL:
+            self.flush()
+        if now - self.last_progress >= PROGRESS_INTERVAL:
+            self.update_progress()
+
+    def _publish(self, message):
+        self.seq += 1
+        message['seq'] = self.seq
+        try:
+            self.redis.publish(self.channel, json.dumps(message, ensure_ascii=False))
+        except Exception as e:
+            # 发布失败不影响任务执行，之后不再发布
+            print(f"[WARNING] 发布任务输出失败，停止发布: {e}")
+            self.redis = None
+
+    def flush(self):
+        """发布待发布的输出（按CHUNK_CHARS切分）"""
+        self.last_publish = time.monotonic()
+        pending, self.pending, self.pending_chars = self.pending, [], 0
+        for stream, text in pending:
+            for i in range(0, len(text), CHUNK_CHARS):
+                if self.redis is None:
+                    return
+                self._publish({'stream': stream, 'text': text[i:i + CHUNK_CHARS]})
+
+    def progress(self):
+        """当前进度信息"""
+        return {
+            'program_id': self.program_id,
+            'task_id': self.task_id,
+            'elapsed': round(time.monotonic() - self.start, 3),
+            'lines': dict(self.lines),
+            'chars': dict(self.chars),
+            'seq': self.seq,
+            'channel': self.channel if self.redis is not None else None,
+            'stdout_tail': self.buffers['stdout'].tail(TAIL_CHARS),
+            'stderr_tail': self.buffers['stderr'].tail(TAIL_CHARS),
+        }
+
+    def update_progress(self):
+        """更新结果后端中的任务状态为PROGRESS"""
+        self.last_progress = time.monotonic()
+        if not self.task_id:
+            return
+        try:
+            self.task.update_state(state='PROGRESS', meta=self.progress())
+        except Exception as e:
+            print(f"[WARNING] 更新任务进度失败: {e}")
+
+    def close(self, returncode):
+        """发布剩余输出和结束消息"""
+        if self.redis is not None:
+            self.flush()
+        if self.redis is not None:
+            self._publish({'event': 'end', 'returncode': returncode})
+
+    def getvalue(self, stream):
+        """某个输出流保留的内容"""
+        return self.buffers[stream].getvalue()
+
+    def truncated(self):
+        """每个输出流被丢弃的字符数"""
+        return {stream: buffer.dropped for stream, buffer in self.buffers.items()}
@@ -1,15 +1,26 @@
 #!/usr/bin/env python3
 """
 QWeSDK 版本检测和安装脚本
-自动检测当前安装的版本与本地包版本是否一致，不一致则重新安装
+自动检测本地包的内容是否与上次安装的一致，不一致则重新安装
+
+已安装的版本通过 importlib.metadata 读取，本地包内容的sha256和安装的版本记录在标记文件中；
+本地包的大小和修改时间没有变化时直接使用标记文件中的哈希值，不读取本地包，
+常见情况（无需重新安装）下不启动任何pip子进程；
+没有标记文件（如镜像中已预装QWeSDK）时，已安装版本与本地包版本号相同即视为一致，补写标记文件
 """
 
+import hashlib
+import json
 import os
 import re
 import subprocess
 import sys
+from importlib import invalidate_caches, metadata
 from pathlib import Path
 
+# 安装标记文件，位于当前Python环境中（与安装的包一起随容器保留）
+MARKER_PATH = Path(os.environ.get('QWESDK_INSTALL_MARKER', Path(sys.prefix) / 'qwesdk_install.json'))
+
 
 def extract_version_from_filename(filename):
     """从文件名中提取版本号"""
@@ -21,26 +32,66 @@ def extract_version_from_filename(filename):
 
 def get_installed_version():
     """获取已安装的QWeSDK版本"""
+    invalidate_caches()
     try:
-        result = subprocess.run(
-            ['pip', 'show', 'qwesdk'],
-            capture_output=True,
-            text=True
-        )
-        if result.returncode == 0:
-            for line in result.stdout.split('\n'):
-                if line.startswith('Version:'):
-                    return line.split(':')[1].strip()
-    except Exception:
-        pass
-    return None
+        return metadata.version('qwesdk')
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def read_marker():
+    """读取安装标记，不存在或损坏时返回空字典"""
+    try:
+        with open(MARKER_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_marker(marker):
+    """写入安装标记（先写临时文件再替换），返回是否成功"""
+    tmp_path = MARKER_PATH.with_name(MARKER_PATH.name + '.tmp')
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(marker, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, MARKER_PATH)
+        return True
+    except OSError as e:
+        print(f"写入安装标记失败: {e}")
+        print(f"  标记文件 {MARKER_PATH} 不可写，之后每次启动都无法确认本地包是否变化，"
+              f"已安装版本与本地包版本号不同时每次都会重新安装（可通过 QWESDK_INSTALL_MARKER 指定可写路径）")
+        return False
+
+
+def package_fingerprint(package_path, marker):
+    """
+    本地包的指纹：文件名、大小、修改时间和内容sha256
+
+    大小和修改时间与标记中记录的一致时沿用标记中的sha256，否则重新计算
+    """
+    stat = package_path.stat()
+    fingerprint = {
+        'package': package_path.name,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+    if all(marker.get(key) == value for key, value in fingerprint.items()) and marker.get('sha256'):
+        fingerprint['sha256'] = marker['sha256']
+        return fingerprint
+
+    digest = hashlib.sha256()
+    with open(package_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    fingerprint['sha256'] = digest.hexdigest()
+    return fingerprint
 
 
 def install_package(package_path):
     """安装QWeSDK包"""
     print(f"安装新版本: {package_path}")
     result = subprocess.run(
-        ['pip', 'install', '--no-cache-dir', package_path],
+        [sys.executable, '-m', 'pip', 'install', '--no-cache-dir', package_path],
         capture_output=True,
         text=True
     )
@@ -52,14 +103,14 @@ def install_package(package_path):
         return False
 
 
-def main():
+def main(app_dir='/app'):
     """主函数"""
     print("=" * 60)
     print("QWeSDK 版本检测和安装")
     print("=" * 60)
 
     # 查找本地QWeSDK包
-    app_dir = Path('/app')
+    app_dir = Path(app_dir)
     package_files = list(app_dir.glob('qwesdk-*.tar.gz'))
 
     if not package_files:
@@ -75,23 +126,34 @@ def main():
     print(f"本地包: {local_package.name}")
     print(f"本地版本: {local_version}")
 
-    # 获取已安装版本
+    # 获取已安装版本和上次安装的包内容
     installed_version = get_installed_version()
     print(f"已安装版本: {installed_version}")
+    marker = read_marker()
+    fingerprint = package_fingerprint(local_package, marker)
 
-    # 版本检测
-    if installed_version == local_version:
-        print("\n✓ 版本一致，无需重新安装")
+    # 没有标记文件（镜像中预装、标记文件不可写等）且已安装版本与本地包版本号相同时，补写标记，无需重新安装
+    if not marker.get('sha256') and installed_version and installed_version == local_version:
+        print("\n✓ 已安装版本与本地包一致，无需重新安装")
+        print(f"当前版本: {installed_version}")
+        write_marker(dict(fingerprint, version=installed_version))
+    # 本地包内容与上次安装的一致，且该版本仍然已安装时无需重新安装
+    elif fingerprint['sha256'] == marker.get('sha256') and installed_version and installed_version == marker.get('version'):
+        print("\n✓ 本地包未变化，无需重新安装")
         print(f"当前版本: {installed_version}")
+        # 内容相同但修改时间变化（如重新复制），更新标记，下次启动不再计算哈希
+        if fingerprint['mtime_ns'] != marker.get('mtime_ns'):
+            write_marker(dict(fingerprint, version=installed_version))
     else:
-        print("\n⚠ 版本不一致，需要重新安装")
+        print("\n⚠ 本地包已变化或未安装，需要重新安装")
         print(f"  本地版本: {local_version}")
         print(f"  已安装版本: {installed_version or '无'}")
+        print(f"  本地包sha256: {fingerprint['sha256'][:16]}，上次安装: {(marker.get('sha256') or '无')[:16]}")
 
         # 卸载旧版本（如果存在）
         if installed_version:
             print("\n卸载旧版本...")
-            subprocess.run(['pip', 'uninstall', '-y', 'qwesdk'], capture_output=True)
+            subprocess.run([sys.executable, '-m', 'pip', 'uninstall', '-y', 'qwesdk'], capture_output=True)
 
         # 安装新版本
         print("\n安装新版本...")
@@ -99,6 +161,7 @@ def main():
             print("\n✓ 版本更新完成!")
             new_version = get_installed_version()
             print(f"当前版本: {new_version}")
+            write_marker(dict(fingerprint, version=new_version))
         else:
             print("\n✗ 版本更新失败!")
             return False
@@ -0,0 +1,243 @@
+"""
+任务结果存储
+
+回测结果（资金曲线、成交、持仓等）体积较大，不适合放进JSON结果后端。
+用户代码在沙箱子进程中调用 save_result(name, value) 保存结果：
+- DataFrame/Series/ndarray/记录列表 以Arrow IPC（zstd压缩）格式保存，列式存储，保留数据类型
+- 其他较大的对象以msgpack序列化后zlib压缩保存
+- 标量和较短的字符串直接放在清单中
+
+子进程把结果写入本地目录，任务结束后父进程把文件上传到Redis（设置过期时间）或保留为文件，
+任务结果中只包含一个小的JSON清单，记录每个结果的格式、位置和大小，客户端用 load_results 读取
+"""
+import io
+import json
+import os
+import re
+import shutil
+import zlib
+
+# 存储方式：redis（上传到结果后端所在的Redis）或 file（保留在RESULT_STORE_DIR中）
+BACKEND = os.environ.get('RESULT_STORE', 'redis')
+# 结果文件目录
+STORE_DIR = os.environ.get('RESULT_STORE_DIR', '/tmp/qwesdk_results')
+# 结果保留时间（秒），与celery的result_expires一致
+TTL_SECONDS = int(os.environ.get('RESULT_STORE_TTL', '3600'))
+# Redis键前缀
+KEY_PREFIX = 'run_code:result:'
+# 直接放在清单中的字符串最大长度
+INLINE_CHARS = 256
+
+# 清单中记录每个结果的文件
+INDEX_FILE = 'index.jsonl'
+
+
+def _safe_name(name):
+    return re.sub(r'[^0-9A-Za-z_.\-]', '_', str(name))
+
+
+def _is_inline(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return True
+    return isinstance(value, str) and len(value) <= INLINE_CHARS
+
+
+def _msgpack_default(obj):
+    """msgpack不支持的类型的转换"""
+    import datetime
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (datetime.date, datetime.datetime, pd.Timestamp)):
+        return obj.isoformat()
+    if isinstance(obj, pd.DataFrame):
+        return obj.to_dict('records')
+    if isinstance(obj, pd.Series):
+        return obj.to_dict()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+def _to_table(value):
+    """转换为Arrow表，不适合列式存储时返回 (None, None)"""
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+
+    if isinstance(value, pd.Series):
+        return pa.Table.from_pandas(value.to_frame(name=value.name if value.name is not None else 'value')), 'series'
+    if isinstance(value, pd.DataFrame):
+        return pa.Table.from_pandas(value), 'dataframe'
+    if isinstance(value, np.ndarray) and value.ndim == 1:
+        return pa.table({'value': value}), 'ndarray'
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        # 成交、委托等记录列表
+        return pa.Table.from_pylist(value), 'records'
+    return None, None
+
+
+def encode(value):
+    """
+    序列化一个结果
+
+    返回:
+    (数据, 元信息)，元信息包含format（arrow或msgpack）和kind（还原时的类型）
+    """
+    table, kind = None, None
+    try:
+        table, kind = _to_table(value)
+    except Exception:
+        # 列类型不一致等情况，改用msgpack
+        table = None
+
+    if table is not None:
+        import pyarrow as pa
+
+        sink = io.BytesIO()
+        options = pa.ipc.IpcWriteOptions(compression='zstd')
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        return sink.getvalue(), {'format': 'arrow', 'kind': kind, 'rows': table.num_rows}
+
+    import msgpack
+
+    data = zlib.compress(msgpack.packb(value, default=_msgpack_default), 6)
+    return data, {'format': 'msgpack', 'kind': type(value).__name__}
+
+
+def decode(data, meta):
+    """还原encode序列化的结果"""
+    if meta['format'] == 'arrow':
+        import pyarrow as pa
+
+        table = pa.ipc.open_file(pa.BufferReader(data)).read_all()
+        kind = meta.get('kind')
+        if kind == 'records':
+            return table.to_pylist()
+        if kind == 'ndarray':
+            return table.column('value').to_numpy()
+        df = table.to_pandas()
+        return df.iloc[:, 0] if kind == 'series' else df
+    if meta['format'] == 'msgpack':
+        import msgpack
+
+        return msgpack.unpackb(zlib.decompress(data), strict_map_key=False)
+    raise ValueError(f"不支持的结果格式: {meta['format']}")
+
+
+class ResultStore:
+    """
+    单个任务的结果存储
+
+    在父进程中创建，save_result放入用户代码的执行环境（在子进程中调用），
+    子进程结束后父进程调用finalize生成清单
+    """
+
+    def __init__(self, task_id, backend=BACKEND, store_dir=STORE_DIR):
+        self.task_id = task_id
+        self.backend = backend
+        self.directory = os.path.join(store_dir, _safe_name(task_id))
+        os.makedirs(self.directory, exist_ok=True)
+
+    def save_result(self, name, value, split=True):
+        """
+        保存一个结果（在用户代码中调用）
+
+        value为字典（如TraderV2.get_results()）且split为True时，每个键分别保存为 name.key，
+        可以只读取需要的部分；只拆分最外层
+        """
+        if split and isinstance(value, dict) and not all(_is_inline(item) for item in value.values()):
+            for key, item in value.items():
+                self.save_result(f"{name}.{key}", item, split=False)
+            return
+
+        name = _safe_name(name)
+        if _is_inline(value):
+            entry = {'name': name, 'format': 'inline', 'value': value}
+        else:
+            data, entry = encode(value)
+            filename = f"{name}.{entry['format']}"
+            with open(os.path.join(self.directory, filename), 'wb') as f:
+                f.write(data)
+            entry.update({'name': name, 'file': filename, 'bytes': len(data)})
+        with open(os.path.join(self.directory, INDEX_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+
+    def finalize(self, redis=None):
+        """
+        生成结果清单（父进程中调用）
+
+        参数:
+        redis: Redis客户端，存储方式为redis且不为None时上传结果文件并删除本地文件
+
+        返回:
+        清单字典，没有保存任何结果时返回None
+        """
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(index_path):
+            shutil.rmtree(self.directory, ignore_errors=True)
+            return None
+
+        artifacts = {}
+        with open(index_path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    artifacts[entry.pop('name')] = entry
+
+        upload = self.backend == 'redis' and redis is not None
+        for name, entry in artifacts.items():
+            if 'file' not in entry:
+                continue
+            path = os.path.join(self.directory, entry.pop('file'))
+            if upload:
+                key = f"{KEY_PREFIX}{self.task_id}:{name}"
+                with open(path, 'rb') as f:
+                    redis.set(key, f.read(), ex=TTL_SECONDS)
+                entry['key'] = key
+            else:
+                entry['path'] = path
+
+        if upload:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        else:
+            os.remove(index_path)
+        return {'backend': 'redis' if upload else 'file', 'artifacts': artifacts}
+
+
+def load_result(entry, redis=None):
+    """读取清单中的一个结果"""
+    if entry['format'] == 'inline':
+        return entry['value']
+    if 'key' in entry:
+        if redis is None:
+            raise ValueError("读取Redis中的结果需要提供redis客户端")
+        data = redis.get(entry['key'])
+        if data is None:
+            raise KeyError(f"结果已过期或不存在: {entry['key']}")
+    else:
+        with open(entry['path'], 'rb') as f:
+            data = f.read()
+    return decode(data, entry)
+
+
+def load_results(manifest, names=None, redis=None):
+    """
+    读取任务结果清单中的结果
+
+    参数:
+    manifest: 任务返回的 results 清单
+    names: 要读取的结果名列表，None表示全部
+    redis: Redis客户端（清单的backend为redis时需要）
+
+    返回:
+    结果名 -> 结果
+    """
+    artifacts = manifest['artifacts']
+    names = list(artifacts) if names is None else names
+    return {name: load_result(artifacts[name], redis) for name in names}
@@ -0,0 +1,229 @@
+"""
+用户代码沙箱
+
+worker启动时预先导入QWeSDK及其依赖（pandas、ibis、talib、lark、duckdb等），
+每个任务从这个已预热的进程fork出子进程执行用户代码：
+- 子进程继承已导入的模块，任务启动只需要一次fork，不需要重新导入
+- 子进程中设置内存和CPU时间限制，超限只会结束该子进程，不影响worker
+- 子进程的标准输出/标准错误通过管道实时传回父进程，可以边运行边转发
+- 子进程是新会话的首进程，用户代码创建的进程（进程池等）都在同一个进程组中，
+  子进程退出或超时后整个进程组被结束，不会残留进程或阻塞任务
+"""
+import codecs
+import os
+import resource
+import select
+import signal
+import sys
+import time
+import traceback
+
+# 预先导入的模块（导入失败的模块会被跳过）
+PRELOAD_MODULES = (
+    'numpy', 'pandas', 'duckdb', 'ibis', 'talib', 'lark', 'requests',
+    'm', 'm.trader', 'm.extract_data', 'm.input', 'm.selector',
+)
+
+# 默认资源限制，可以通过环境变量覆盖（0表示不限制）
+MEMORY_LIMIT_MB = int(os.environ.get('SANDBOX_MEMORY_MB', '4096'))
+CPU_LIMIT_SECONDS = int(os.environ.get('SANDBOX_CPU_SECONDS', '3600'))
+TIMEOUT_SECONDS = int(os.environ.get('SANDBOX_TIMEOUT', '7200'))
+
+# 每次从管道读取的字节数
+READ_SIZE = 65536
+# 检查子进程是否已退出的间隔（秒）
+POLL_INTERVAL = 0.1
+# 子进程退出后继续读取管道中剩余输出的最长时间（秒）
+DRAIN_SECONDS = 1.0
+
+_preloaded = False
+
+
+def preload(modules=PRELOAD_MODULES):
+    """
+    在worker进程中预先导入模块（每个进程只执行一次）
+
+    返回:
+    成功导入的模块名列表
+    """
+    global _preloaded
+    if _preloaded:
+        return []
+    loaded = []
+    start = time.time()
+    for name in modules:
+        try:
+            __import__(name)
+            loaded.append(name)
+        except Exception as e:
+            print(f"[WARNING] 预加载模块 {name} 失败: {e}")
+    _preloaded = True
+    print(f"[INFO] 预加载模块完成，耗时 {time.time() - start:.2f}s: {', '.join(loaded)}")
+    return loaded
+
+
+def _set_limits(memory_limit_mb, cpu_seconds):
+    """在子进程中设置资源限制"""
+    if memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if cpu_seconds:
+        # 软限制到达时收到SIGXCPU，再过5秒到达硬限制被强制结束
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+
+
+def _child(code, env, stdout_fd, stderr_fd, memory_limit_mb, cpu_seconds):
+    """子进程：重定向输出、设置资源限制后执行用户代码，不返回"""
+    returncode = 0
+    try:
+        # 新建会话和进程组，父进程据此结束用户代码创建的所有进程
+        os.setsid()
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        os.close(stdout_fd)
+        os.close(stderr_fd)
+        # worker的sys.stdout可能已被替换（如celery的日志代理），这里直接写管道
+        sys.stdout = open(1, 'w', encoding='utf-8', buffering=1, closefd=False)
+        sys.stderr = open(2, 'w', encoding='utf-8', buffering=1, closefd=False)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        _set_limits(memory_limit_mb, cpu_seconds)
+
+        exec(code, env)
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException as e:
+        returncode = 1
+        try:
+            sys.stderr.write(f"执行错误: {type(e).__name__}: {e}\n")
+            traceback.print_exc()
+        except BaseException:
+            pass
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except BaseException:
+            pass
+        os._exit(returncode)
+
+
+def _kill_group(pid):
+    """结束子进程所在的进程组（用户代码创建的所有进程）"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _exit_message(status, timed_out, timeout, cpu_seconds):
+    """根据子进程的退出状态生成返回码和说明"""
+    if timed_out:
+        return 1, f"执行超时，已终止（{timeout}s）\n"
+    if os.WIFSIGNALED(status):
+        sig = os.WTERMSIG(status)
+        if sig in (signal.SIGXCPU, signal.SIGKILL) and cpu_seconds:
+            return 1, f"进程被信号 {signal.Signals(sig).name} 终止，可能超出CPU时间限制（{cpu_seconds}s）\n"
+        return 1, f"进程被信号 {signal.Signals(sig).name} 终止\n"
+    return os.WEXITSTATUS(status), ''
+
+
+def run(code, env=None, on_output=None, memory_limit_mb=None, cpu_seconds=None, timeout=None, on_idle=None):
+    """
+    在fork出的子进程中执行代码
+
+    参数:
+    code: Python代码
+    env: 执行环境（全局变量字典）
+    on_output: 回调函数 on_output(stream, text)，stream为'stdout'或'stderr'，
+               每读到一段输出调用一次；为None时输出全部累积到返回值中
+    on_idle: 无参数回调函数，等待输出超过POLL_INTERVAL秒没有新输出时调用一次，
+             用于在用户代码长时间不输出时发布已缓冲的输出和更新进度
+    memory_limit_mb: 内存限制（MB），None使用SANDBOX_MEMORY_MB
+    cpu_seconds: CPU时间限制（秒），None使用SANDBOX_CPU_SECONDS
+    timeout: 运行时间限制（秒），None使用SANDBOX_TIMEOUT
+
+    返回:
+    字典，returncode、stdout、stderr（on_output不为None时stdout/stderr为空字符串，只包含沙箱自身的错误信息）
+    """
+    memory_limit_mb = MEMORY_LIMIT_MB if memory_limit_mb is None else memory_limit_mb
+    cpu_seconds = CPU_LIMIT_SECONDS if cpu_seconds is None else cpu_seconds
+    timeout = TIMEOUT_SECONDS if timeout is None else timeout
+    env = {} if env is None else env
+
+    stdout_r, stdout_w = os.pipe()
+    stderr_r, stderr_w = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    pid = os.fork()
+    if pid == 0:
+        os.close(stdout_r)
+        os.close(stderr_r)
+        _child(code, env, stdout_w, stderr_w, memory_limit_mb, cpu_seconds)
+    os.close(stdout_w)
+    os.close(stderr_w)
+
+    collected = {'stdout': [], 'stderr': []}
+    if on_output is None:
+        on_output = lambda stream, text: collected[stream].append(text)
+
+    streams = {stdout_r: 'stdout', stderr_r: 'stderr'}
+    decoders = {fd: codecs.getincrementaldecoder('utf-8')(errors='replace') for fd in streams}
+    deadline = time.monotonic() + timeout if timeout else None
+    timed_out = False
+    status = None
+    drain_deadline = None
+    try:
+        # 以子进程退出为准结束读取：用户代码创建的进程可能仍持有管道，不能等待管道关闭
+        while True:
+            now = time.monotonic()
+            if status is None:
+                reaped, exit_status = os.waitpid(pid, os.WNOHANG)
+                if reaped:
+                    status = exit_status
+                    # 结束子进程创建的其他进程，再读完管道中剩余的输出
+                    _kill_group(pid)
+                    drain_deadline = now + DRAIN_SECONDS
+            if status is not None and (not streams or now >= drain_deadline):
+                break
+            if status is None and deadline is not None and now >= deadline:
+                timed_out = True
+                break
+
+            wait = POLL_INTERVAL
+            if status is None and deadline is not None:
+                wait = min(wait, max(deadline - now, 0))
+            ready, _, _ = select.select(list(streams), [], [], wait)
+            if not ready and on_idle is not None:
+                on_idle()
+            for fd in ready:
+                data = os.read(fd, READ_SIZE)
+                if data:
+                    text = decoders[fd].decode(data)
+                    if text:
+                        on_output(streams[fd], text)
+                else:
+                    tail = decoders[fd].decode(b'', final=True)
+                    if tail:
+                        on_output(streams[fd], tail)
+                    del streams[fd]
+    finally:
+        if status is None:
+            # 超时或读取出错：结束整个进程组
+            _kill_group(pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            _, status = os.waitpid(pid, 0)
+        os.close(stdout_r)
+        os.close(stderr_r)
+
+    returncode, message = _exit_message(status, timed_out, timeout, cpu_seconds)
+    if message:
+        on_output('stderr', message)
+    return {
+        'returncode': returncode,
+        'stdout': ''.join(collected['stdout']),
+        'stderr': ''.join(collected['stderr']),
+    }
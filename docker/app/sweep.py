@@ -0,0 +1,224 @@
+"""
+TraderV2 参数扫描
+
+扫描任务（见tasks.py中的run_sweep/run_sweep_chunk/reduce_sweep）的描述是一个JSON字典：
+{
+    'code': 策略代码，定义 initialize/handle_data/... 等函数（函数名与m.trader.v2的参数名相同）,
+    'data': m.extract_data.v1 的参数（table_name、data、start_date、end_date等），所有组合共用,
+    'trader': m.trader.v2 的固定参数（capital_base、frequency等）,
+    'grid': 参数名 -> 取值列表，名称与m.trader.v2参数相同的直接传给v2，
+            其余作为策略参数放入 context['params'],
+    'chunk_size': 每个子任务回测的组合数（默认8）,
+    'metric': 排序指标（默认sharpe，可用compute_analytics返回的任意指标）,
+    'top': 汇总结果中保留的最优组合数（默认10）,
+    'locality': 是否按数据所在的worker分配子任务（默认True）
+}
+
+调度时同一份数据（data相同）的子任务优先发往已经提取过该数据的worker，
+这些worker的主机级查询缓存（m.db.QueryCache）中已有对应的查询结果
+"""
+import hashlib
+import inspect
+import itertools
+import json
+import math
+import os
+
+# 每个子任务默认回测的组合数
+CHUNK_SIZE = 8
+# 数据位置记录的有效期（秒），与查询缓存有效期一致
+LOCALITY_TTL = int(os.environ.get('SWEEP_LOCALITY_TTL', '86400'))
+# 数据位置记录的Redis键前缀
+LOCALITY_PREFIX = 'sweep:locality:'
+
+# 策略代码中可以定义的回调函数
+HANDLERS = ('initialize', 'before_trading_start', 'handle_data', 'handle_tick',
+            'handle_trade', 'handle_order', 'after_trading', 'after_backtest')
+
+
+def _noop(*args, **kwargs):
+    """策略代码中没有定义的回调函数"""
+
+
+def expand_grid(grid):
+    """
+    展开参数网格
+
+    返回:
+    [(组合序号, 参数字典)]，按grid中参数的顺序做笛卡尔积
+    """
+    names = list(grid)
+    return [(index, dict(zip(names, values)))
+            for index, values in enumerate(itertools.product(*(grid[name] for name in names)))]
+
+
+def split_chunks(combos, chunk_size=CHUNK_SIZE):
+    """将组合按chunk_size切分为子任务"""
+    chunk_size = max(int(chunk_size or CHUNK_SIZE), 1)
+    return [combos[i:i + chunk_size] for i in range(0, len(combos), chunk_size)]
+
+
+def data_key(data_spec):
+    """数据描述的键，相同的数据描述会产生相同的查询（和查询缓存中的文件）"""
+    source = json.dumps(data_spec, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+
+
+def record_locality(redis, key, hostname):
+    """记录某个worker已经提取过该数据"""
+    if redis is None or not hostname:
+        return
+    try:
+        redis.sadd(f"{LOCALITY_PREFIX}{key}", hostname)
+        redis.expire(f"{LOCALITY_PREFIX}{key}", LOCALITY_TTL)
+    except Exception as e:
+        print(f"[WARNING] 记录数据位置失败: {e}")
+
+
+def locality_hosts(redis, key):
+    """已经提取过该数据的worker列表"""
+    if redis is None:
+        return []
+    try:
+        members = redis.smembers(f"{LOCALITY_PREFIX}{key}")
+    except Exception as e:
+        print(f"[WARNING] 读取数据位置失败: {e}")
+        return []
+    return sorted(member.decode() if isinstance(member, bytes) else member for member in members)
+
+
+def plan_routes(chunk_count, hosts):
+    """
+    为每个子任务选择worker
+
+    有数据的worker轮流分配，每轮留一个子任务给共享队列，没有数据的空闲worker也能参与（并预热自己的缓存）
+
+    返回:
+    与子任务等长的列表，元素为worker名称，None表示发往共享队列
+    """
+    slots = list(hosts) + [None]
+    return [slots[i % len(slots)] for i in range(chunk_count)]
+
+
+def split_params(params):
+    """将组合参数分为m.trader.v2的参数和策略参数"""
+    from m.trader import v2
+
+    names = inspect.signature(v2).parameters
+    trader_params = {name: value for name, value in params.items() if name in names}
+    strategy_params = {name: value for name, value in params.items() if name not in names}
+    return trader_params, strategy_params
+
+
+def _plain(value):
+    """转换为可以JSON序列化的值（NaN转为None）"""
+    if isinstance(value, dict):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _metrics(results):
+    """从回测结果中提取用于比较的指标"""
+    metrics = {key: value for key, value in (results.get('analytics') or {}).items() if key != 'pnl_by_stock'}
+    metrics['final_value'] = float(results['final_value'])
+    # get_results中的total_return为百分比，analytics中为比例，没有资金曲线时才使用前者
+    metrics.setdefault('total_return', float(results['total_return']) / 100)
+    return _plain(metrics)
+
+
+def run_chunk(spec, chunk):
+    """
+    回测一个子任务中的所有组合（在沙箱子进程中执行）
+
+    数据只提取一次，所有组合共用；单个组合出错不影响其他组合
+
+    返回:
+    结果行列表，每行包含 index、params、各项指标，出错时包含error
+    """
+    import m
+
+    data = m.extract_data.v1(**spec['data'])
+    strategy = {}
+    exec(spec['code'], strategy)
+
+    rows = []
+    for index, params in chunk:
+        trader_params, strategy_params = split_params(params)
+        user_initialize = strategy.get('initialize')
+
+        def initialize(context, strategy_params=strategy_params, user_initialize=user_initialize):
+            context['params'] = dict(strategy_params)
+            if user_initialize is not None:
+                user_initialize(context)
+
+        kwargs = {name: strategy.get(name) or _noop for name in HANDLERS}
+        kwargs['initialize'] = initialize
+        kwargs.update(spec.get('trader') or {})
+        kwargs.update(trader_params)
+        kwargs.update(plot_charts=False, m_name=f"sweep_{index}")
+
+        row = {'index': index, 'params': params}
+        try:
+            engine = m.trader.v2(data=data, **kwargs)
+            row.update(_metrics(engine.get_results()))
+        except Exception as e:
+            row['error'] = f"{type(e).__name__}: {e}"
+        rows.append(row)
+    return rows
+
+
+def aggregate(rows, metric='sharpe', top=10):
+    """
+    汇总所有组合的结果
+
+    参数:
+    rows: 所有子任务的结果行
+    metric: 排序指标（越大越好）
+    top: 保留的最优组合数
+
+    返回:
+    字典，count、failed、metric、best、top、metric_stats（指标的分布）、
+    by_param（每个参数每个取值下指标的平均值和最大值，用于看参数的敏感性）
+    """
+    import numpy as np
+    import pandas as pd
+
+    rows = sorted(rows, key=lambda row: row['index'])
+    succeeded = [row for row in rows if not row.get('error')]
+    summary = {
+        'count': len(rows),
+        'failed': len(rows) - len(succeeded),
+        'metric': metric,
+        'best': None,
+        'top': [],
+        'metric_stats': None,
+        'by_param': {},
+        'errors': [{'index': row['index'], 'params': row['params'], 'error': row['error']}
+                   for row in rows if row.get('error')][:top],
+    }
+    if not succeeded:
+        return summary
+
+    values = np.array([np.nan if row.get(metric) is None else row[metric] for row in succeeded], dtype=np.float64)
+    # NaN排在最后
+    order = np.argsort(np.where(np.isnan(values), np.inf, -values), kind='stable')
+    summary['top'] = [succeeded[i] for i in order[:top]]
+    summary['best'] = summary['top'][0]
+
+    valid = values[~np.isnan(values)]
+    if len(valid):
+        summary['metric_stats'] = {'mean': float(valid.mean()), 'std': float(valid.std()),
+                                   'min': float(valid.min()), 'max': float(valid.max()), 'count': len(valid)}
+
+    frame = pd.DataFrame([row['params'] for row in succeeded])
+    frame['_metric'] = values
+    for name in frame.columns.drop('_metric'):
+        grouped = frame.groupby(frame[name].astype(str))['_metric'].agg(['count', 'mean', 'max'])
+        summary['by_param'][name] = {value: {'count': int(count), 'mean': float(mean), 'max': float(high)}
+                                     for value, count, mean, high in zip(grouped.index, grouped['count'],
+                                                                         grouped['mean'], grouped['max'])}
+    return _plain(summary)
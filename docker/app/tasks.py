@@ -1,6 +1,4 @@
-from celery_app import app
-import subprocess
-import tempfile
+from celery_app import app, redis_client
 import os
 import sys
 import time
@@ -19,53 +17,46 @@ def run_code(self, program_id, code, language='python'):
     try:
         # 根据语言执行代码
         if language.lower() == 'python':
-            # 直接执行Python代码，不创建临时文件
-            import io
-            import contextlib
+            # 在从预热worker fork出的子进程中执行，子进程有独立的内存/CPU限制，输出通过管道实时读取
+            import sandbox
+            from output_stream import OutputStream
+            from result_store import ResultStore
             
-            # 捕获标准输出和标准错误
-            stdout_capture = io.StringIO()
-            stderr_capture = io.StringIO()
+            # 用户代码通过save_result(name, value)保存的结果以二进制格式单独存储，任务结果中只返回清单
+            store = ResultStore(self.request.id or str(program_id))
             
-            returncode = 0
-            try:
-                # 使用contextlib重定向所有输出到StringIO对象
-                with contextlib.redirect_stdout(stdout_capture), contextlib.redirect_stderr(stderr_capture):
-                    # 定义用户代码执行环境
-                    execution_env = {
-                        'task_id': self.request.id,
-                        'program_id': program_id,
-                        'os': os,
-                        'time': time
-                    }
-                     
-                    # 记录开始时间
-                    start_time = time.strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    # 执行用户代码，传入执行环境
-                    exec(code, execution_env)
-                    
-                    # 记录结束时间
-                    end_time = time.strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    # 打印任务完成信息，包含任务ID、开始时间和结束时间
-                    print(f"=== 任务完成 === 任务ID: {self.request.id} 开始时间: {start_time} 结束时间: {end_time} ")
-            except Exception as e:
-                # 捕获执行过程中的异常
-                returncode = 1
-                # 将异常信息写入stderr
-                stderr_capture.write(f"执行错误: {type(e).__name__}: {e}\n")
+            # 定义用户代码执行环境
+            execution_env = {
+                'task_id': self.request.id,
+                'program_id': program_id,
+                'os': os,
+                'time': time,
+                'save_result': store.save_result
+            }
+            
+            # 记录开始时间
+            start_time = time.strftime('%Y-%m-%d %H:%M:%S')
+            
+            # 输出边运行边发布到Redis频道并定期更新任务进度，只在内存中保留最近的一段（见output_stream.py）
+            # 用户代码长时间不输出时，由on_idle发布已缓冲的输出和更新进度
+            stream = OutputStream(self, program_id, redis=redis_client())
+            result = sandbox.run(code, execution_env, on_output=stream, on_idle=stream.tick)
             
-            # 获取捕获的输出
-            stdout = stdout_capture.getvalue()
-            stderr = stderr_capture.getvalue()
+            # 记录结束时间，执行成功时追加任务完成信息，包含任务ID、开始时间和结束时间
+            end_time = time.strftime('%Y-%m-%d %H:%M:%S')
+            if result['returncode'] == 0:
+                stream.write('stdout', f"=== 任务完成 === 任务ID: {self.request.id} 开始时间: {start_time} 结束时间: {end_time} \n")
+            stream.close(result['returncode'])
+            results = store.finalize(redis=redis_client())
             
             output = {
                 'program_id': program_id,
                 'task_id': self.request.id,
-                'returncode': returncode,
-                'stdout': stdout,
-                'stderr': stderr
+                'returncode': result['returncode'],
+                'stdout': stream.getvalue('stdout'),
+                'stderr': stream.getvalue('stderr'),
+                'truncated': stream.truncated(),
+                'results': results
             }
         else:
             output = {
@@ -84,4 +75,110 @@ def run_code(self, program_id, code, language='python'):
             'returncode': 1,
             'stdout': '',
             'stderr': str(e)
-        }
\ No newline at end of file
+        }
+
+@app.task(bind=True)
+def run_sweep(self, spec):
+    """
+    TraderV2 参数扫描任务（描述格式见sweep.py）
+    
+    将参数网格切分为子任务，按数据位置分配到各worker并行回测，全部完成后由reduce_sweep汇总，
+    本任务的结果即为汇总结果
+    
+    :param self: 任务实例
+    :param spec: 扫描描述
+    :return: 汇总结果
+    """
+    from celery import chord
+    from celery.result import allow_join_result
+    from celery.utils.nodenames import worker_direct
+    import sweep
+    
+    combos = sweep.expand_grid(spec['grid'])
+    chunks = sweep.split_chunks(combos, spec.get('chunk_size'))
+    if not chunks:
+        return reduce_sweep([], spec, self.request.id)
+    
+    # 已经提取过同一份数据的worker优先执行子任务（其查询缓存中已有数据）
+    hosts = []
+    if spec.get('locality', True):
+        hosts = sweep.locality_hosts(redis_client(), sweep.data_key(spec['data']))
+    routes = sweep.plan_routes(len(chunks), hosts)
+    
+    header = []
+    for chunk, host in zip(chunks, routes):
+        signature = run_sweep_chunk.s(spec, chunk)
+        if host:
+            signature = signature.set(queue=worker_direct(host))
+        header.append(signature)
+    print(f"[INFO] 参数扫描 {self.request.id}: {len(combos)} 个组合，{len(chunks)} 个子任务，有数据的worker: {hosts}")
+    
+    workflow = chord(header, reduce_sweep.s(spec, self.request.id))
+    if self.request.is_eager:
+        # 本地模式（CELERY_LOCAL=1）下子任务在当前进程中同步执行，直接返回汇总结果
+        with allow_join_result():
+            return workflow.apply().get()
+    return self.replace(workflow)
+
+
+@app.task(bind=True)
+def run_sweep_chunk(self, spec, chunk):
+    """
+    参数扫描子任务：在沙箱子进程中回测一组参数组合
+    
+    :param self: 任务实例
+    :param spec: 扫描描述
+    :param chunk: [(组合序号, 参数字典)]
+    :return: 结果行列表
+    """
+    import shutil
+    import sandbox
+    import sweep
+    from output_stream import RingBuffer
+    from result_store import ResultStore, load_results
+    
+    # 结果由子进程写入本地文件，父进程读取后删除；策略的输出只保留最近的错误输出
+    store = ResultStore(f"chunk_{self.request.id}", backend='file')
+    stderr = RingBuffer(8192)
+    env = {'sweep': sweep, 'spec': spec, 'chunk': chunk, 'save_result': store.save_result}
+    try:
+        result = sandbox.run("save_result('rows', sweep.run_chunk(spec, chunk), split=False)", env,
+                             on_output=lambda stream, text: stderr.append(text) if stream == 'stderr' else None)
+        manifest = store.finalize()
+        rows = load_results(manifest)['rows'] if manifest else None
+    finally:
+        shutil.rmtree(store.directory, ignore_errors=True)
+    
+    if not rows:
+        error = f"子任务执行失败（返回码 {result['returncode']}）: {stderr.tail(2000)}"
+        rows = [{'index': index, 'params': params, 'error': error} for index, params in chunk]
+    else:
+        sweep.record_locality(redis_client(), sweep.data_key(spec['data']), self.request.hostname)
+    return rows
+
+
+@app.task(bind=True)
+def reduce_sweep(self, chunk_results, spec, sweep_id):
+    """
+    参数扫描汇总：合并所有子任务的结果，按指标排序并统计各参数的影响
+    
+    全部结果行以二进制格式另外存储（见result_store.py），汇总结果中只包含最优的组合和清单
+    
+    :param self: 任务实例
+    :param chunk_results: 各子任务返回的结果行列表
+    :param spec: 扫描描述
+    :param sweep_id: 扫描任务ID
+    :return: 汇总结果
+    """
+    import sweep
+    from result_store import ResultStore
+    
+    rows = [row for rows in chunk_results for row in rows]
+    summary = sweep.aggregate(rows, metric=spec.get('metric', 'sharpe'), top=spec.get('top', 10))
+    
+    store = ResultStore(sweep_id or self.request.id)
+    if rows:
+        store.save_result('rows', rows, split=False)
+    summary['sweep_id'] = sweep_id
+    summary['results'] = store.finalize(redis=redis_client())
+    return summary
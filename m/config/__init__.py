@@ -8,6 +8,15 @@ class GlobalConfig:
     """
     # 默认配置
     DATABASE_IP = "127.0.0.1:9000"
+    # 本地DuckDB数据仓库文件路径，None表示不启用
+    WAREHOUSE_PATH = None
+    # 基准指数日线数据表名
+    BENCHMARK_TABLE = "index_daily"
+    # 主机级查询结果缓存目录（环境变量 QWESDK_QUERY_CACHE_DIR 优先），None表示不启用
+    QUERY_CACHE_DIR = None
+    # 查询缓存大小预算（MB）和有效期（秒）
+    QUERY_CACHE_SIZE_MB = 2048
+    QUERY_CACHE_TTL = 86400
     
     @classmethod
     def load_config(cls):
@@ -28,9 +37,28 @@ class GlobalConfig:
                     db_ip = db_config.get("ip", "127.0.0.1")
                     db_port = db_config.get("port", 8123)
                     cls.DATABASE_IP = f"{db_ip}:{db_port}"
+                
+                # 加载本地数据仓库配置
+                if "warehouse" in config:
+                    warehouse_path = config["warehouse"].get("path")
+                    cls.WAREHOUSE_PATH = os.path.expanduser(warehouse_path) if warehouse_path else None
+                
+                # 加载查询缓存配置
+                if "query_cache" in config:
+                    cache_config = config["query_cache"]
+                    cache_dir = cache_config.get("dir")
+                    cls.QUERY_CACHE_DIR = os.path.expanduser(cache_dir) if cache_dir else None
+                    cls.QUERY_CACHE_SIZE_MB = cache_config.get("size_mb", cls.QUERY_CACHE_SIZE_MB)
+                    cls.QUERY_CACHE_TTL = cache_config.get("ttl", cls.QUERY_CACHE_TTL)
+                
+                # 加载基准数据配置
+                if "benchmark" in config:
+                    cls.BENCHMARK_TABLE = config["benchmark"].get("table", cls.BENCHMARK_TABLE)
                     
                 print(f"[INFO] 成功加载配置文件: {config_file_path}")
                 print(f"[INFO] 数据库IP: {cls.DATABASE_IP}")
+                if cls.WAREHOUSE_PATH:
+                    print(f"[INFO] 本地数据仓库: {cls.WAREHOUSE_PATH}")
         except FileNotFoundError:
             print(f"[WARNING] 配置文件 {config_file_path} 未找到，使用默认配置")
         except json.JSONDecodeError as e:
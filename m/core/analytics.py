@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+# 每年交易日数
+TRADING_DAYS = 252
+
+
+def trade_columns(trade_history):
+    """
+    将交易历史转换为列式数组，后续统计都在数组上完成
+
+    参数:
+    trade_history: OrderManager.get_trade_history()返回的交易记录列表
+
+    返回:
+    字典，stock_code、direction（买入1，卖出-1）、price、volume、amount（成交金额）、
+    cash_flow（资金变动，买入为负）、pnl（卖出的已实现盈亏，买入为0）
+    """
+    n = len(trade_history)
+    direction = np.fromiter((1 if trade['direction'] == 'buy' else -1 for trade in trade_history),
+                            dtype=np.int8, count=n)
+    price = np.fromiter((trade['price'] for trade in trade_history), dtype=np.float64, count=n)
+    volume = np.fromiter((trade['volume'] for trade in trade_history), dtype=np.float64, count=n)
+    cash_flow = np.fromiter((trade.get('total_revenue', 0) if trade['direction'] == 'sell'
+                             else -trade.get('total_cost', 0) for trade in trade_history),
+                            dtype=np.float64, count=n)
+    pnl = np.fromiter((trade.get('pnl', np.nan) if trade['direction'] == 'sell' else 0.0
+                       for trade in trade_history), dtype=np.float64, count=n)
+    return {
+        'stock_code': np.array([trade['stock_code'] for trade in trade_history], dtype=object),
+        'direction': direction,
+        'price': price,
+        'volume': volume,
+        'amount': price * volume,
+        'cash_flow': cash_flow,
+        'pnl': pnl,
+    }
+
+
+def returns(equity):
+    """由资金曲线计算每期收益率"""
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) < 2:
+        return np.zeros(0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.diff(equity) / equity[:-1]
+
+
+def annual_return(equity, periods=TRADING_DAYS):
+    """年化收益率（复利）"""
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) < 2 or equity[0] <= 0:
+        return np.nan
+    return (equity[-1] / equity[0]) ** (periods / (len(equity) - 1)) - 1
+
+
+def sharpe_ratio(period_returns, risk_free=0.0, periods=TRADING_DAYS):
+    """
+    年化夏普比率
+
+    参数:
+    period_returns: 每期收益率
+    risk_free: 年化无风险利率
+    periods: 每年期数
+    """
+    excess = np.asarray(period_returns, dtype=np.float64) - risk_free / periods
+    if len(excess) < 2:
+        return np.nan
+    std = excess.std(ddof=1)
+    return excess.mean() / std * np.sqrt(periods) if std > 0 else np.nan
+
+
+def sortino_ratio(period_returns, risk_free=0.0, periods=TRADING_DAYS):
+    """年化索提诺比率（只用下行波动）"""
+    excess = np.asarray(period_returns, dtype=np.float64) - risk_free / periods
+    if len(excess) < 2:
+        return np.nan
+    downside = np.sqrt(np.mean(np.minimum(excess, 0.0) ** 2))
+    return excess.mean() / downside * np.sqrt(periods) if downside > 0 else np.nan
+
+
+def max_drawdown(equity):
+    """
+    最大回撤及回撤持续时间
+
+    返回:
+    字典，max_drawdown（负数比例）、peak / trough（最大回撤的起止位置）、
+    duration（最长的水下持续期数，即从前高到收复前高的最长间隔）
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) == 0:
+        return {'max_drawdown': 0.0, 'peak': 0, 'trough': 0, 'duration': 0}
+
+    peaks = np.maximum.accumulate(equity)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = np.where(peaks > 0, equity / peaks - 1, 0.0)
+    trough = int(np.argmin(drawdown))
+
+    # 每个位置对应的最近一次创新高的位置
+    positions = np.arange(len(equity))
+    last_peak = np.maximum.accumulate(np.where(equity >= peaks, positions, 0))
+    peak = int(last_peak[trough])
+    duration = int((positions - last_peak).max())
+    return {'max_drawdown': float(drawdown[trough]), 'peak': peak, 'trough': trough, 'duration': duration}
+
+
+def alpha_beta(period_returns, benchmark_returns, risk_free=0.0, periods=TRADING_DAYS):
+    """
+    相对基准的年化alpha和beta（只使用两者都有数据的期）
+
+    返回:
+    (alpha, beta)
+    """
+    strategy = np.asarray(period_returns, dtype=np.float64) - risk_free / periods
+    benchmark = np.asarray(benchmark_returns, dtype=np.float64) - risk_free / periods
+    mask = ~(np.isnan(strategy) | np.isnan(benchmark))
+    strategy, benchmark = strategy[mask], benchmark[mask]
+    if len(strategy) < 2:
+        return np.nan, np.nan
+    variance = benchmark.var(ddof=1)
+    if variance <= 0:
+        return np.nan, np.nan
+    beta = np.cov(strategy, benchmark, ddof=1)[0, 1] / variance
+    alpha = (strategy.mean() - beta * benchmark.mean()) * periods
+    return float(alpha), float(beta)
+
+
+def pnl_by_stock(columns):
+    """
+    按股票归因的盈亏（资金变动之和，全部平仓后即为每只股票的总盈亏，已扣除交易费用）
+
+    返回:
+    字典，股票代码 -> 盈亏
+    """
+    if len(columns['stock_code']) == 0:
+        return {}
+    codes, index = np.unique(columns['stock_code'], return_inverse=True)
+    totals = np.bincount(index, weights=columns['cash_flow'], minlength=len(codes))
+    return dict(zip(codes.tolist(), totals.tolist()))
+
+
+def compute_analytics(equity, dates=None, trade_history=None, benchmark_returns=None,
+                      risk_free=0.0, periods=TRADING_DAYS):
+    """
+    计算回测绩效指标
+
+    参数:
+    equity: 每日资金曲线
+    dates: 与equity对应的日期
+    trade_history: 交易记录列表（OrderManager.get_trade_history()），None时不计算交易相关指标
+    benchmark_returns: 与equity对应的基准每日收益率（第一天可为NaN），None时不计算alpha/beta
+    risk_free: 年化无风险利率
+    periods: 每年期数
+
+    返回:
+    指标字典，数值为float（无法计算时为NaN），日期为ISO格式字符串，可以直接JSON序列化（NaN除外）
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    period_returns = returns(equity)
+    drawdown = max_drawdown(equity)
+
+    result = {
+        'total_return': float(equity[-1] / equity[0] - 1) if len(equity) and equity[0] > 0 else np.nan,
+        'annual_return': float(annual_return(equity, periods)),
+        'volatility': float(period_returns.std(ddof=1) * np.sqrt(periods)) if len(period_returns) > 1 else np.nan,
+        'sharpe': float(sharpe_ratio(period_returns, risk_free, periods)),
+        'sortino': float(sortino_ratio(period_returns, risk_free, periods)),
+        'max_drawdown': drawdown['max_drawdown'],
+        'max_drawdown_duration': drawdown['duration'],
+        'alpha': np.nan,
+        'beta': np.nan,
+    }
+    if dates is not None and len(equity):
+        result['max_drawdown_start'] = pd.Timestamp(dates[drawdown['peak']]).isoformat()
+        result['max_drawdown_end'] = pd.Timestamp(dates[drawdown['trough']]).isoformat()
+
+    if benchmark_returns is not None and len(period_returns):
+        benchmark_returns = np.asarray(benchmark_returns, dtype=np.float64)[-len(period_returns):]
+        result['alpha'], result['beta'] = alpha_beta(period_returns, benchmark_returns, risk_free, periods)
+        result['benchmark_return'] = float(np.nanprod(1 + benchmark_returns) - 1)
+
+    if trade_history is not None:
+        columns = trade_columns(trade_history)
+        sells = columns['direction'] < 0
+        realized = columns['pnl'][sells]
+        realized = realized[~np.isnan(realized)]
+        average_equity = equity.mean() if len(equity) else np.nan
+        years = max(len(equity) - 1, 1) / periods
+        result.update({
+            'trade_count': int(len(columns['direction'])),
+            'win_rate': float((realized > 0).mean()) if len(realized) else np.nan,
+            # 单边年化换手率：买卖成交金额之和的一半 / 平均资金 / 年数
+            'turnover': float(columns['amount'].sum() / 2 / average_equity / years) if average_equity > 0 else np.nan,
+            'pnl_by_stock': pnl_by_stock(columns),
+        })
+    return result
@@ -15,13 +15,13 @@ class ArrayManager:
         支持任意字段的动态更新，包括价格、成交量和各种指标
         
         参数:
-        bar: K线数据，可以是字典、对象或具有属性的实例
+        bar: K线数据，可以是字典、映射类对象（如面板行视图、pandas Series）、对象或具有属性的实例
         """
-        # 检查bar是否为字典或具有__dict__属性
-        if hasattr(bar, '__dict__'):
-            bar_dict = bar.__dict__
-        elif isinstance(bar, dict):
+        # 字典和映射类对象直接遍历字段，其余对象使用__dict__
+        if isinstance(bar, dict) or hasattr(bar, 'items'):
             bar_dict = bar
+        elif hasattr(bar, '__dict__'):
+            bar_dict = bar.__dict__
         else:
             # 尝试将bar转换为字典
             try:
@@ -49,6 +49,37 @@ class ArrayManager:
         if self.count < self.size:
             self.count += 1
     
+    def load_history(self, history):
+        """一次性载入历史数据，替换现有数据
+        
+        用于不逐根调用update_bar的场景（如只在触发事件时处理的股票），
+        直接从面板数组截取最近size根K线
+        
+        参数:
+        history: 字典，字段名 -> 按时间先后排列的一维数组
+        """
+        count = 0
+        for key, values in history.items():
+            values = np.asarray(values, dtype=np.float64)[-self.size:]
+            field_array = self.fields.get(key)
+            if field_array is None:
+                field_array = self.fields[key] = np.zeros(self.size, dtype=np.float64)
+            field_array[:] = 0.0
+            if len(values):
+                field_array[-len(values):] = values
+            count = max(count, len(values))
+        self.count = count
+    
+    def get_state(self):
+        """获取可保存的状态（用于检查点）"""
+        return {'size': self.size, 'count': self.count, 'fields': {k: v.copy() for k, v in self.fields.items()}}
+    
+    def set_state(self, state):
+        """从get_state()的结果恢复状态"""
+        self.size = state['size']
+        self.count = state['count']
+        self.fields = {k: np.array(v, dtype=np.float64) for k, v in state['fields'].items()}
+    
     @property
     def inited(self):
         """是否已经初始化完成"""
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+# 每天、每分钟的纳秒数
+NS_PER_DAY = 86400 * 10**9
+NS_PER_MINUTE = 60 * 10**9
+
+# A股交易时段（从零点起算的分钟数）：上午 9:30-11:30，下午 13:00-15:00
+SESSIONS = ((9 * 60 + 30, 11 * 60 + 30), (13 * 60, 15 * 60))
+
+# 支持的回测频率 -> 每根K线包含的分钟线数量（None表示按交易日合成日线）
+FREQUENCIES = {
+    '1m': 1,
+    '5m': 5,
+    '15m': 15,
+    '30m': 30,
+    '60m': 60,
+    'daily': None,
+}
+
+# 合成规则：开盘取首个值，最高/最低取极值，成交量/成交额求和，其余字段（收盘价、指标等）取最后一个值
+FIRST_FIELDS = ('open', 'open_price')
+MAX_FIELDS = ('high', 'high_price')
+MIN_FIELDS = ('low', 'low_price')
+SUM_FIELDS = ('volume', 'amount', 'turnover', 'money')
+
+
+def bucket_starts(times, frequency, sessions=SESSIONS):
+    """
+    计算每根合成K线在分钟线数组中的起始位置和K线时间
+
+    K线按交易日切分，每个交易时段内按时钟时间从开盘起每k分钟划分一个时间段，
+    分钟线按所在时间段归入对应的K线，缺失个别分钟线时不会影响后续K线的划分，
+    不同股票的K线时间始终对齐；午间休市、隔夜等时间间隔不会产生跨时段的K线。
+    分钟线时间可以是该分钟的开始时间（9:30、...、14:59）或结束时间（9:31、...、15:00），
+    按时段开盘/收盘时刻上的分钟线数量自动判断；开盘前和两个时段之间的分钟线归入相邻的K线
+
+    参数:
+    times: 已排序的分钟线时间（int64纳秒）
+    frequency: 目标频率，见FREQUENCIES
+    sessions: 交易时段，((开盘分钟, 收盘分钟), ...)，分钟数从零点起算
+
+    返回:
+    (starts, bar_times)
+    starts: 起始位置数组
+    bar_times: 每根K线的时间，日线为当天零点，其余为K线所在时间段的结束时间
+    """
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"不支持的频率: {frequency}，可选: {list(FREQUENCIES)}")
+    n = len(times)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), times[:0]
+
+    days = times // NS_PER_DAY * NS_PER_DAY
+    size = FREQUENCIES[frequency]
+    if size is None:
+        keys = days
+    else:
+        opens = np.array([open_minute for open_minute, _ in sessions], dtype=np.int64) * NS_PER_MINUTE
+        lengths = np.array([close - open_minute for open_minute, close in sessions], dtype=np.int64) * NS_PER_MINUTE
+        step = size * NS_PER_MINUTE
+
+        time_of_day = times - days
+        session = np.maximum(np.searchsorted(opens, time_of_day, side='right') - 1, 0)
+        elapsed = np.clip(time_of_day - opens[session], 0, lengths[session])
+        if np.count_nonzero(elapsed == lengths[session]) > np.count_nonzero(elapsed == 0):
+            # 分钟线时间为该分钟的结束时间
+            bucket = np.maximum((elapsed + step - 1) // step - 1, 0)
+        else:
+            bucket = np.minimum(elapsed // step, (lengths[session] - 1) // step)
+        keys = days + opens[session] + np.minimum((bucket + 1) * step, lengths[session])
+
+    new_bar = np.empty(n, dtype=bool)
+    new_bar[0] = True
+    new_bar[1:] = keys[1:] != keys[:-1]
+    starts = np.flatnonzero(new_bar)
+    return starts, keys[starts]
+
+
+def aggregate(times, fields, frequency, sessions=SESSIONS):
+    """
+    将一只股票的分钟线合成为目标频率的K线
+
+    参数:
+    times: 已排序的分钟线时间（int64纳秒）
+    fields: 字典，字段名 -> 与times等长的float数组
+    frequency: 目标频率
+    sessions: 交易时段，见bucket_starts
+
+    返回:
+    (bar_times, bar_fields)
+    bar_times: 每根K线的时间，日线为当天零点，其余为K线所在时间段的结束时间
+    bar_fields: 字典，字段名 -> 合成后的数组
+    """
+    starts, bar_times = bucket_starts(times, frequency, sessions)
+    if len(starts) == 0:
+        return times[:0], {name: values[:0] for name, values in fields.items()}
+
+    ends = np.empty_like(starts)
+    ends[:-1] = starts[1:]
+    ends[-1] = len(times)
+    last = ends - 1
+
+    bar_fields = {}
+    for name, values in fields.items():
+        if name in FIRST_FIELDS:
+            bar_fields[name] = values[starts]
+        elif name in MAX_FIELDS:
+            bar_fields[name] = np.fmax.reduceat(values, starts)
+        elif name in MIN_FIELDS:
+            bar_fields[name] = np.fmin.reduceat(values, starts)
+        elif name in SUM_FIELDS:
+            bar_fields[name] = np.add.reduceat(np.nan_to_num(values), starts)
+        else:
+            bar_fields[name] = values[last]
+    return bar_times, bar_fields
+
+
+def frame_to_arrays(df, time_field=None):
+    """
+    将一只股票的DataFrame转换为按时间排序的数组
+
+    返回:
+    (times, fields)，times为int64纳秒，fields只包含数值字段
+    """
+    if time_field is None:
+        for field in ('datetime', 'time', 'date'):
+            if field in df.columns:
+                time_field = field
+                break
+        else:
+            raise ValueError("数据中没有时间字段（datetime/time/date）")
+
+    times = pd.to_datetime(df[time_field]).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    order = np.argsort(times, kind='stable')
+    fields = {}
+    for column in df.columns:
+        if column in (time_field, 'code', 'date', 'datetime', 'time'):
+            continue
+        values = df[column].to_numpy()
+        if np.issubdtype(values.dtype, np.number):
+            fields[column] = values[order].astype(np.float64)
+    return times[order], fields
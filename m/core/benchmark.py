@@ -0,0 +1,121 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from m.core.bar_aggregator import frame_to_arrays, NS_PER_DAY
+
+# 基准K线缓存的最大条目数（按最近使用淘汰，长期运行的worker中内存有上限）
+BENCHMARK_CACHE_SIZE = 32
+
+
+def _frozen(values):
+    """设为只读，缓存中的数组被所有回测共享，不允许修改"""
+    values.setflags(write=False)
+    return values
+
+
+class _NoBenchmarkData(Exception):
+    """没有提取到基准数据（抛出异常而不返回None，lru_cache不缓存异常，下次重新提取）"""
+
+
+def _date_string(value):
+    return pd.Timestamp(value).strftime("%Y-%m-%d")
+
+
+def load_benchmark_bars(code, start_date, end_date, table_name=None, data=None, debug=False):
+    """
+    获取基准指数的日线收盘价
+
+    data中有该代码时直接使用，否则通过ExtractDataV1从table_name表中提取（与股票数据相同的查询和缓存路径）；
+    提取结果按 (基准代码, 表名, 开始日期, 结束日期) 缓存最近的BENCHMARK_CACHE_SIZE个，
+    之后的回测（包括fork出的子进程）复用同一份只读数组
+
+    参数:
+    code: 基准代码，如 000300.SH
+    start_date: 开始日期
+    end_date: 结束日期
+    table_name: 基准数据表名，None时使用配置BENCHMARK_TABLE
+    data: 已有的行情数据字典（股票代码 -> DataFrame）
+    debug: 是否调试模式
+
+    返回:
+    (dates, close)，dates为int64纳秒（当天零点），没有数据时返回None
+    """
+    if data is not None and code in data:
+        times, fields = frame_to_arrays(data[code])
+        if 'close' not in fields:
+            return None
+        return _frozen(times // NS_PER_DAY * NS_PER_DAY), _frozen(fields['close'])
+
+    if table_name is None:
+        from m.config import GlobalConfig
+        table_name = GlobalConfig.get_config("BENCHMARK_TABLE")
+
+    start_date, end_date = _date_string(start_date), _date_string(end_date)
+    if debug:
+        print(f"[DEBUG] 获取基准 {code}，表: {table_name}，日期: {start_date} - {end_date}")
+    try:
+        return _benchmark_bars(code, table_name, start_date, end_date)
+    except _NoBenchmarkData:
+        if debug:
+            print(f"[DEBUG] 没有获取到基准 {code} 的数据")
+        return None
+
+
+@lru_cache(maxsize=BENCHMARK_CACHE_SIZE)
+def _benchmark_bars(code, table_name, start_date, end_date):
+    """
+    从数据表提取基准日线（带缓存），返回 (dates, close)
+
+    没有数据时抛出_NoBenchmarkData：ExtractDataV1在查询失败（超时、数据库不可用等）时也返回空数据，
+    只缓存成功的结果，一次临时失败不会让之后的回测都没有基准
+    """
+    from m.extract_data import ExtractDataV1
+
+    extractor = ExtractDataV1(start_date=start_date, end_date=end_date, data=[code], table_name=table_name)
+    df = extractor.get_data().get(code)
+    if df is None or df.empty or 'close' not in df.columns:
+        raise _NoBenchmarkData(code)
+    times, fields = frame_to_arrays(df)
+    return _frozen(times // NS_PER_DAY * NS_PER_DAY), _frozen(fields['close'])
+
+
+def benchmark_returns(code, dates, table_name=None, data=None, debug=False):
+    """
+    按回测日历对齐的基准每日收益率
+
+    基准停牌或缺失的日期用前一日收盘价填充，第一天为NaN；
+    基准K线按日期范围缓存（见load_benchmark_bars），对齐每次重新计算（只需一次二分查找）
+
+    参数:
+    code: 基准代码
+    dates: 回测日历（日期序列）
+    table_name: 基准数据表名
+    data: 已有的行情数据字典，包含该代码时直接使用
+    debug: 是否调试模式
+
+    返回:
+    与dates等长的收益率数组，没有基准数据时返回None
+    """
+    days = pd.to_datetime(pd.Series(list(dates))).dt.normalize().to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    if len(days) == 0:
+        return None
+
+    bars = load_benchmark_bars(code, pd.Timestamp(int(days.min())), pd.Timestamp(int(days.max())),
+                               table_name=table_name, data=data, debug=debug)
+    aligned = None
+    if bars is not None and len(bars[0]):
+        bar_dates, close = bars
+        # 每个回测日对应的最近一个基准交易日（之前没有数据时为-1）
+        rows = np.searchsorted(bar_dates, days, side='right') - 1
+        prices = np.where(rows >= 0, close[np.maximum(rows, 0)], np.nan)
+        aligned = np.full(len(days), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aligned[1:] = prices[1:] / prices[:-1] - 1
+    return aligned
+
+
+def clear_cache():
+    """清空基准缓存"""
+    _benchmark_bars.cache_clear()
@@ -0,0 +1,188 @@
+import datetime
+import json
+import os
+import pickle
+import tempfile
+import numpy as np
+import pandas as pd
+
+# 检查点文件格式版本
+CHECKPOINT_VERSION = 2
+
+# RecordColumns中每个值的状态：键不存在、值为None、有值
+_ABSENT, _NONE, _VALUE = 0, 1, 2
+
+
+def save_checkpoint(path, arrays, meta, state):
+    """
+    保存检查点
+
+    文件为一个 .npz：数值缓冲区按原样保存为数组，
+    '__meta__' 为JSON格式的元数据头，'__state__' 为序列化的Python对象（context、订单状态等）。
+    先写入同目录下的临时文件再替换，中途崩溃不会破坏已有的检查点
+
+    参数:
+    path: 检查点文件路径
+    arrays: 字典，名称 -> numpy数组
+    meta: 可JSON序列化的元数据
+    state: 任意可pickle的对象
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    meta = dict(meta, version=CHECKPOINT_VERSION)
+    payload = dict(arrays)
+    payload['__meta__'] = np.frombuffer(json.dumps(meta, default=str).encode('utf-8'), dtype=np.uint8)
+    payload['__state__'] = np.frombuffer(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), dtype=np.uint8)
+
+    fd, tmp_path = tempfile.mkstemp(prefix='.checkpoint_', suffix='.npz', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_meta(path):
+    """只读取检查点的元数据头"""
+    with np.load(path, allow_pickle=False) as data:
+        return json.loads(data['__meta__'].tobytes().decode('utf-8'))
+
+
+def load_checkpoint(path):
+    """
+    读取检查点
+
+    返回:
+    (arrays, meta, state)
+    """
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(data['__meta__'].tobytes().decode('utf-8'))
+        if meta.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"不支持的检查点版本: {meta.get('version')}")
+        state = pickle.loads(data['__state__'].tobytes())
+        arrays = {name: data[name] for name in data.files if name not in ('__meta__', '__state__')}
+    return arrays, meta, state
+
+
+def _to_column(values, present):
+    """
+    将一列值转换为数组：全部为整数时为int64，数值为float64，日期为datetime64[D]，
+    不带时区的时间为datetime64[ns]，其他按字符串保存
+    """
+    items = [value for value, flag in zip(values, present) if flag]
+    if items and all(isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_))
+                     for value in items):
+        return np.array([value if flag else 0 for value, flag in zip(values, present)], dtype=np.int64)
+    if all(isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_))
+           for value in items):
+        return np.array([value if flag else np.nan for value, flag in zip(values, present)], dtype=np.float64)
+    if items and all(isinstance(value, datetime.date) and not isinstance(value, datetime.datetime)
+                     for value in items):
+        return np.array([value if flag else None for value, flag in zip(values, present)], dtype='datetime64[D]')
+    if all(isinstance(value, datetime.datetime) and value.tzinfo is None for value in items):
+        return pd.to_datetime([value if flag else None for value, flag in zip(values, present)]).to_numpy(
+            dtype='datetime64[ns]')
+    return np.array([str(value) if flag else '' for value, flag in zip(values, present)], dtype=np.str_)
+
+
+def _concat(chunks):
+    """
+    拼接同一列的多段 (值数组, 状态数组)，没有值的段按其他段的类型补齐，
+    类型不一致时整数转为浮点数，其余转为字符串
+    """
+    filled = [values for values, state in chunks if (state == _VALUE).any()]
+    kinds = {values.dtype.kind for values in filled}
+    if not filled:
+        dtype = chunks[0][0].dtype
+    elif len(kinds) == 1:
+        dtype = filled[0].dtype if kinds != {'U'} else np.str_
+    elif kinds <= {'i', 'f'}:
+        dtype = np.float64
+    else:
+        dtype = np.str_
+    arrays = [values.astype(dtype, copy=False) if (state == _VALUE).any() else np.zeros(len(state), dtype=dtype)
+              for values, state in chunks]
+    return np.concatenate(arrays)
+
+
+class RecordColumns:
+    """
+    按列追加的记录列表（如成交记录），用于在检查点中保存为数组
+
+    每条记录只在追加时转换一次，保存时各列直接写为数组，不需要每次重新序列化全部记录；
+    值为int、float、时间或字符串，其他类型按字符串保存，键缺失和值为None分别记录，还原时保持原样
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.count = 0
+        # 键 -> [(值数组, 状态数组)]，保存时合并为一段
+        self.chunks = {}
+
+    def __len__(self):
+        return self.count
+
+    def extend(self, records):
+        """追加记录"""
+        n = len(records)
+        if n == 0:
+            return
+        for record in records:
+            for key in record:
+                if key not in self.chunks:
+                    self.keys.append(key)
+                    self.chunks[key] = []
+        for key in self.keys:
+            state = np.fromiter((_ABSENT if key not in record else _NONE if record[key] is None else _VALUE
+                                 for record in records), dtype=np.uint8, count=n)
+            values = _to_column([record.get(key) for record in records], state == _VALUE)
+            chunks = self.chunks[key]
+            if not chunks and self.count:
+                # 之前的记录中没有这个键
+                chunks.append((np.zeros(self.count, dtype=values.dtype), np.zeros(self.count, dtype=np.uint8)))
+            chunks.append((values, state))
+        self.count += n
+
+    def to_arrays(self, prefix):
+        """
+        返回保存用的数组字典：{prefix}{键} 为值，{prefix}{键}/state 为状态
+        """
+        arrays = {}
+        for key in self.keys:
+            chunks = self.chunks[key]
+            if len(chunks) > 1:
+                chunks[:] = [(_concat(chunks), np.concatenate([state for _, state in chunks]))]
+            values, state = chunks[0]
+            arrays[f"{prefix}{key}"] = values
+            arrays[f"{prefix}{key}/state"] = state
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix, keys):
+        """从to_arrays()保存的数组恢复"""
+        columns = cls()
+        for key in keys:
+            state = arrays[f"{prefix}{key}/state"]
+            columns.keys.append(key)
+            columns.chunks[key] = [(arrays[f"{prefix}{key}"], state)]
+            columns.count = len(state)
+        return columns
+
+    def records(self):
+        """还原为记录列表"""
+        self.to_arrays('')
+        columns = []
+        for key in self.keys:
+            values, state = self.chunks[key][0]
+            if values.dtype == np.dtype('datetime64[ns]'):
+                values = list(pd.DatetimeIndex(values))
+            else:
+                values = values.tolist()
+            columns.append((key, values, state.tolist()))
+        return [{key: values[i] if state[i] == _VALUE else None
+                 for key, values, state in columns if state[i] != _ABSENT}
+                for i in range(self.count)]
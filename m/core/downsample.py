@@ -0,0 +1,103 @@
+import numpy as np
+
+
+def _bucket_edges(n, buckets):
+    """将 [1, n-1) 的点平均分成buckets个桶（首尾两点单独保留），返回桶边界"""
+    return np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets 降采样
+
+    首尾两点保留，中间的点分成threshold-2个桶，每个桶选出与前一个选中点、
+    下一个桶均值构成的三角形面积最大的点，能较好地保留曲线的形状（峰谷）
+
+    参数:
+    x: 横坐标数组（已排序）
+    y: 纵坐标数组
+    threshold: 降采样后的点数
+
+    返回:
+    选中点的下标数组（升序）
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = _bucket_edges(n, threshold - 2)
+    # 每个桶的均值，最后一个桶之后用最后一个点
+    sums_x = np.add.reduceat(x[:-1], edges[:-1])
+    sums_y = np.add.reduceat(y[:-1], edges[:-1])
+    counts = np.diff(edges)
+    mean_x = np.append(sums_x / counts, x[-1])
+    mean_y = np.append(sums_y / counts, y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        ax, ay = x[previous], y[previous]
+        # 三角形面积的两倍（省略常数因子）
+        area = np.abs((ax - mean_x[i + 1]) * (y[start:end] - ay) - (ax - x[start:end]) * (mean_y[i + 1] - ay))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def minmax(y, buckets):
+    """
+    最小/最大值降采样
+
+    首尾两点保留，中间的点分成buckets个桶，每个桶保留最小值和最大值所在的点，
+    不会丢失任何极值（适合回撤等需要看到尖峰的曲线）
+
+    参数:
+    y: 纵坐标数组
+    buckets: 桶数量，结果最多 2×buckets+2 个点
+
+    返回:
+    选中点的下标数组（升序）
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if 2 * buckets + 2 >= n or buckets < 1:
+        return np.arange(n)
+
+    edges = _bucket_edges(n, buckets)
+    bucket = np.repeat(np.arange(buckets), np.diff(edges))
+    positions = np.arange(1, n - 1)
+    # 按 (桶, 值) 排序后，每个桶的第一个/最后一个元素即为最小/最大值
+    order = np.lexsort((y[1:-1], bucket))
+    first = edges[:-1] - 1
+    last = edges[1:] - 2
+    selected = np.concatenate(([0], positions[order[first]], positions[order[last]], [n - 1]))
+    return np.unique(selected)
+
+
+def downsample(x, y, max_points, method='lttb'):
+    """
+    将序列降采样到不超过max_points个点
+
+    参数:
+    x: 横坐标数组（已排序）
+    y: 纵坐标数组
+    max_points: 最大点数，通常取图片宽度的像素数
+    method: 'lttb' 或 'minmax'
+
+    返回:
+    (x, y) 降采样后的数组
+    """
+    if max_points is None or len(y) <= max_points:
+        return x, y
+    if method == 'lttb':
+        index = lttb(x, y, max_points)
+    elif method == 'minmax':
+        index = minmax(y, max(max_points // 2 - 1, 1))
+    else:
+        raise ValueError(f"不支持的降采样方法: {method}")
+    return x[index], y[index]
@@ -0,0 +1,94 @@
+import numpy as np
+
+# 比较运算符
+_OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+
+
+def _operand(panel, value):
+    """将字段名或常数转换为 T×N 数组"""
+    if isinstance(value, str):
+        if value not in panel.fields:
+            raise KeyError(f"面板中没有字段: {value}")
+        return panel.fields[value]
+    return np.full(panel.valid.shape, float(value))
+
+
+def _previous(values):
+    """每只股票上一根K线的值（第一行为NaN）"""
+    result = np.empty_like(values)
+    result[0] = np.nan
+    result[1:] = values[:-1]
+    return result
+
+
+def trigger_mask(panel, trigger):
+    """
+    计算单个触发条件的 T×N 布尔矩阵
+
+    参数:
+    panel: BarPanel
+    trigger: 触发条件，支持以下形式
+             'signal'                       字段值非0且非NaN（预先计算好的事件列）
+             ('cross_up', 'k', 'd')         k上穿d（上一根 k<=d，当前 k>d），第二个操作数也可以是常数
+             ('cross_down', 'k', 'd')       k下穿d
+             ('cross', 'k', 'd')            上穿或下穿
+             ('close', '>', 10)             字段与字段/常数比较
+             callable(panel)                返回 T×N 布尔矩阵的函数
+             numpy数组                      T×N 布尔矩阵
+    """
+    if isinstance(trigger, np.ndarray):
+        mask = trigger.astype(bool)
+    elif callable(trigger):
+        mask = np.asarray(trigger(panel), dtype=bool)
+    elif isinstance(trigger, str):
+        values = _operand(panel, trigger)
+        mask = (values != 0) & ~np.isnan(values)
+    elif isinstance(trigger, tuple) and len(trigger) == 3 and trigger[0] in ('cross', 'cross_up', 'cross_down'):
+        kind, left, right = trigger
+        diff = _operand(panel, left) - _operand(panel, right)
+        previous = _previous(diff)
+        with np.errstate(invalid='ignore'):
+            up = (previous <= 0) & (diff > 0)
+            down = (previous >= 0) & (diff < 0)
+        mask = up if kind == 'cross_up' else down if kind == 'cross_down' else (up | down)
+    elif isinstance(trigger, tuple) and len(trigger) == 3 and trigger[1] in _OPERATORS:
+        left, op, right = trigger
+        with np.errstate(invalid='ignore'):
+            mask = _OPERATORS[op](_operand(panel, left), _operand(panel, right))
+    else:
+        raise ValueError(f"不支持的触发条件: {trigger}")
+
+    if mask.shape != panel.valid.shape:
+        raise ValueError(f"触发条件的形状 {mask.shape} 与面板 {panel.valid.shape} 不一致")
+    return mask
+
+
+def build_event_index(panel, triggers):
+    """
+    预先计算所有触发事件
+
+    参数:
+    panel: BarPanel
+    triggers: 单个触发条件或触发条件列表（任一条件满足即触发），格式见trigger_mask
+
+    返回:
+    列表，第t个元素为第t根K线上被触发的股票列号数组（只包含当时有K线的股票）
+    """
+    if not isinstance(triggers, list):
+        triggers = [triggers]
+
+    mask = np.zeros(panel.valid.shape, dtype=bool)
+    for trigger in triggers:
+        mask |= trigger_mask(panel, trigger)
+    mask &= panel.valid
+
+    rows, columns = np.nonzero(mask)
+    bounds = np.searchsorted(rows, np.arange(len(panel) + 1))
+    return [columns[bounds[t]:bounds[t + 1]] for t in range(len(panel))]
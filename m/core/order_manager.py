@@ -1,18 +1,62 @@
+import heapq
 import numpy as np
+import pandas as pd
+from collections import deque
 from .trading_cost_manager import TradingCostManager
+from .slippage import FixedSlippage
+
+class _PriceBook:
+    """
+    单只股票单类条件单的价格索引
+
+    条目以 (-key, order_id, 订单) 保存在最小堆中，key的方向经过换算，使得被触发的订单
+    总是key最大的一段：插入O(log n)，从堆顶依次取出被触发的k个订单O(k log n)
+    """
+    __slots__ = ('heap',)
+
+    def __init__(self):
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def insert(self, key, order):
+        """按key插入订单"""
+        heapq.heappush(self.heap, (-key, order['order_id'], order))
+
+    def pop_triggered(self, threshold):
+        """取出所有 key >= threshold 的订单，key大的（优先级高的）在前，key相同时先提交的在前"""
+        heap = self.heap
+        triggered = []
+        while heap and -heap[0][0] >= threshold:
+            triggered.append(heapq.heappop(heap)[2])
+        return triggered
+
 
 class OrderManager:
     """订单管理器 - 处理下单操作并记录交易信息"""
     
-    def __init__(self, initial_capital=1000000, trading_cost_manager=None):
+    def __init__(self, initial_capital=1000000, trading_cost_manager=None, volume_limit=None,
+                 slippage_model=None, price_field_buy='open', price_field_sell='close',
+                 t_plus_one=False):
         """初始化订单管理器
         
         参数:
         initial_capital: 初始资金（默认100万）
         trading_cost_manager: 交易成本管理器实例，如果为None则使用默认配置
+        volume_limit: 成交量限制，每根K线单只股票最多成交 volume_limit × K线成交量，
+                      未成交部分挂单到后续K线继续成交；None表示不限制
+        slippage_model: 滑点模型（见m.core.slippage），None时使用交易成本管理器的固定滑点
+        price_field_buy: 未指定价格的买单使用的K线价格字段
+        price_field_sell: 未指定价格的卖单使用的K线价格字段
+        t_plus_one: 是否按A股T+1规则限制当日买入的股票不能当日卖出
         """
         self.initial_capital = initial_capital
         self.current_capital = initial_capital
+        self.volume_limit = volume_limit
+        self.price_field_buy = price_field_buy
+        self.price_field_sell = price_field_sell
+        self.t_plus_one = t_plus_one
         
         # 交易成本管理器
         if trading_cost_manager is None:
@@ -20,6 +64,11 @@ class OrderManager:
         else:
             self.trading_cost_manager = trading_cost_manager
         
+        # 滑点模型
+        if slippage_model is None:
+            slippage_model = FixedSlippage(self.trading_cost_manager.slippage)
+        self.slippage_model = slippage_model
+        
         # 持仓管理
         self.positions = {}  # 股票代码 -> 持仓数量
         self.avg_prices = {}  # 股票代码 -> 平均持仓成本
@@ -29,13 +78,439 @@ class OrderManager:
         
         # 订单ID计数器
         self.order_id_counter = 1
+        
+        # 当前K线数据：股票代码 -> K线
+        self.current_bars = {}
+        
+        # 挂单管理（仅在设置volume_limit时使用）
+        self.open_orders = {}  # 订单ID -> 订单
+        self.order_queues = {}  # 股票代码 -> 按提交顺序排列的挂单队列
+        self.pending_sell = {}  # 股票代码 -> 挂单中尚未成交的卖出数量
+        self.capacity = None  # 股票代码 -> 当前K线剩余可成交数量，None表示尚未收到K线
+        
+        # 限价单/止损单：股票代码 -> {类型 -> _PriceBook}
+        self.order_books = {}
+        
+        # T+1：当前交易日和当日买入数量
+        self.trading_day = None
+        self.today_bought = {}  # 股票代码 -> 当日买入数量
+        
+        # 批量撮合：begin_batch()之后提交的市价单先登记，flush_batch()时统一撮合，None表示逐单撮合
+        self.batch = None
+    
+    @staticmethod
+    def _bar_value(bar, field):
+        """读取K线字段，缺失时返回NaN"""
+        if bar is None:
+            return np.nan
+        value = bar.get(field) if hasattr(bar, 'get') else getattr(bar, field, None)
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan
+    
+    def update_bars(self, bars, timestamp=None, codes=None):
+        """进入新的K线：记录行情，按成交量限制重置可成交数量，并撮合挂单
+        
+        先按提交顺序撮合市价挂单，再用K线的最高价/最低价触发限价单和止损单。
+        只处理有挂单且当前K线有数据的股票；本根K线上的所有成交先分配数量，
+        再一次性批量计算成交价格。
+        
+        参数:
+        bars: 股票代码 -> K线数据（字典或可按属性访问的对象）
+        timestamp: 当前K线时间
+        codes: 只有这些股票有新行情（Tick回测中为当前事件的股票），只撮合和重置这些股票，
+               None表示bars中的所有股票
+        
+        返回:
+        list: 本根K线挂单产生的成交记录
+        """
+        self.current_bars = bars
+        self._roll_trading_day(timestamp)
+        active = bars if codes is None else [code for code in codes if code in bars]
+        
+        if self.volume_limit is not None:
+            # 可成交数量在首次用到某只股票时才计算
+            if codes is None or self.capacity is None:
+                self.capacity = {}
+            else:
+                for code in active:
+                    self.capacity.pop(code, None)
+        capacities = {}
+        
+        # 按队列顺序分配每个市价挂单的成交数量
+        allocations = []
+        for stock_code in [code for code in self.order_queues if code in active]:
+            capacity = self._get_capacity(stock_code)
+            for order in self.order_queues[stock_code]:
+                if order['status'] != 'open':
+                    continue
+                volume = self._available_volume(capacity, order['remaining'])
+                if volume <= 0:
+                    break
+                allocations.append((order, volume, None))
+                capacity -= volume
+                if volume < order['remaining']:
+                    break
+            capacities[stock_code] = capacity
+        
+        # 触发限价单和止损单
+        triggered = []
+        for stock_code in [code for code in self.order_books if code in active]:
+            capacity = capacities.get(stock_code, self._get_capacity(stock_code))
+            for order, base_price in self._trigger_orders(stock_code, bars[stock_code]):
+                if order['status'] != 'open':
+                    continue
+                triggered.append(order)
+                volume = self._available_volume(capacity, order['remaining'])
+                if volume > 0:
+                    allocations.append((order, volume, base_price))
+                    capacity -= volume
+            capacities[stock_code] = capacity
+        
+        trades_before = len(self.trade_history)
+        if allocations:
+            prices = self._execution_prices([order for order, _, _ in allocations],
+                                            [volume for _, volume, _ in allocations],
+                                            [base_price for _, _, base_price in allocations])
+            for (order, volume, _), price in zip(allocations, prices):
+                if order['status'] == 'open':
+                    self._apply_fill(order, volume, price, timestamp)
+        
+        # 触发后未全部成交的订单：限价单放回价格索引，止损单转为市价挂单
+        for order in triggered:
+            if order['status'] != 'open':
+                continue
+            if order['style'] == 'limit':
+                self._book_order(order)
+            else:
+                order['style'] = 'market'
+                order['price'] = None
+                self._queue_order(order)
+        
+        # 移除队首已结束的订单
+        for stock_code in [code for code in self.order_queues if code in active]:
+            queue = self.order_queues[stock_code]
+            while queue and queue[0]['status'] != 'open':
+                queue.popleft()
+            if not queue:
+                del self.order_queues[stock_code]
+        return self.trade_history[trades_before:]
+    
+    def begin_batch(self):
+        """开始收集本根K线上提交的市价单（如handle_data中的下单），flush_batch()时统一撮合"""
+        self.batch = []
+    
+    def flush_batch(self, timestamp=None):
+        """撮合begin_batch()之后提交的市价单
+        
+        按提交顺序分配当前K线的可成交数量，再一次性批量计算所有成交的价格；
+        未成交部分在设置volume_limit时挂单到后续K线，否则结束
+        
+        参数:
+        timestamp: 成交时间，None时使用各订单的提交时间
+        
+        返回:
+        list: 本批订单的成交记录
+        """
+        batch, self.batch = self.batch, None
+        if not batch:
+            return []
+        
+        allocations = []
+        capacities = {}
+        for order in batch:
+            if order['status'] != 'open':
+                continue
+            stock_code = order['stock_code']
+            capacity = capacities.get(stock_code)
+            if capacity is None:
+                capacity = self._get_capacity(stock_code)
+            volume = self._available_volume(capacity, order['remaining'])
+            if volume > 0:
+                allocations.append((order, volume))
+                capacity -= volume
+            capacities[stock_code] = capacity
+        
+        trades_before = len(self.trade_history)
+        if allocations:
+            prices = self._execution_prices([order for order, _ in allocations],
+                                            [volume for _, volume in allocations])
+            for (order, volume), price in zip(allocations, prices):
+                if order['status'] == 'open':
+                    self._apply_fill(order, volume, price,
+                                     order['timestamp'] if timestamp is None else timestamp)
+        
+        for order in batch:
+            if order['status'] != 'open':
+                continue
+            if self.volume_limit is None:
+                # 不限制成交量时无法成交的订单直接结束
+                order['status'] = 'rejected'
+                self._close_order(order)
+            else:
+                order['price'] = None
+                self._queue_order(order)
+        return self.trade_history[trades_before:]
+    
+    def has_pending(self, stock_code):
+        """某只股票是否有挂单（市价挂单或限价单/止损单）"""
+        return stock_code in self.order_queues or stock_code in self.order_books
+    
+    def _roll_trading_day(self, timestamp):
+        """进入新的交易日时清空当日买入数量"""
+        if timestamp is None:
+            return
+        trading_day = pd.Timestamp(timestamp).normalize()
+        if trading_day != self.trading_day:
+            self.trading_day = trading_day
+            self.today_bought = {}
+    
+    def _trigger_orders(self, stock_code, bar):
+        """
+        用K线的最高价/最低价触发一只股票的条件单
+        
+        返回:
+        list: (订单, 基准成交价) 列表；跳空时按开盘价成交
+        """
+        books = self.order_books[stock_code]
+        close = self._bar_value(bar, 'close')
+        open_price = self._bar_value(bar, 'open')
+        high = self._bar_value(bar, 'high')
+        low = self._bar_value(bar, 'low')
+        high = close if np.isnan(high) else high
+        low = close if np.isnan(low) else low
+        
+        triggered = []
+        if not np.isnan(low):
+            # 买入限价单：限价 >= 最低价
+            for order in books['buy_limit'].pop_triggered(low):
+                price = order['limit_price']
+                triggered.append((order, price if np.isnan(open_price) else min(price, open_price)))
+            # 卖出止损单：止损价 >= 最低价
+            for order in books['sell_stop'].pop_triggered(low):
+                price = order['stop_price']
+                triggered.append((order, price if np.isnan(open_price) else min(price, open_price)))
+        if not np.isnan(high):
+            # 卖出限价单：限价 <= 最高价
+            for order in books['sell_limit'].pop_triggered(-high):
+                price = order['limit_price']
+                triggered.append((order, price if np.isnan(open_price) else max(price, open_price)))
+            # 买入止损单：止损价 <= 最高价
+            for order in books['buy_stop'].pop_triggered(-high):
+                price = order['stop_price']
+                triggered.append((order, price if np.isnan(open_price) else max(price, open_price)))
+        
+        if not any(books.values()):
+            del self.order_books[stock_code]
+        return triggered
+    
+    def _book_order(self, order):
+        """将限价单/止损单放入价格索引"""
+        books = self.order_books.get(order['stock_code'])
+        if books is None:
+            books = self.order_books[order['stock_code']] = {
+                'buy_limit': _PriceBook(), 'sell_limit': _PriceBook(),
+                'buy_stop': _PriceBook(), 'sell_stop': _PriceBook()
+            }
+        if order['style'] == 'limit':
+            price = order['limit_price']
+            key = price if order['direction'] == 'buy' else -price
+        else:
+            price = order['stop_price']
+            key = -price if order['direction'] == 'buy' else price
+        books[f"{order['direction']}_{order['style']}"].insert(key, order)
+    
+    def _queue_order(self, order):
+        """将订单加入股票的市价挂单队列"""
+        queue = self.order_queues.get(order['stock_code'])
+        if queue is None:
+            queue = self.order_queues[order['stock_code']] = deque()
+        queue.append(order)
+    
+    def _get_capacity(self, stock_code):
+        """当前K线某只股票的剩余可成交数量（volume_limit × K线成交量，扣除已成交数量）"""
+        if self.capacity is None:
+            return float('inf')
+        capacity = self.capacity.get(stock_code)
+        if capacity is None:
+            bar = self.current_bars.get(stock_code)
+            if bar is None:
+                capacity = 0
+            else:
+                volume = self._bar_value(bar, 'volume')
+                # 没有成交量数据时不限制
+                capacity = float('inf') if np.isnan(volume) else volume * self.volume_limit
+            self.capacity[stock_code] = capacity
+        return capacity
+    
+    def _available_volume(self, capacity, volume):
+        """可成交数量（按最小合约数取整，全部成交时不取整）"""
+        if volume <= capacity:
+            return volume
+        lot = self.trading_cost_manager.min_contracts or 1
+        return int(capacity // lot * lot)
+    
+    def _order_price(self, order):
+        """订单的基准价格：限定价格，或当前K线上对应方向的价格字段"""
+        if order['price'] is not None:
+            return order['price']
+        field = self.price_field_buy if order['direction'] == 'buy' else self.price_field_sell
+        return self._bar_value(self.current_bars.get(order['stock_code']), field)
+    
+    def _execution_prices(self, orders, volumes, base_prices=None):
+        """批量计算一组成交的实际价格（含滑点），限价单的成交价格不会劣于限价
+        
+        参数:
+        orders: 订单列表
+        volumes: 成交数量列表
+        base_prices: 基准价格列表（None项使用订单价格或K线价格字段）
+        """
+        if base_prices is None:
+            base_prices = [None] * len(orders)
+        bars = [self.current_bars.get(order['stock_code']) for order in orders]
+        prices = np.array([self._order_price(order) if base_price is None else base_price
+                           for order, base_price in zip(orders, base_prices)], dtype=np.float64)
+        directions = np.array([1.0 if order['direction'] == 'buy' else -1.0 for order in orders])
+        bar_volumes = np.array([self._bar_value(bar, 'volume') for bar in bars])
+        spreads = np.array([self._bar_value(bar, 'ask1') - self._bar_value(bar, 'bid1') for bar in bars])
+        result = self.slippage_model.execution_prices(prices, volumes, directions,
+                                                      bar_volumes=bar_volumes, spreads=spreads)
+        limits = np.array([order.get('limit_price') if order.get('style') == 'limit' else np.nan
+                           for order in orders], dtype=np.float64)
+        has_limit = ~np.isnan(limits)
+        if has_limit.any():
+            result[has_limit] = np.where(directions[has_limit] > 0,
+                                         np.minimum(result[has_limit], limits[has_limit]),
+                                         np.maximum(result[has_limit], limits[has_limit]))
+        return result
+    
+    def _fill_order(self, order, timestamp):
+        """在当前K线的可成交数量内撮合单个订单，返回本次成交数量"""
+        volume = self._available_volume(self._get_capacity(order['stock_code']), order['remaining'])
+        if volume <= 0:
+            return 0
+        price = self._execution_prices([order], [volume])[0]
+        return self._apply_fill(order, volume, price, timestamp)
+    
+    def _apply_fill(self, order, volume, execution_price, timestamp):
+        """按给定成交价格成交订单的一部分，更新订单和可成交数量，返回实际成交数量"""
+        stock_code = order['stock_code']
+        execution_price = float(execution_price)
+        if np.isnan(execution_price):
+            order['status'] = 'rejected'
+            order['message'] = '没有可用的成交价格'
+            filled = 0
+        elif order['direction'] == 'buy':
+            filled = self._execute_buy(order, volume, execution_price, timestamp)
+        else:
+            filled = self._execute_sell(order, volume, execution_price, timestamp)
+        
+        if filled > 0:
+            order['remaining'] -= filled
+            order['filled_volume'] += filled
+            if self.capacity is not None:
+                self.capacity[stock_code] = self._get_capacity(stock_code) - filled
+            if order['direction'] == 'sell' and order['order_id'] in self.open_orders:
+                self.pending_sell[stock_code] -= filled
+        
+        if order['remaining'] <= 0:
+            order['status'] = 'filled'
+        if order['status'] != 'open':
+            self._close_order(order)
+        return filled
+    
+    def _close_order(self, order):
+        """订单结束（全部成交或撤销）后移出挂单表"""
+        if self.open_orders.pop(order['order_id'], None) is not None and order['direction'] == 'sell':
+            stock_code = order['stock_code']
+            self.pending_sell[stock_code] -= order['remaining']
+            if self.pending_sell[stock_code] <= 0:
+                del self.pending_sell[stock_code]
+    
+    def _submit(self, stock_code, direction, price, volume, timestamp,
+                style='market', limit_price=None, stop_price=None):
+        """创建订单：市价单在当前K线内尽量成交（批量撮合时登记到本批），剩余部分挂单；条件单放入价格索引"""
+        order = {
+            'order_id': self.order_id_counter,
+            'timestamp': timestamp,
+            'stock_code': stock_code,
+            'direction': direction,
+            'style': style,
+            'price': price,
+            'limit_price': limit_price,
+            'stop_price': stop_price,
+            'volume': volume,
+            'filled_volume': 0,
+            'remaining': volume,
+            'status': 'open'
+        }
+        self.order_id_counter += 1
+        
+        batched = False
+        if style == 'market' and (self.volume_limit is None or not self.order_queues.get(stock_code)):
+            # 没有排在前面的挂单
+            if self.batch is not None:
+                # 批量撮合时先登记，flush_batch()时与本根K线的其他订单一起计算成交价格
+                self.batch.append(order)
+                batched = True
+            else:
+                self._fill_order(order, timestamp)
+                if order['status'] == 'open' and self.volume_limit is None:
+                    # 不限制成交量时无法成交的订单直接结束
+                    order['status'] = 'rejected'
+        
+        if order['status'] == 'open':
+            self.open_orders[order['order_id']] = order
+            if direction == 'sell':
+                self.pending_sell[stock_code] = self.pending_sell.get(stock_code, 0) + order['remaining']
+            if style == 'market':
+                if not batched:
+                    # 挂单在后续K线上按当时K线的价格字段成交，不沿用提交时的价格
+                    order['price'] = None
+                    self._queue_order(order)
+            else:
+                # 条件单从下一根K线开始参与撮合
+                self._book_order(order)
+        return order
+    
+    def _result(self, order):
+        """将订单转换为下单结果"""
+        direction = '买入' if order['direction'] == 'buy' else '卖出'
+        if order['status'] == 'rejected':
+            return {
+                'success': False,
+                'order_id': order['order_id'],
+                'message': order.get('message', f'{direction}失败')
+            }
+        if order['status'] == 'filled':
+            message = f"{direction}成功: {order['stock_code']} {order['volume']}股 @ {order.get('execution_price')}"
+        elif self.batch and self.batch[-1] is order:
+            message = f"{direction}已提交: {order['stock_code']} {order['volume']}股，本根K线统一撮合"
+        elif order['filled_volume'] == 0:
+            message = f"{direction}已挂单: {order['stock_code']} {order['volume']}股，等待后续K线成交"
+            if order['style'] != 'market':
+                style = '限价单' if order['style'] == 'limit' else '止损单'
+                trigger = order['limit_price'] if order['style'] == 'limit' else order['stop_price']
+                message = f"{direction}{style}已挂单: {order['stock_code']} {order['volume']}股 @ {trigger}"
+        else:
+            message = (f"{direction}部分成交: {order['stock_code']} 已成交{order['filled_volume']}股，"
+                       f"剩余{order['remaining']}股挂单")
+        return {
+            'success': True,
+            'order_id': order['order_id'],
+            'status': order['status'],
+            'filled_volume': order['filled_volume'],
+            'remaining_volume': order['remaining'],
+            'message': message
+        }
     
     def buy(self, stock_code, price, volume, timestamp=None):
         """买入股票
         
         参数:
         stock_code: 股票代码
-        price: 买入价格
+        price: 买入价格，None时使用当前K线的price_field_buy字段
         volume: 买入数量
         timestamp: 交易时间戳
         
@@ -49,8 +524,159 @@ class OrderManager:
                 'message': f'买入数量小于最小合约数{self.trading_cost_manager.min_contracts}'
             }
         
-        # 应用滑点
-        execution_price = price + self.trading_cost_manager.slippage
+        return self._result(self._submit(stock_code, 'buy', price, volume, timestamp))
+    
+    def sell(self, stock_code, price, volume, timestamp=None):
+        """卖出股票
+        
+        参数:
+        stock_code: 股票代码
+        price: 卖出价格，None时使用当前K线的price_field_sell字段
+        volume: 卖出数量
+        timestamp: 交易时间戳
+        
+        返回:
+        dict: 订单执行结果
+        """
+        # 检查是否有足够的可卖持仓（扣除当日买入和挂单中尚未成交的卖出数量）
+        if self.get_sellable_volume(stock_code) < volume:
+            return {
+                'success': False,
+                'message': '持仓不足'
+            }
+        
+        # 检查最小合约数
+        if volume < self.trading_cost_manager.min_contracts:
+            return {
+                'success': False,
+                'message': f'卖出数量小于最小合约数{self.trading_cost_manager.min_contracts}'
+            }
+        
+        return self._result(self._submit(stock_code, 'sell', price, volume, timestamp))
+    
+    def liquidate(self, stock_code, price, timestamp=None):
+        """回测结束时平仓：撤销该股票的挂单后卖出全部可卖持仓
+        
+        不受volume_limit限制，也不进入批量撮合，未能成交的部分不会挂单
+        
+        参数:
+        stock_code: 股票代码
+        price: 卖出价格，None时使用当前K线的price_field_sell字段
+        timestamp: 交易时间戳
+        
+        返回:
+        dict: 订单执行结果
+        """
+        for order in self.get_open_orders(stock_code):
+            self.cancel_order(order['order_id'])
+        self.order_queues.pop(stock_code, None)
+        
+        volume = self.get_sellable_volume(stock_code)
+        if volume <= 0:
+            return {
+                'success': False,
+                'message': '没有可卖持仓'
+            }
+        
+        volume_limit, capacity, batch = self.volume_limit, self.capacity, self.batch
+        self.volume_limit, self.capacity, self.batch = None, None, None
+        try:
+            order = self._submit(stock_code, 'sell', price, volume, timestamp)
+        finally:
+            self.volume_limit, self.capacity, self.batch = volume_limit, capacity, batch
+        return self._result(order)
+    
+    def order(self, stock_code, amount, style='market', limit_price=None, stop_price=None,
+              price=None, timestamp=None):
+        """下单
+        
+        参数:
+        stock_code: 股票代码
+        amount: 下单数量，正数为买入，负数为卖出
+        style: 订单类型
+               market 市价单：按price（None时使用K线价格字段）成交
+               limit 限价单：买入在最低价不高于限价时、卖出在最高价不低于限价时成交，成交价不劣于限价
+               stop 止损单：买入在最高价不低于止损价时、卖出在最低价不高于止损价时触发，触发后按市价成交
+        limit_price: 限价（limit）
+        stop_price: 止损价（stop）
+        price: 市价单的成交价格
+        timestamp: 交易时间戳
+        
+        返回:
+        dict: 订单执行结果
+        """
+        if style not in ('market', 'limit', 'stop'):
+            return {'success': False, 'message': f'不支持的订单类型: {style}'}
+        if style == 'limit' and limit_price is None:
+            return {'success': False, 'message': '限价单需要指定limit_price'}
+        if style == 'stop' and stop_price is None:
+            return {'success': False, 'message': '止损单需要指定stop_price'}
+        if amount == 0:
+            return {'success': False, 'message': '下单数量不能为0'}
+        
+        direction = 'buy' if amount > 0 else 'sell'
+        volume = abs(amount)
+        if volume < self.trading_cost_manager.min_contracts:
+            action = '买入' if direction == 'buy' else '卖出'
+            return {
+                'success': False,
+                'message': f'{action}数量小于最小合约数{self.trading_cost_manager.min_contracts}'
+            }
+        if direction == 'sell' and self.get_sellable_volume(stock_code) < volume:
+            return {
+                'success': False,
+                'message': '持仓不足'
+            }
+        
+        return self._result(self._submit(stock_code, direction, price, volume, timestamp,
+                                         style=style, limit_price=limit_price, stop_price=stop_price))
+    
+    def get_sellable_volume(self, stock_code):
+        """获取可卖数量：持仓减去当日买入（T+1）和挂单中尚未成交的卖出数量
+        
+        参数:
+        stock_code: 股票代码
+        
+        返回:
+        int: 可卖数量
+        """
+        volume = self.positions.get(stock_code, 0) - self.pending_sell.get(stock_code, 0)
+        if self.t_plus_one:
+            volume -= self.today_bought.get(stock_code, 0)
+        return volume
+    
+    def cancel_order(self, order_id):
+        """撤销挂单
+        
+        参数:
+        order_id: 订单ID
+        
+        返回:
+        bool: 是否撤销成功
+        """
+        order = self.open_orders.get(order_id)
+        if order is None:
+            return False
+        # 队列和价格索引中的订单在撮合时惰性移除
+        order['status'] = 'cancelled'
+        self._close_order(order)
+        return True
+    
+    def get_open_orders(self, stock_code=None):
+        """获取挂单
+        
+        参数:
+        stock_code: 股票代码，None表示所有股票
+        
+        返回:
+        list: 挂单列表
+        """
+        return [order for order in self.open_orders.values()
+                if stock_code is None or order['stock_code'] == stock_code]
+    
+    def _execute_buy(self, order, volume, execution_price, timestamp):
+        """按成交价格（已含滑点）买入指定数量，返回实际成交数量"""
+        stock_code = order['stock_code']
         
         # 计算买入成本
         total_cost, commission, transfer_fee = self.trading_cost_manager.calculate_buy_cost(
@@ -59,10 +685,9 @@ class OrderManager:
         
         # 检查资金是否足够
         if total_cost > self.current_capital:
-            return {
-                'success': False,
-                'message': '资金不足'
-            }
+            order['status'] = 'rejected'
+            order['message'] = '资金不足'
+            return 0
         
         # 执行买入
         self.current_capital -= total_cost
@@ -77,12 +702,12 @@ class OrderManager:
             self.positions[stock_code] = volume
             self.avg_prices[stock_code] = execution_price
         
-        # 记录交易
-        order_id = self.order_id_counter
-        self.order_id_counter += 1
+        if self.t_plus_one:
+            self.today_bought[stock_code] = self.today_bought.get(stock_code, 0) + volume
         
+        # 记录交易
         trade_record = {
-            'order_id': order_id,
+            'order_id': order['order_id'],
             'timestamp': timestamp,
             'stock_code': stock_code,
             'direction': 'buy',
@@ -97,47 +722,29 @@ class OrderManager:
         }
         
         self.trade_history.append(trade_record)
-        
-        return {
-            'success': True,
-            'order_id': order_id,
-            'message': f'买入成功: {stock_code} {volume}股 @ {execution_price}'
-        }
+        order['execution_price'] = execution_price
+        return volume
     
-    def sell(self, stock_code, price, volume, timestamp=None):
-        """卖出股票
-        
-        参数:
-        stock_code: 股票代码
-        price: 卖出价格
-        volume: 卖出数量
-        timestamp: 交易时间戳
-        
-        返回:
-        dict: 订单执行结果
-        """
-        # 检查是否有足够的持仓
-        if stock_code not in self.positions or self.positions[stock_code] < volume:
-            return {
-                'success': False,
-                'message': '持仓不足'
-            }
-        
-        # 检查最小合约数
-        if volume < self.trading_cost_manager.min_contracts:
-            return {
-                'success': False,
-                'message': f'卖出数量小于最小合约数{self.trading_cost_manager.min_contracts}'
-            }
-        
-        # 应用滑点
-        execution_price = price - self.trading_cost_manager.slippage
+    def _execute_sell(self, order, volume, execution_price, timestamp):
+        """按成交价格（已含滑点）卖出指定数量，返回实际成交数量"""
+        stock_code = order['stock_code']
+        held = self.positions.get(stock_code, 0)
+        if self.t_plus_one:
+            held -= self.today_bought.get(stock_code, 0)
+        volume = min(volume, held)
+        if volume <= 0:
+            order['status'] = 'rejected'
+            order['message'] = '持仓不足'
+            return 0
         
         # 计算卖出收入
         total_revenue, commission, stamp_duty, transfer_fee = self.trading_cost_manager.calculate_sell_cost(
             execution_price, volume
         )
         
+        # 已实现盈亏（相对持仓均价）
+        pnl = total_revenue - volume * self.avg_prices.get(stock_code, execution_price)
+        
         # 执行卖出
         self.current_capital += total_revenue
         self.positions[stock_code] -= volume
@@ -148,17 +755,15 @@ class OrderManager:
             del self.avg_prices[stock_code]
         
         # 记录交易
-        order_id = self.order_id_counter
-        self.order_id_counter += 1
-        
         trade_record = {
-            'order_id': order_id,
+            'order_id': order['order_id'],
             'timestamp': timestamp,
             'stock_code': stock_code,
             'direction': 'sell',
             'price': execution_price,
             'volume': volume,
             'total_revenue': total_revenue,
+            'pnl': pnl,
             'commission': commission,
             'stamp_duty': stamp_duty,
             'transfer_fee': transfer_fee,
@@ -168,12 +773,36 @@ class OrderManager:
         }
         
         self.trade_history.append(trade_record)
+        order['execution_price'] = execution_price
+        return volume
+    
+    # 需要保存到检查点的状态属性
+    _STATE_FIELDS = ('current_capital', 'positions', 'avg_prices', 'trade_history', 'order_id_counter',
+                     'open_orders', 'order_queues', 'pending_sell', 'order_books',
+                     'trading_day', 'today_bought')
+    
+    def get_state(self):
+        """获取可保存的状态（用于检查点）
         
-        return {
-            'success': True,
-            'order_id': order_id,
-            'message': f'卖出成功: {stock_code} {volume}股 @ {execution_price}'
-        }
+        挂单在open_orders、队列和价格索引中是同一个对象，整体序列化时会保持共享关系
+        
+        返回:
+        dict: 状态字典
+        """
+        return {name: getattr(self, name) for name in self._STATE_FIELDS}
+    
+    def set_state(self, state):
+        """从get_state()的结果恢复状态
+        
+        参数:
+        state: 状态字典
+        """
+        for name in self._STATE_FIELDS:
+            if name in state:
+                setattr(self, name, state[name])
+        self.current_bars = {}
+        self.capacity = None
+        self.batch = None
     
     def get_position(self, stock_code):
         """获取指定股票的持仓信息
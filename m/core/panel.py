@@ -0,0 +1,287 @@
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+
+from m.core.bar_aggregator import aggregate, frame_to_arrays, FREQUENCIES, NS_PER_DAY
+
+
+class BarRow:
+    """
+    面板中一只股票一根K线的轻量视图
+
+    不复制数据，字段访问直接索引面板数组：bar.close、bar['close']、
+    hasattr(bar, 'k') 都等价于查找 fields['close'][t, j]
+    """
+    __slots__ = ('_panel', '_t', '_j')
+
+    def __init__(self, panel, t, j):
+        self._panel = panel
+        self._t = t
+        self._j = j
+
+    def __getattr__(self, name):
+        values = self._panel.fields.get(name)
+        if values is None:
+            raise AttributeError(name)
+        return values[self._t, self._j]
+
+    def __getitem__(self, name):
+        if name in ('code', 'datetime', 'date'):
+            return getattr(self, name)
+        return self._panel.fields[name][self._t, self._j]
+
+    def __contains__(self, name):
+        return name in self._panel.fields
+
+    @property
+    def code(self):
+        """股票代码"""
+        return self._panel.codes[self._j]
+
+    @property
+    def datetime(self):
+        """K线时间（pandas.Timestamp）"""
+        return pd.Timestamp(int(self._panel.timestamps[self._t]))
+
+    @property
+    def date(self):
+        """K线日期（pandas.Timestamp）"""
+        return self.datetime.normalize()
+
+    @property
+    def filled(self):
+        """是否为向前填充的K线"""
+        return bool(self._panel.filled[self._t, self._j])
+
+    def get(self, name, default=None):
+        """获取字段值，不存在时返回default"""
+        values = self._panel.fields.get(name)
+        return default if values is None else values[self._t, self._j]
+
+    def keys(self):
+        """字段名"""
+        return self._panel.fields.keys()
+
+    def items(self):
+        """(字段名, 值) 迭代器"""
+        t, j = self._t, self._j
+        return ((name, values[t, j]) for name, values in self._panel.fields.items())
+
+    def to_dict(self):
+        """转换为字典（会复制数据）"""
+        result = dict(self.items())
+        result['code'] = self.code
+        result['datetime'] = self.datetime
+        return result
+
+    def __repr__(self):
+        return f"BarRow(code={self.code}, datetime={self.datetime})"
+
+
+class PanelRows(Mapping):
+    """
+    面板某一时刻的 股票代码 -> BarRow 映射
+
+    默认包含该时刻有K线的股票，也可以只包含指定的列（如被触发的股票）；
+    BarRow在访问时才创建
+    """
+    __slots__ = ('_panel', '_t', '_columns', '_members')
+
+    def __init__(self, panel, t, columns=None):
+        self._panel = panel
+        self._t = t
+        if columns is None:
+            self._columns = np.flatnonzero(panel.valid[t])
+            self._members = None
+        else:
+            self._columns = columns
+            self._members = set(columns.tolist())
+
+    def _has(self, j):
+        if self._members is None:
+            return bool(self._panel.valid[self._t, j])
+        return j in self._members
+
+    def __getitem__(self, code):
+        j = self._panel.code_index.get(code)
+        if j is None or not self._has(j):
+            raise KeyError(code)
+        return BarRow(self._panel, self._t, j)
+
+    def __contains__(self, code):
+        j = self._panel.code_index.get(code)
+        return j is not None and self._has(j)
+
+    def __iter__(self):
+        codes = self._panel.codes
+        return (codes[j] for j in self._columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def items(self):
+        panel, t, codes = self._panel, self._t, self._panel.codes
+        return ((codes[j], BarRow(panel, t, j)) for j in self._columns)
+
+    def values(self):
+        panel, t = self._panel, self._t
+        return (BarRow(panel, t, j) for j in self._columns)
+
+
+class BarPanel:
+    """
+    多股票K线面板
+
+    所有股票的K线按统一的时间轴对齐：
+    timestamps: 长度为T的时间轴（int64纳秒）
+    codes: 长度为N的股票代码
+    fields: 字典，字段名 -> T×N的float数组，无数据处为NaN
+    valid: T×N的布尔数组，表示该时刻该股票是否有K线
+    filled: T×N的布尔数组，表示该位置的数据是由之前的K线向前填充的（停牌等缺失K线）
+    """
+
+    def __init__(self, timestamps, codes, fields, valid, frequency='daily', filled=None):
+        self.timestamps = timestamps
+        self.codes = list(codes)
+        self.code_index = {code: j for j, code in enumerate(self.codes)}
+        self.fields = fields
+        self.valid = valid
+        self.frequency = frequency
+        self.filled = filled if filled is not None else np.zeros_like(valid)
+        # 列号 -> 该股票有K线的行号（history()中按需计算）
+        self._valid_rows = {}
+
+    @classmethod
+    def from_frames(cls, data, frequency='daily', start_date=None, end_date=None, time_field=None):
+        """
+        由分钟线（或更低频率的K线）构建指定频率的面板
+
+        参数:
+        data: 字典，股票代码 -> DataFrame
+        frequency: 目标频率，见FREQUENCIES
+        start_date: 开始日期
+        end_date: 结束日期（包含当天）
+        time_field: 时间字段名，None时自动检测
+
+        返回:
+        BarPanel实例
+        """
+        start_ns = pd.Timestamp(start_date).value if start_date else None
+        end_ns = pd.Timestamp(end_date).normalize().value + NS_PER_DAY if end_date else None
+
+        codes = list(data.keys())
+        bars = []
+        for code in codes:
+            times, fields = frame_to_arrays(data[code], time_field)
+            begin = np.searchsorted(times, start_ns, side='left') if start_ns is not None else 0
+            end = np.searchsorted(times, end_ns, side='left') if end_ns is not None else len(times)
+            times = times[begin:end]
+            fields = {name: values[begin:end] for name, values in fields.items()}
+            bars.append(aggregate(times, fields, frequency))
+
+        if bars:
+            timestamps = np.unique(np.concatenate([bar_times for bar_times, _ in bars]))
+        else:
+            timestamps = np.zeros(0, dtype=np.int64)
+
+        shape = (len(timestamps), len(codes))
+        valid = np.zeros(shape, dtype=bool)
+        panel_fields = {}
+        for j, (bar_times, bar_fields) in enumerate(bars):
+            rows = np.searchsorted(timestamps, bar_times)
+            valid[rows, j] = True
+            for name, values in bar_fields.items():
+                if name not in panel_fields:
+                    panel_fields[name] = np.full(shape, np.nan)
+                panel_fields[name][rows, j] = values
+
+        return cls(timestamps, codes, panel_fields, valid, frequency)
+
+    def align(self, timestamps, fill='ffill'):
+        """
+        按给定的时间轴（如交易日历）重新对齐面板
+
+        参数:
+        timestamps: 目标时间轴（int64纳秒、日期或时间戳序列）
+        fill: 缺失K线的处理方式
+              'ffill' 用该股票之前最近一根K线向前填充（上市前仍为NaN），并在filled中标记
+              None 不填充，缺失位置为NaN
+
+        返回:
+        新的BarPanel，valid只在真实存在K线的位置为True
+        """
+        timestamps = pd.to_datetime(np.asarray(timestamps)).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        if FREQUENCIES.get(self.frequency) is None:
+            timestamps = timestamps // NS_PER_DAY * NS_PER_DAY
+        timestamps = np.unique(timestamps)
+
+        shape = (len(timestamps), len(self.codes))
+        rows = np.searchsorted(timestamps, self.timestamps)
+        present = rows < len(timestamps)
+        present[present] = timestamps[rows[present]] == self.timestamps[present]
+
+        valid = np.zeros(shape, dtype=bool)
+        valid[rows[present]] = self.valid[present]
+        fields = {}
+        for name, values in self.fields.items():
+            aligned = np.full(shape, np.nan)
+            aligned[rows[present]] = values[present]
+            fields[name] = aligned
+
+        filled = np.zeros(shape, dtype=bool)
+        if fill == 'ffill' and len(timestamps):
+            # 每个位置对应的最近一根有效K线所在行（之前没有K线时为-1）
+            source = np.where(valid, np.arange(shape[0])[:, None], -1)
+            np.maximum.accumulate(source, axis=0, out=source)
+            listed = source >= 0
+            filled = listed & ~valid
+            columns = np.broadcast_to(np.arange(shape[1]), shape)
+            source_rows = np.maximum(source, 0)
+            for name in fields:
+                values = fields[name][source_rows, columns]
+                fields[name] = np.where(listed, values, np.nan)
+
+        return BarPanel(timestamps, self.codes, fields, valid, self.frequency, filled)
+
+    def value(self, t, code, field):
+        """第t个时刻某只股票某个字段的值（含向前填充的值），不存在时返回NaN"""
+        j = self.code_index.get(code)
+        values = self.fields.get(field)
+        if j is None or values is None:
+            return np.nan
+        return values[t, j]
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def datetime(self, t):
+        """第t根K线的时间，日线返回date，其余返回Timestamp"""
+        timestamp = pd.Timestamp(int(self.timestamps[t]))
+        return timestamp.date() if FREQUENCIES.get(self.frequency) is None else timestamp
+
+    def bars(self, t, columns=None):
+        """
+        第t个时刻所有有数据的股票的K线
+
+        参数:
+        t: 时刻序号
+        columns: 只包含这些列号对应的股票，None表示所有有K线的股票
+
+        返回:
+        PanelRows映射，股票代码 -> BarRow（字段可按属性或下标访问）
+        """
+        return PanelRows(self, t, columns)
+
+    def history(self, t, j, size):
+        """
+        某只股票截至第t个时刻（含）最近size根真实K线的各字段数据
+
+        返回:
+        字典，字段名 -> 一维数组（按时间先后排列）
+        """
+        rows = self._valid_rows.get(j)
+        if rows is None:
+            rows = self._valid_rows[j] = np.flatnonzero(self.valid[:, j])
+        end = np.searchsorted(rows, t, side='right')
+        rows = rows[max(end - size, 0):end]
+        return {name: values[rows, j] for name, values in self.fields.items()}
@@ -1,74 +1,208 @@
-import matplotlib
-# 使用非交互式后端，避免Qt GUI错误
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 from datetime import datetime
 
+def _pyplot():
+    """
+    按需导入matplotlib.pyplot
+
+    只有真正绘图时才导入matplotlib并设置字体，回测本身不依赖matplotlib
+    """
+    import matplotlib
+    if matplotlib.get_backend().lower() != 'agg':
+        # 使用非交互式后端，避免Qt GUI错误
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    # 设置中文字体
+    plt.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
+    plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+    return plt
+
+
+def trade_ledger(trade_history):
+    """
+    将交易历史转换为列式账本
+
+    参数:
+    trade_history: 交易记录字典列表（OrderManager.get_trade_history()），已是列式账本时原样返回
+
+    返回:
+    字典，timestamp（int64纳秒，缺失为NaT）、direction（买入1，卖出-1）、total_cost、total_revenue
+    """
+    if isinstance(trade_history, dict):
+        return trade_history
+    timestamps = pd.to_datetime([trade['timestamp'] for trade in trade_history])
+    return {
+        'timestamp': np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64),
+        'direction': np.array([1 if trade['direction'] == 'buy' else -1 for trade in trade_history], dtype=np.int8),
+        'total_cost': np.array([trade.get('total_cost', 0) or 0 for trade in trade_history], dtype=np.float64),
+        'total_revenue': np.array([trade.get('total_revenue', 0) or 0 for trade in trade_history], dtype=np.float64),
+    }
+
+
+def equity_series(ledger, initial_capital=1000000):
+    """
+    由列式账本计算资金曲线（买入减去成本，卖出加上收入）
+
+    返回:
+    (timestamps, equity)，第一个点为第一笔交易时间的初始资金
+    """
+    timestamps = ledger['timestamp']
+    order = np.argsort(timestamps, kind='stable')
+    flows = np.where(ledger['direction'] > 0, -ledger['total_cost'], ledger['total_revenue'])[order]
+    equity = initial_capital + np.concatenate(([0.0], np.cumsum(flows)))
+    timestamps = timestamps[order]
+    return np.concatenate((timestamps[:1], timestamps)), equity
+
+
+def drawdown_series(equity, initial_capital=1000000):
+    """资金曲线相对历史最高点（不低于初始资金）的回撤百分比"""
+    peak = np.maximum.accumulate(np.maximum(equity, initial_capital))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(peak > 0, (equity - peak) / peak * 100, 0.0)
+
+
+def _time_axis(timestamps):
+    """绘图横轴：有交易缺少时间戳时改用交易序号"""
+    if (timestamps == np.iinfo(np.int64).min).any():
+        return np.arange(len(timestamps))
+    return timestamps.astype('datetime64[ns]')
+
+
+def save_plot_artifact(path, trade_history, initial_capital=1000000, m_name=None):
+    """
+    将绘图所需的原始序列保存为紧凑的 .npz 文件，图表可以稍后由render_artifact生成
+
+    参数:
+    path: 文件路径
+    trade_history: 交易历史记录或列式账本
+    initial_capital: 初始资金
+    m_name: 模块名称，用于生成图表文件名
+
+    返回:
+    path
+    """
+    np.savez_compressed(path, initial_capital=np.float64(initial_capital), m_name=np.str_(m_name or ''),
+                        **trade_ledger(trade_history))
+    return path
+
+
+def load_plot_artifact(path):
+    """
+    读取save_plot_artifact保存的文件
+
+    返回:
+    (ledger, initial_capital, m_name)，ledger为列式账本
+    """
+    with np.load(path, allow_pickle=False) as data:
+        ledger = {name: data[name] for name in ('timestamp', 'direction', 'total_cost', 'total_revenue')}
+        return ledger, float(data['initial_capital']), str(data['m_name'])
+
+
+def render_artifact(path, output_dir=None, dpi=300, debug=False):
+    """
+    由绘图数据文件生成收益曲线、回撤曲线和交易分布图
+
+    参数:
+    path: save_plot_artifact保存的文件
+    output_dir: 图表保存目录，None时与数据文件相同
+    dpi: 图片分辨率
+    debug: 是否调试模式
+
+    返回:
+    生成的图片路径列表
+    """
+    ledger, initial_capital, m_name = load_plot_artifact(path)
+    if not len(ledger['direction']):
+        return []
+    output_dir = output_dir or os.path.dirname(os.path.abspath(path))
+    paths = [os.path.join(output_dir, f"backtest_{name}_{m_name}.png")
+             for name in ('equity_curve', 'drawdown', 'trade_distribution')]
+
+    manager = PlottingManager(debug=debug, dpi=dpi)
+    figures = [
+        manager.plot_equity_curve(ledger, initial_capital=initial_capital, save_path=paths[0]),
+        manager.plot_drawdown(ledger, initial_capital=initial_capital, save_path=paths[1]),
+        manager.plot_trade_distribution(ledger, save_path=paths[2]),
+    ]
+    plt = _pyplot()
+    for fig in figures:
+        plt.close(fig)
+    return paths
+
+
+def render_artifact_async(path, output_dir=None, dpi=300, debug=False):
+    """
+    在后台进程中生成图表
+
+    每次调用使用独立的单进程进程池，提交后立即关闭：绘图完成后工作进程随即退出，不会残留
+
+    返回:
+    concurrent.futures.Future，结果为render_artifact的返回值，绘图出错时为对应的异常
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=context)
+    try:
+        return executor.submit(render_artifact, path, output_dir, dpi, debug)
+    finally:
+        executor.shutdown(wait=False)
+
+
 class PlottingManager:
     """绘图管理器 - 用于绘制回测收益曲线和其他图表"""
     
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, dpi=300, max_points=None):
         """
         初始化绘图管理器
         
         参数:
         debug: 是否开启调试模式
+        dpi: 保存图片的分辨率
+        max_points: 曲线最多绘制的点数，超过时降采样（m.core.downsample），None时取图片宽度的像素数
         """
         self.debug = debug
-        
-        # 设置中文字体
-        plt.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
-        plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+        self.dpi = dpi
+        self.max_points = max_points
+    
+    def _downsample(self, x, y, fig, method):
+        """按图片宽度降采样曲线"""
+        from m.core.downsample import downsample
+        max_points = self.max_points or int(fig.get_figwidth() * self.dpi)
+        if self.debug and len(y) > max_points:
+            print(f"[DEBUG] 曲线点数 {len(y)} 超过 {max_points}，使用{method}降采样")
+        return downsample(x, y, max_points, method=method)
     
     def plot_equity_curve(self, trade_history, initial_capital=1000000, save_path=None):
         """
         绘制回测收益曲线
         
         参数:
-        trade_history: 交易历史记录，从OrderManager.get_trade_history()获取
+        trade_history: 交易历史记录（OrderManager.get_trade_history()）或列式账本（trade_ledger()）
         initial_capital: 初始资金
         save_path: 图表保存路径
         
         返回:
         plt.Figure: 生成的图表对象
         """
-        if not trade_history:
+        ledger = trade_ledger(trade_history)
+        if not len(ledger['direction']):
             if self.debug:
                 print("[DEBUG] 没有交易历史记录，无法绘制收益曲线")
             return None
         
-        # 按时间排序交易历史
-        sorted_trades = sorted(trade_history, key=lambda x: x['timestamp'])
-        
-        # 提取时间戳和计算累计收益
-        timestamps = []
-        equity = []
-        current_value = initial_capital
-        
-        # 初始点
-        if sorted_trades:
-            first_timestamp = sorted_trades[0]['timestamp']
-            timestamps.append(first_timestamp)
-            equity.append(current_value)
-        
-        # 遍历交易记录，计算累计收益
-        for trade in sorted_trades:
-            if trade['direction'] == 'buy':
-                # 买入操作：减少资金
-                current_value -= trade.get('total_cost', 0)
-            else:
-                # 卖出操作：增加资金
-                current_value += trade.get('total_revenue', 0)
-            
-            # 添加时间点和对应的值
-            timestamps.append(trade['timestamp'])
-            equity.append(current_value)
+        # 按时间排序后累加每笔交易的资金变动
+        timestamps, equity = equity_series(ledger, initial_capital)
         
-        # 绘制收益曲线
+        plt = _pyplot()
+        
+        # 绘制收益曲线（点数超过图片宽度时降采样）
         fig, ax = plt.subplots(figsize=(12, 6))
-        ax.plot(timestamps, equity, label='权益曲线', linewidth=2)
+        x, y = self._downsample(timestamps, equity, fig, 'lttb')
+        ax.plot(_time_axis(x), y, label='权益曲线', linewidth=2)
         
         # 绘制初始资金线
         ax.axhline(y=initial_capital, color='r', linestyle='--', label='初始资金')
@@ -88,7 +222,7 @@ class PlottingManager:
         fig.autofmt_xdate()
         
         # 计算最终收益和收益率
-        if equity:
+        if len(equity):
             final_value = equity[-1]
             total_return = (final_value - initial_capital) / initial_capital * 100
             
@@ -104,7 +238,7 @@ class PlottingManager:
         # 保存图表
         if save_path:
             try:
-                plt.savefig(save_path, dpi=300, bbox_inches='tight')
+                plt.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
                 if self.debug:
                     print(f"[DEBUG] 收益曲线已保存到: {save_path}")
             except Exception as e:
@@ -125,52 +259,22 @@ class PlottingManager:
         返回:
         plt.Figure: 生成的图表对象
         """
-        if not trade_history:
+        ledger = trade_ledger(trade_history)
+        if not len(ledger['direction']):
             if self.debug:
                 print("[DEBUG] 没有交易历史记录，无法绘制回撤曲线")
             return None
         
-        # 按时间排序交易历史
-        sorted_trades = sorted(trade_history, key=lambda x: x['timestamp'])
-        
         # 计算累计收益和回撤
-        timestamps = []
-        equity = []
-        drawdown = []
-        current_value = initial_capital
-        peak_value = initial_capital
-        
-        # 初始点
-        if sorted_trades:
-            first_timestamp = sorted_trades[0]['timestamp']
-            timestamps.append(first_timestamp)
-            equity.append(current_value)
-            drawdown.append(0)
-        
-        # 遍历交易记录
-        for trade in sorted_trades:
-            if trade['direction'] == 'buy':
-                current_value -= trade.get('total_cost', 0)
-            else:
-                current_value += trade.get('total_revenue', 0)
-            
-            # 更新峰值
-            peak_value = max(peak_value, current_value)
-            
-            # 计算回撤
-            if peak_value > 0:
-                current_drawdown = (current_value - peak_value) / peak_value * 100
-            else:
-                current_drawdown = 0
-            
-            # 添加数据点
-            timestamps.append(trade['timestamp'])
-            equity.append(current_value)
-            drawdown.append(current_drawdown)
+        timestamps, equity = equity_series(ledger, initial_capital)
+        drawdown = drawdown_series(equity, initial_capital)
         
-        # 绘制回撤曲线
+        plt = _pyplot()
+        
+        # 绘制回撤曲线（保留每段的最低点，不丢失回撤尖峰）
         fig, ax = plt.subplots(figsize=(12, 6))
-        ax.plot(timestamps, drawdown, label='回撤 (%)', linewidth=2, color='red')
+        x, y = self._downsample(timestamps, drawdown, fig, 'minmax')
+        ax.plot(_time_axis(x), y, label='回撤 (%)', linewidth=2, color='red')
         
         # 添加标题和标签
         ax.set_title('回测回撤曲线', fontsize=16)
@@ -187,8 +291,8 @@ class PlottingManager:
         fig.autofmt_xdate()
         
         # 计算最大回撤
-        if drawdown:
-            max_drawdown = min(drawdown)
+        if len(drawdown):
+            max_drawdown = drawdown.min()
             
             # 在图表上添加最大回撤信息
             ax.text(0.05, 0.95, 
@@ -200,7 +304,7 @@ class PlottingManager:
         # 保存图表
         if save_path:
             try:
-                plt.savefig(save_path, dpi=300, bbox_inches='tight')
+                plt.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
                 if self.debug:
                     print(f"[DEBUG] 回撤曲线已保存到: {save_path}")
             except Exception as e:
@@ -220,14 +324,17 @@ class PlottingManager:
         返回:
         plt.Figure: 生成的图表对象
         """
-        if not trade_history:
+        ledger = trade_ledger(trade_history)
+        if not len(ledger['direction']):
             if self.debug:
                 print("[DEBUG] 没有交易历史记录，无法绘制交易分布图")
             return None
         
         # 统计买入和卖出次数
-        buy_count = sum(1 for trade in trade_history if trade['direction'] == 'buy')
-        sell_count = sum(1 for trade in trade_history if trade['direction'] == 'sell')
+        buy_count = int((ledger['direction'] > 0).sum())
+        sell_count = int((ledger['direction'] < 0).sum())
+        
+        plt = _pyplot()
         
         # 绘制饼图
         fig, ax = plt.subplots(figsize=(8, 6))
@@ -245,7 +352,7 @@ class PlottingManager:
         # 保存图表
         if save_path:
             try:
-                plt.savefig(save_path, dpi=300, bbox_inches='tight')
+                plt.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
                 if self.debug:
                     print(f"[DEBUG] 交易分布图已保存到: {save_path}")
             except Exception as e:
@@ -0,0 +1,99 @@
+import numpy as np
+
+
+class SlippageModel:
+    """
+    滑点模型基类
+
+    所有模型都以数组方式批量计算：一次传入一批订单（通常是同一根K线上的全部成交），
+    返回每笔成交的实际价格。子类只需实现cost()，返回每股的滑点金额（非负）
+    """
+
+    def cost(self, prices, volumes, bar_volumes, spreads):
+        """
+        每股滑点金额
+
+        参数:
+        prices: 基准价格数组
+        volumes: 成交数量数组
+        bar_volumes: 当前K线成交量数组（缺失为NaN）
+        spreads: 当前买卖价差数组（缺失为NaN）
+        """
+        raise NotImplementedError
+
+    def execution_prices(self, prices, volumes, directions, bar_volumes=None, spreads=None):
+        """
+        计算一批成交的实际价格
+
+        参数:
+        prices: 基准价格数组
+        volumes: 成交数量数组
+        directions: 方向数组，买入为1，卖出为-1
+        bar_volumes: 当前K线成交量数组，None表示未知
+        spreads: 当前买卖价差数组，None表示未知
+
+        返回:
+        实际成交价格数组（买入上浮、卖出下浮，卖出价格不低于0）
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        volumes = np.asarray(volumes, dtype=np.float64)
+        directions = np.asarray(directions, dtype=np.float64)
+        bar_volumes = np.full(prices.shape, np.nan) if bar_volumes is None else np.asarray(bar_volumes, dtype=np.float64)
+        spreads = np.full(prices.shape, np.nan) if spreads is None else np.asarray(spreads, dtype=np.float64)
+
+        slippage = np.maximum(self.cost(prices, volumes, bar_volumes, spreads), 0.0)
+        return np.maximum(prices + directions * slippage, 0.0)
+
+
+class FixedSlippage(SlippageModel):
+    """固定滑点：每股固定金额（与TradingCostManager.slippage一致）"""
+
+    def __init__(self, slippage=0.01):
+        self.slippage = slippage
+
+    def cost(self, prices, volumes, bar_volumes, spreads):
+        return np.full(prices.shape, float(self.slippage))
+
+
+class BpsSlippage(SlippageModel):
+    """按价格比例的滑点，单位为基点（1bp = 0.01%）"""
+
+    def __init__(self, bps=5):
+        self.bps = bps
+
+    def cost(self, prices, volumes, bar_volumes, spreads):
+        return prices * self.bps / 10000.0
+
+
+class SqrtImpactSlippage(SlippageModel):
+    """
+    平方根冲击成本模型
+
+    滑点 = 价格 × impact × sqrt(成交数量 / K线成交量)，再加上基础滑点base_bps；
+    K线成交量未知时只收取基础滑点
+    """
+
+    def __init__(self, impact=0.1, base_bps=0):
+        self.impact = impact
+        self.base_bps = base_bps
+
+    def cost(self, prices, volumes, bar_volumes, spreads):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            participation = np.where(bar_volumes > 0, volumes / bar_volumes, np.nan)
+        impact = np.nan_to_num(self.impact * np.sqrt(participation), nan=0.0)
+        return prices * (impact + self.base_bps / 10000.0)
+
+
+class SpreadSlippage(SlippageModel):
+    """
+    买卖价差滑点：按价差的一定比例（默认半个价差）成交
+
+    价差来自行情的买一/卖一价；没有价差数据时按价格的default_bps收取滑点
+    """
+
+    def __init__(self, fraction=0.5, default_bps=2):
+        self.fraction = fraction
+        self.default_bps = default_bps
+
+    def cost(self, prices, volumes, bar_volumes, spreads):
+        return np.where(np.isnan(spreads), prices * self.default_bps / 10000.0, self.fraction * spreads)
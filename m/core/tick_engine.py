@@ -0,0 +1,234 @@
+import heapq
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+# 每天的纳秒数，用于判断事件是否跨日
+NS_PER_DAY = 86400 * 10**9
+
+
+class TickView:
+    """
+    Tick事件的轻量视图
+
+    回放过程中每只股票只复用同一个对象（始终指向该股票最新的一条记录），
+    字段访问直接索引该股票的内存映射数组，不会为每个事件创建新的Series或字典；
+    时间以int64纳秒时间戳保存，只有访问datetime时才转换为pandas.Timestamp
+    """
+    __slots__ = ('code', 'timestamp', '_columns', '_row')
+
+    def __init__(self):
+        self.code = None
+        self.timestamp = 0
+        self._columns = None
+        self._row = 0
+
+    def __getattr__(self, name):
+        columns = object.__getattribute__(self, '_columns')
+        if columns is not None and name in columns:
+            return columns[name][object.__getattribute__(self, '_row')]
+        raise AttributeError(name)
+
+    def __getitem__(self, name):
+        if name == 'code':
+            return self.code
+        if name in ('datetime', 'timestamp'):
+            return getattr(self, name)
+        return self._columns[name][self._row]
+
+    @property
+    def datetime(self):
+        """事件时间（pandas.Timestamp）"""
+        return pd.Timestamp(self.timestamp)
+
+    def keys(self):
+        """可用字段名"""
+        return self._columns.keys()
+
+    def items(self):
+        """(字段名, 当前值) 迭代器，供ArrayManager.update_bar等按映射读取"""
+        row = self._row
+        for name, column in self._columns.items():
+            yield name, column[row]
+
+    def to_dict(self):
+        """转换为字典（会创建新对象，仅用于调试或保存）"""
+        result = {name: column[self._row] for name, column in self._columns.items()}
+        result['code'] = self.code
+        result['datetime'] = self.datetime
+        return result
+
+    def __repr__(self):
+        return f"TickView(code={self.code}, datetime={self.datetime})"
+
+
+class TickReplayer:
+    """
+    多股票Tick/分钟数据回放器
+
+    每只股票的数据按时间排序后按列保存为 .npy 文件，回放时以内存映射方式打开，
+    用堆对所有股票的时间序列做k路归并，按时间顺序逐个产出事件。
+    内存占用只与股票数量相关（堆和游标），与事件总数无关
+    """
+
+    def __init__(self, data, start_date=None, end_date=None, time_field=None,
+                 cache_dir=None, debug=False):
+        """
+        初始化回放器
+
+        参数:
+        data: 字典（股票代码 -> 按时间记录的DataFrame），或已构建好的缓存目录路径
+        start_date: 回放开始日期
+        end_date: 回放结束日期（包含当天）
+        time_field: 时间字段名，None时依次尝试 datetime、time、date
+        cache_dir: 内存映射文件目录，None时使用临时目录并在close()时删除
+        debug: 是否调试模式
+        """
+        self.debug = debug
+        self.start_ns = pd.Timestamp(start_date).value if start_date else None
+        self.end_ns = pd.Timestamp(end_date).normalize().value + NS_PER_DAY if end_date else None
+
+        self._owns_cache_dir = False
+        if isinstance(data, (str, os.PathLike)):
+            self.cache_dir = str(data)
+        else:
+            if cache_dir is None:
+                cache_dir = tempfile.mkdtemp(prefix='qwesdk_tick_')
+                self._owns_cache_dir = True
+            self.cache_dir = str(cache_dir)
+            self._write_store(data, time_field)
+
+        self.codes = []
+        self._times = []
+        self._columns = []
+        self._open_store()
+
+        if self.debug:
+            print(f"[DEBUG] TickReplayer 股票数量: {len(self.codes)}，事件总数: {self.event_count}")
+
+    @staticmethod
+    def _detect_time_field(df):
+        """检测时间字段"""
+        for field in ('datetime', 'time', 'date'):
+            if field in df.columns:
+                return field
+        raise ValueError("数据中没有时间字段（datetime/time/date）")
+
+    def _write_store(self, data, time_field):
+        """将每只股票的数据按列写入 .npy 文件"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for code, df in data.items():
+            field = time_field or self._detect_time_field(df)
+            times = pd.to_datetime(df[field]).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+            order = np.argsort(times, kind='stable')
+
+            stock_dir = os.path.join(self.cache_dir, str(code))
+            os.makedirs(stock_dir, exist_ok=True)
+            np.save(os.path.join(stock_dir, '__time__.npy'), times[order])
+            for column in df.columns:
+                if column in (field, 'code'):
+                    continue
+                values = df[column].to_numpy()
+                if not np.issubdtype(values.dtype, np.number):
+                    continue
+                np.save(os.path.join(stock_dir, f'{column}.npy'), values[order].astype(np.float64))
+
+    def _open_store(self):
+        """以内存映射方式打开所有股票的数据"""
+        for code in sorted(os.listdir(self.cache_dir)):
+            stock_dir = os.path.join(self.cache_dir, code)
+            time_path = os.path.join(stock_dir, '__time__.npy')
+            if not os.path.isfile(time_path):
+                continue
+            columns = {}
+            for file_name in os.listdir(stock_dir):
+                if file_name.endswith('.npy') and file_name != '__time__.npy':
+                    columns[file_name[:-4]] = np.load(os.path.join(stock_dir, file_name), mmap_mode='r')
+            self.codes.append(code)
+            self._times.append(np.load(time_path, mmap_mode='r'))
+            self._columns.append(columns)
+
+    def _bounds(self, times):
+        """回放区间在时间数组中的起止位置"""
+        begin = int(np.searchsorted(times, self.start_ns, side='left')) if self.start_ns is not None else 0
+        end = int(np.searchsorted(times, self.end_ns, side='left')) if self.end_ns is not None else len(times)
+        return begin, end
+
+    @property
+    def event_count(self):
+        """回放区间内的事件总数"""
+        total = 0
+        for times in self._times:
+            begin, end = self._bounds(times)
+            total += max(end - begin, 0)
+        return total
+
+    def __iter__(self):
+        """
+        按时间顺序产出事件
+
+        同一只股票每次产出的都是同一个TickView对象（指向该股票最新的记录），
+        使用方可以按股票保存视图作为最新行情，如需保留历史数据应自行复制
+        """
+        cursors = []
+        ends = []
+        heap = []
+        for i, times in enumerate(self._times):
+            begin, end = self._bounds(times)
+            cursors.append(begin)
+            ends.append(end)
+            if begin < end:
+                heap.append((int(times[begin]), i))
+        heapq.heapify(heap)
+
+        views = []
+        for code, columns in zip(self.codes, self._columns):
+            view = TickView()
+            view.code = code
+            view._columns = columns
+            views.append(view)
+        all_times = self._times
+        while heap:
+            timestamp, i = heap[0]
+            row = cursors[i]
+            view = views[i]
+            view.timestamp = timestamp
+            view._row = row
+            yield view
+
+            row += 1
+            cursors[i] = row
+            if row < ends[i]:
+                heapq.heapreplace(heap, (int(all_times[i][row]), i))
+            else:
+                heapq.heappop(heap)
+
+    def last_views(self):
+        """
+        每只股票在回放区间内最后一条记录的视图
+
+        返回:
+        字典，股票代码 -> TickView
+        """
+        views = {}
+        for i, times in enumerate(self._times):
+            begin, end = self._bounds(times)
+            if end <= begin:
+                continue
+            view = TickView()
+            view.code = self.codes[i]
+            view.timestamp = int(times[end - 1])
+            view._columns = self._columns[i]
+            view._row = end - 1
+            views[view.code] = view
+        return views
+
+    def close(self):
+        """释放内存映射，删除临时目录"""
+        self._times = []
+        self._columns = []
+        if self._owns_cache_dir:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            self._owns_cache_dir = False
@@ -1,2 +1,4 @@
 # 从dbmgr.py导入DBMgr类
 from .dbmgr import DBMgr
+# 从query_cache.py导入QueryCache类
+from .query_cache import QueryCache
@@ -1,34 +1,146 @@
 # 共享数据库连接管理器
+import os
+import contextlib
+import threading
+import weakref
 import duckdb
 
+
+def _sql_string(value):
+    """转换为SQL字符串字面量（单引号转义）"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
 class DBMgr:
-    """数据库 共享连接管理器"""
+    """数据库 共享连接管理器
+
+    默认使用内存数据库；配置了本地数据仓库路径（config.json 中的 warehouse.path，
+    或调用 DBMgr.open(path)）时，连接到磁盘上的DuckDB数据库文件，
+    导入的日线、指数成分、行业等表在多次运行之间持久保存。
+    数据仓库以只读方式打开，多个进程（worker、容器、任务子进程）可以同时查询；
+    只有 import_* 导入数据期间临时以读写方式打开
+
+    DuckDB连接不能在多个线程间并发使用，因此每个线程通过 get() 获得
+    基于同一数据库实例的独立游标，读查询可以在多核上并发执行。
+    自定义函数注册在共享的数据库实例上，所有游标均可使用；
+    DataFrame虚表只对单个连接可见，由DBMgr记录后同步到每个线程的游标
+    """
+    # 根连接，所有线程游标都基于它创建
     _conn = None
-    
+    # 本地数据仓库文件路径，None表示使用配置文件中的设置
+    _database = None
+    # 保护根连接创建和注册表的锁
+    _lock = threading.RLock()
+    # 每个线程的游标
+    _local = threading.local()
+    # 所有已创建的游标（用于关闭）
+    _cursors = weakref.WeakSet()
+    # 已注册的DataFrame虚表：name -> (version, df)
+    _views = {}
+    # 注册表版本号，每次注册虚表递增
+    _version = 0
+    # 本地数据仓库是否以读写方式打开（仅在导入数据期间）
+    _writable = False
+
     @classmethod
     def get(cls):
-        """获取共享连接"""
+        """获取当前线程的连接（游标）"""
+        cursor = getattr(cls._local, 'cursor', None)
+        if cursor is None:
+            with cls._lock:
+                cursor = cls._get_root().cursor()
+                cls._cursors.add(cursor)
+            cls._local.cursor = cursor
+            cls._local.views = {}
+        if cls._local.views.get('__version__') != cls._version:
+            cls._sync_views(cursor)
+        return cursor
+
+    @classmethod
+    def _get_root(cls):
+        """获取根连接，首次调用时创建并注册默认函数（调用方需持有锁）"""
         if cls._conn is None:
-            cls._conn = duckdb.connect()
+            database = cls.warehouse_path()
+            if database:
+                os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+                if not cls._writable and not os.path.exists(database):
+                    # 只读方式不能创建新文件，先创建空的数据库文件
+                    duckdb.connect(database).close()
+                cls._conn = duckdb.connect(database, read_only=not cls._writable)
+            else:
+                cls._conn = duckdb.connect()
             # 自动注册所有自定义函数
             cls._register_default_udfs()
         return cls._conn
-    
+
+    @classmethod
+    def _sync_views(cls, cursor):
+        """将注册表中的虚表同步到当前线程的游标"""
+        applied = cls._local.views
+        with cls._lock:
+            views = dict(cls._views)
+            version = cls._version
+        for name, (view_version, df) in views.items():
+            if applied.get(name) != view_version:
+                cursor.register(name, df)
+                applied[name] = view_version
+        for name in [name for name in applied if name != '__version__' and name not in views]:
+            cursor.unregister(name)
+            del applied[name]
+        applied['__version__'] = version
+
+    @classmethod
+    def open(cls, database):
+        """
+        打开本地数据仓库
+
+        参数:
+        database: DuckDB数据库文件路径，None表示切换回内存数据库
+        """
+        cls.close()
+        cls._database = database
+        return cls.get()
+
+    @classmethod
+    def warehouse_path(cls):
+        """获取本地数据仓库文件路径，未配置时返回None"""
+        if cls._database is not None:
+            return cls._database
+        from m.config import GlobalConfig
+        return GlobalConfig.get_config("WAREHOUSE_PATH", None)
+
+    @classmethod
+    def warehouse_enabled(cls):
+        """是否启用了本地数据仓库"""
+        return bool(cls.warehouse_path())
+
     @classmethod
     def _register_default_udfs(cls):
         """注册默认的自定义函数"""
-        from .udf import ts_sum
-        
-        # 注册ts_sum函数，使用字符串类型名称
-        cls.register_function('ts_sum', ts_sum, 
-                            parameters=['DOUBLE', 'INTEGER'], return_type='DOUBLE')
-    
+        from .udf import TS_FUNCTIONS
+
+        # 注册时间序列窗口函数：输入为按分区聚合的有序列表，以Arrow批量方式计算
+        for name, func in TS_FUNCTIONS.items():
+            cls.register_function(name, func,
+                                parameters=['DOUBLE[]', 'INTEGER'], return_type='DOUBLE[]',
+                                type='arrow')
+
     @classmethod
     def register(cls, name, df):
-        """注册DataFrame为虚表"""
-        conn = cls.get()
-        conn.register(name, df)
-    
+        """注册DataFrame为虚表，所有线程的连接都可以查询"""
+        with cls._lock:
+            cls._version += 1
+            cls._views[name] = (cls._version, df)
+        cls.get()
+
+    @classmethod
+    def unregister(cls, name):
+        """取消注册DataFrame虚表"""
+        with cls._lock:
+            if cls._views.pop(name, None) is not None:
+                cls._version += 1
+        cls.get()
+
     @classmethod
     def execute(cls, sql):
         """执行SQL语句，返回原生duckdb执行结果"""
@@ -36,14 +148,161 @@ class DBMgr:
         return conn.execute(sql)
 
     @classmethod
-    def register_function(cls, name, func, parameters=None, return_type=None):
-        """注册自定义函数"""
-        conn = cls.get()
-        conn.create_function(name, func, parameters=parameters, return_type=return_type)
-    
+    def query(cls, sql):
+        """执行查询，返回pandas DataFrame"""
+        return cls.execute(sql).df()
+
+    @classmethod
+    def register_function(cls, name, func, parameters=None, return_type=None, type='native'):
+        """注册自定义函数
+
+        参数:
+        name: 函数名
+        func: Python函数
+        parameters: 参数类型列表
+        return_type: 返回值类型
+        type: 'native'逐行调用，'arrow'以Arrow数组批量调用
+        """
+        # 函数注册在数据库实例的目录中，对所有线程的游标可见
+        with cls._lock:
+            conn = cls._get_root()
+            conn.create_function(name, func, parameters=parameters, return_type=return_type, type=type)
+
+    @classmethod
+    def has_table(cls, name):
+        """检查当前数据库中是否存在指定的表或视图"""
+        result = cls.get().execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [name]
+        ).fetchone()
+        return result[0] > 0
+
+    @classmethod
+    def has_local_table(cls, name):
+        """
+        检查本地数据仓库中是否存在指定的表
+
+        未启用本地数据仓库时直接返回False，不会创建数据库连接
+        """
+        if not name or not cls.warehouse_enabled():
+            return False
+        return cls.has_table(name)
+
+    @classmethod
+    def import_parquet(cls, table, path, replace=True):
+        """
+        从Parquet文件批量导入数据到本地数据仓库
+
+        参数:
+        table: 目标表名
+        path: Parquet文件路径，支持通配符（如 exports/daily_*.parquet）
+        replace: True时替换已有表，False时追加到已有表
+
+        返回:
+        导入后表的行数
+        """
+        source = f"read_parquet({_sql_string(path)})"
+        return cls._import_from(table, source, replace)
+
+    @classmethod
+    def import_csv(cls, table, path, replace=True):
+        """
+        从ClickHouse导出的CSV文件（FORMAT CSVWithNames）批量导入数据到本地数据仓库
+
+        参数:
+        table: 目标表名
+        path: CSV文件路径
+        replace: True时替换已有表，False时追加到已有表
+
+        返回:
+        导入后表的行数
+        """
+        # 股票代码保留前导零，统一按字符串读取
+        with open(path, 'r', encoding='utf-8') as f:
+            header = f.readline().strip().split(',')
+        types = ", types={'code': 'VARCHAR'}" if 'code' in [h.strip('"') for h in header] else ""
+        source = f"read_csv({_sql_string(path)}, header=true{types})"
+        return cls._import_from(table, source, replace)
+
+    @classmethod
+    def import_clickhouse(cls, table, where=None, replace=True, timeout=300):
+        """
+        直接从ClickHouse同步一张表到本地数据仓库（使用Parquet格式传输）
+
+        参数:
+        table: 表名（本地表与ClickHouse表同名）
+        where: 可选的过滤条件，如 "date >= '2020-01-01'"
+        replace: True时替换已有表，False时追加到已有表
+        timeout: 请求超时时间（秒）
+
+        返回:
+        导入后表的行数
+        """
+        import io
+        import urllib.parse
+        import requests
+        import pyarrow.parquet as pq
+        from m.config import GlobalConfig
+
+        db_ip_config = GlobalConfig.get_config("DATABASE_IP", "127.0.0.1:8123")
+        db_ip, db_port = db_ip_config.split(":")
+
+        sql_query = f"SELECT * FROM {table}"
+        if where:
+            sql_query += f" WHERE {where}"
+        sql_query += " FORMAT Parquet"
+
+        url = f"http://{db_ip}:{db_port}/?query={urllib.parse.quote(sql_query)}"
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+
+        arrow_table = pq.read_table(io.BytesIO(response.content))
+        staging_name = f"__import_{table}"
+        cls.register(staging_name, arrow_table)
+        try:
+            return cls._import_from(table, staging_name, replace)
+        finally:
+            cls.unregister(staging_name)
+
+    @classmethod
+    def _import_from(cls, table, source, replace):
+        """将数据源（表函数或视图）写入目标表，返回目标表行数"""
+        with cls._write_access():
+            conn = cls.get()
+            if replace or not cls.has_table(table):
+                conn.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM {source}")
+            else:
+                conn.execute(f"INSERT INTO {table} SELECT * FROM {source}")
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    @classmethod
+    @contextlib.contextmanager
+    def _write_access(cls):
+        """
+        导入数据期间以读写方式重新打开本地数据仓库，结束后恢复只读
+
+        同一文件在一个进程内只能以一种方式打开，因此需要先关闭所有游标；
+        其他进程打开该文件时无法获得写锁，此时抛出duckdb的IOException
+        """
+        with cls._lock:
+            if cls._writable or not cls.warehouse_enabled():
+                yield
+                return
+            cls.close()
+            cls._writable = True
+            try:
+                yield
+            finally:
+                cls.close()
+                cls._writable = False
+
     @classmethod
     def close(cls):
-        """关闭共享连接"""
-        if cls._conn:
-            cls._conn.close()
-            cls._conn = None
+        """关闭所有线程的连接和共享连接"""
+        with cls._lock:
+            for cursor in list(cls._cursors):
+                cursor.close()
+            cls._cursors = weakref.WeakSet()
+            cls._local = threading.local()
+            if cls._conn:
+                cls._conn.close()
+                cls._conn = None
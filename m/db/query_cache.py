@@ -0,0 +1,238 @@
+# 主机级别的查询结果缓存
+import hashlib
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+
+class QueryCache:
+    """查询结果 共享磁盘缓存
+
+    同一台机器上的所有进程（如多个Celery任务）共享一个缓存目录，
+    远程ClickHouse查询的结果按 (数据库地址, SQL) 的哈希保存为Arrow IPC文件，
+    读取时以内存映射方式打开，多个进程读取同一份数据时共享操作系统的页缓存。
+
+    - 每个查询有自己的锁文件：读取持有共享锁，下载和写入持有排他锁，
+      同一个查询同时只有一个进程在下载，其余进程等待后直接读取结果
+    - 文件先写入临时文件再替换，读取方不会看到写了一半的文件
+    - 超过缓存有效期（默认一天）的结果重新下载
+    - 缓存总大小超过预算时，按最近访问时间删除最久未使用的文件
+
+    缓存目录由环境变量 QWESDK_QUERY_CACHE_DIR 或 config.json 中的 query_cache.dir 指定，
+    未配置时不启用缓存；没有fcntl的平台不加文件锁（写入仍是原子的，只是同一查询可能被重复下载）
+    """
+    # 缓存文件后缀
+    SUFFIX = '.arrow'
+
+    @classmethod
+    def cache_dir(cls):
+        """缓存目录，未配置时返回None"""
+        from m.config import GlobalConfig
+        path = os.environ.get('QWESDK_QUERY_CACHE_DIR') or GlobalConfig.get_config("QUERY_CACHE_DIR", None)
+        return os.path.expanduser(path) if path else None
+
+    @classmethod
+    def enabled(cls):
+        """是否启用了查询缓存"""
+        return bool(cls.cache_dir())
+
+    @classmethod
+    def _key(cls, sql):
+        from m.config import GlobalConfig
+        source = f"{GlobalConfig.get_config('DATABASE_IP', '')}\n{sql}"
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    @classmethod
+    @contextmanager
+    def _lock(cls, path, exclusive):
+        """对锁文件加锁（进程退出时由操作系统自动释放），没有fcntl时不加锁"""
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    @classmethod
+    def _remove_lock(cls, path):
+        """
+        删除缓存文件对应的锁文件
+
+        正在被其他进程持有的锁文件不删除
+
+        返回:
+        是否已删除（或不存在）
+        """
+        lock_path = path[:-len(cls.SUFFIX)] + '.lock'
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+        try:
+            fd = os.open(lock_path, os.O_RDWR)
+        except FileNotFoundError:
+            return True
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+            os.remove(lock_path)
+            return True
+        finally:
+            os.close(fd)
+
+    @classmethod
+    def _fresh(cls, path):
+        """缓存文件存在且未过期"""
+        from m.config import GlobalConfig
+        try:
+            created = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return False
+        ttl = GlobalConfig.get_config("QUERY_CACHE_TTL", 86400)
+        return not ttl or time.time() - created < ttl
+
+    @classmethod
+    def _read(cls, path):
+        """以内存映射方式读取缓存文件，并更新访问时间（用于LRU淘汰）"""
+        import pyarrow as pa
+
+        # 不主动关闭映射：DataFrame中的数值列直接引用映射的内存，由引用计数释放
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        stat = os.stat(path)
+        os.utime(path, (time.time(), stat.st_mtime))
+        # 每列单独成块，没有空值的数值列不合并复制；调用方应直接使用DataFrame，不要转换为记录列表
+        return table.to_pandas(split_blocks=True)
+
+    @classmethod
+    def _write(cls, path, df):
+        """写入临时文件后原子替换"""
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix=cls.SUFFIX, dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                with pa.ipc.new_file(f, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def fetch(cls, sql, loader, debug=False):
+        """
+        获取查询结果，缓存中没有时调用loader下载并写入缓存
+
+        参数:
+        sql: 查询语句（作为缓存键）
+        loader: 无参数函数，返回pandas DataFrame；返回None时不写入缓存
+        debug: 是否调试模式
+
+        返回:
+        loader返回的DataFrame或缓存中的DataFrame
+        """
+        directory = cls.cache_dir()
+        if not directory:
+            return loader()
+
+        os.makedirs(directory, exist_ok=True)
+        key = cls._key(sql)
+        path = os.path.join(directory, key + cls.SUFFIX)
+        lock_path = os.path.join(directory, key + '.lock')
+
+        with cls._lock(lock_path, exclusive=False):
+            if cls._fresh(path):
+                if debug:
+                    print(f"[DEBUG] QueryCache 命中缓存: {key[:12]}")
+                return cls._read(path)
+
+        with cls._lock(lock_path, exclusive=True):
+            # 等待锁期间可能已经由其他进程下载完成
+            if cls._fresh(path):
+                if debug:
+                    print(f"[DEBUG] QueryCache 命中缓存（等待其他进程下载）: {key[:12]}")
+                return cls._read(path)
+
+            df = loader()
+            if df is None:
+                return None
+            try:
+                cls._write(path, df)
+            except Exception as e:
+                # 缓存写入失败不影响查询结果
+                print(f"[WARNING] QueryCache 写入缓存失败: {e}")
+                return df
+            if debug:
+                print(f"[DEBUG] QueryCache 已缓存查询结果: {key[:12]}，行数: {len(df)}")
+
+        cls.evict()
+        return df
+
+    @classmethod
+    def evict(cls, max_bytes=None):
+        """
+        按最近访问时间淘汰缓存文件，使总大小不超过预算
+
+        参数:
+        max_bytes: 缓存大小预算（字节），None时使用配置 QUERY_CACHE_SIZE_MB
+
+        返回:
+        删除的文件数
+        """
+        from m.config import GlobalConfig
+
+        directory = cls.cache_dir()
+        if not directory or not os.path.isdir(directory):
+            return 0
+        if max_bytes is None:
+            max_bytes = GlobalConfig.get_config("QUERY_CACHE_SIZE_MB", 2048) * 1024 * 1024
+
+        with cls._lock(os.path.join(directory, '.evict.lock'), exclusive=True):
+            entries = []
+            orphans = []
+            for entry in os.scandir(directory):
+                if entry.name.startswith('.'):
+                    continue
+                if entry.name.endswith(cls.SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_atime, stat.st_size, entry.path))
+                elif entry.name.endswith('.lock'):
+                    orphans.append(entry.path[:-len('.lock')] + cls.SUFFIX)
+            # 没有对应缓存文件的锁文件（下载失败或结果不缓存的查询）
+            for path in orphans:
+                if not os.path.exists(path):
+                    cls._remove_lock(path)
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            # 已被其他进程内存映射的文件删除后仍可继续读取，直到其关闭；
+            # 锁文件随缓存文件一起删除，正在下载或读取的查询跳过
+            for _, size, path in sorted(entries):
+                if total <= max_bytes:
+                    break
+                if not cls._remove_lock(path):
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                total -= size
+                removed += 1
+        return removed
+
+    @classmethod
+    def clear(cls):
+        """删除所有缓存文件"""
+        return cls.evict(max_bytes=0)
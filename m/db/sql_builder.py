@@ -1,8 +1,189 @@
 # SQL查询构建器实现
+from functools import lru_cache
 from types import SimpleNamespace
+import ast
+import io
+import math
 import re
+import tokenize
 import ibis
 
+# SQL风格的逻辑关键字，统一转换为Python关键字后再解析
+_LOGIC_KEYWORDS = {'AND': 'and', 'OR': 'or', 'NOT': 'not'}
+
+# AS 别名语法
+_AS_PATTERN = re.compile(r'\s+AS\s+', re.IGNORECASE)
+
+# eval使用的全局命名空间
+_EVAL_GLOBALS = {'ibis': ibis}
+
+# EMA分块精度：相隔一个块以上的历史项权重低于该值（小于双精度的舍入误差）
+_EMA_PRECISION = 1e-17
+
+# 股票内行号辅助列（EMA等递推类函数使用，结果中不保留）
+_POS_COL = '_m_pos'
+
+# 需要行号辅助列的函数
+_POSITION_FUNCTIONS = frozenset({'m_ema', 'm_ta_macd_dif', 'm_ta_macd_dea', 'm_ta_macd'})
+
+
+class _LogicTransformer(ast.NodeTransformer):
+    """将 and/or/not 以及链式比较改写为 Ibis 支持的 &/|/~ 运算"""
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        expr = node.values[0]
+        for value in node.values[1:]:
+            expr = ast.BinOp(left=expr, op=op, right=value)
+        return ast.copy_location(expr, node)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.copy_location(ast.UnaryOp(op=ast.Invert(), operand=node.operand), node)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        # 0 < pe < 10 -> (0 < pe) & (pe < 10)
+        operands = [node.left] + node.comparators
+        expr = None
+        for i, op in enumerate(node.ops):
+            pair = ast.Compare(left=operands[i], ops=[op], comparators=[operands[i + 1]])
+            expr = pair if expr is None else ast.BinOp(left=expr, op=ast.BitAnd(), right=pair)
+        return ast.copy_location(expr, node)
+
+
+def _ends_operand(tok):
+    """该记号能否作为一个操作数的结尾（其后的 AND/OR 是二元运算符而不是函数调用）"""
+    if tok is None:
+        return False
+    if tok.type == tokenize.NAME:
+        return tok.string not in _LOGIC_KEYWORDS and tok.string not in _LOGIC_KEYWORDS.values()
+    return tok.type in (tokenize.NUMBER, tokenize.STRING) or tok.string in (')', ']')
+
+
+def _normalize_keywords(expr_str):
+    """
+    将 AND/OR/NOT 转换为小写关键字
+
+    AND(a, b) / OR(a, b) 这类函数调用（前面没有操作数）保持不变；
+    a AND (b) 中前面有操作数，仍按运算符处理；NOT (a) 与 NOT(a) 都按 not 处理
+    """
+    tokens = list(tokenize.generate_tokens(io.StringIO(expr_str).readline))
+    previous = None
+    for i, tok in enumerate(tokens):
+        if tok.type == tokenize.NAME and tok.string in _LOGIC_KEYWORDS:
+            next_tok = tokens[i + 1] if i + 1 < len(tokens) else None
+            is_call = next_tok is not None and next_tok.string == '(' and not _ends_operand(previous)
+            if tok.string == 'NOT' or not is_call:
+                tokens[i] = tok._replace(string=_LOGIC_KEYWORDS[tok.string])
+        if tok.type not in (tokenize.NL, tokenize.NEWLINE, tokenize.COMMENT):
+            previous = tokens[i]
+    return tokenize.untokenize(tokens)
+
+
+@lru_cache(maxsize=1024)
+def _parse_as_expression(expr_str):
+    """解析带有 AS 关键字的表达式，返回 (expression, alias)，没有别名时 alias 为 None"""
+    parts = _AS_PATTERN.split(expr_str)
+    if len(parts) == 2:
+        return parts[0].strip(), parts[1].strip()
+    return expr_str.strip(), None
+
+
+@lru_cache(maxsize=1024)
+def _compile_expression(expr_str, schema):
+    """
+    将表达式字符串解析为AST并编译，结果按 (expression, schema) 缓存
+
+    返回:
+    (code, columns, positional): 编译后的代码对象，表达式中引用到的表列名，
+    以及是否用到需要行号辅助列的函数
+    """
+    source = _normalize_keywords(expr_str.strip())
+    tree = ast.parse(source.strip(), mode='eval')
+    tree = ast.fix_missing_locations(_LogicTransformer().visit(tree))
+    code = compile(tree, '<SQLQueryBuilder>', 'eval')
+    names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    columns = tuple(name for name in schema.names if name in names)
+    return code, columns, bool(names & _POSITION_FUNCTIONS)
+
+
+def _ema_spec(n):
+    """
+    n期EMA（与pandas的ewm(span=n, adjust=False)一致）表示为几何加权和的组合
+
+    EMA_t = a*G_r(x)_t + r^(t+1)*x_0，其中 a = 2/(n+1)，r = 1-a，
+    G_r(x)_t = sum(r^(t-k) * x_k, k<=t)，x_0 为该股票的第一个值
+
+    返回:
+    {r: (G_r的系数, r^(t+1)*x_0的系数)}
+    """
+    alpha = 2.0 / (n + 1)
+    return {1.0 - alpha: (alpha, 1.0)}
+
+
+def _sub_specs(a, b):
+    """两个组合相减"""
+    result = dict(a)
+    for r, (c, e) in b.items():
+        c0, e0 = result.get(r, (0.0, 0.0))
+        result[r] = (c0 - c, e0 - e)
+    return result
+
+
+def _cascade_spec(spec, n):
+    """
+    对组合表示的序列再求n期EMA，结果仍是几何加权和的组合
+
+    利用 G_q(G_r(x)) = (r*G_r(x) - q*G_q(x)) / (r - q)，
+    要求各项的衰减系数r与q = 1 - 2/(n+1)不同
+    """
+    alpha = 2.0 / (n + 1)
+    q = 1.0 - alpha
+    result = {}
+    initial = 0.0
+
+    def add(r, c, e):
+        c0, e0 = result.get(r, (0.0, 0.0))
+        result[r] = (c0 + c, e0 + e)
+
+    for r, (c, e) in spec.items():
+        if r == q:
+            raise ValueError(f"EMA嵌套计算的周期不能与内层周期相同: {n}")
+        k = alpha / (r - q)
+        add(r, c * r * k, e * r * k)
+        add(q, -c * q * k, -e * r * k)
+        # 外层EMA以内层序列的第一个值为初值
+        initial += c + e * r
+    add(q, 0.0, initial)
+    return result
+
+
+@lru_cache(maxsize=64)
+def _macd_spec(fast, slow, signal=None, hist=False):
+    """
+    MACD的组合表示：DIF = EMA(fast) - EMA(slow)，DEA = EMA(DIF, signal)，柱体 = DIF - DEA
+
+    返回:
+    ((r, (G_r的系数, r^(t+1)*x_0的系数)), ...)
+    """
+    spec = _sub_specs(_ema_spec(fast), _ema_spec(slow))
+    if signal is not None:
+        dea = _cascade_spec(spec, signal)
+        spec = _sub_specs(spec, dea) if hist else dea
+    return tuple(sorted(spec.items()))
+
+
+def _block_size(r):
+    """几何加权和的分块长度：r^L 小于 _EMA_PRECISION，相隔超过L行的项可以忽略"""
+    return max(int(math.ceil(math.log(_EMA_PRECISION) / math.log(r))), 1)
+
+
 # ========== 核心实现：SQLQueryBuilder类 ==========
 class SQLQueryBuilder:
     """合并SQLStyleQuery和ExactQuery的功能，支持：
@@ -10,67 +191,191 @@ class SQLQueryBuilder:
     2. c_pct_rank(pe_ttm) < 0.40 语法
     3. 支持SELECT、MUTATE、FILTER等操作
     4. 支持链式操作
+
+    表达式字符串只解析编译一次（按表达式和表结构缓存），
+    命名空间在第一次求值时才按需构建
+
+    窗口函数按股票代码分区、按日期排序：
+    - 时间序列函数（m_lag、m_ts_sum、m_ema、MACD等）在同一股票内计算，
+      EMA和MACD从每只股票的第一行开始递推，与pandas的ewm(adjust=False)一致
+    - 截面函数（c_rank、c_pct_rank等）在同一日期内计算
+    表中没有对应列时，相应的分区或排序条件自动省略
     """
     
-    def __init__(self, table):
+    def __init__(self, table, code_col='code', date_col='date'):
         self.table = table
-        self.namespace = SimpleNamespace()
-        # 初始化命名空间
-        self._init_namespace()
+        self.code_col = code_col
+        self.date_col = date_col
+        self._schema = None
+        self._functions = None
     
-    def _init_namespace(self):
-        """初始化命名空间，添加列和自定义函数"""
-        # 添加表的所有列
+    def _derive(self, table):
+        """基于新表创建查询构建器，沿用当前的分区设置"""
+        return SQLQueryBuilder(table, code_col=self.code_col, date_col=self.date_col)
+
+    def _resolve_column(self, col):
+        """列名字符串转换为列表达式"""
+        if isinstance(col, str):
+            col = getattr(self.table, col)
+        return col
+
+    def _ts_window(self, n=None, block=None):
+        """
+        时间序列窗口：按股票代码分区，按日期排序
+
+        参数:
+        n: 滚动窗口长度（包含当前行），None表示不限制窗口范围
+        block: 股票内的分块表达式，指定时窗口为同一块内截至当前行
+        """
+        columns = self.table.columns
+        group_by = [self.table[self.code_col]] if self.code_col in columns else []
+        order_by = self.table[self.date_col] if self.date_col in columns else None
+        if block is not None:
+            return ibis.window(group_by=group_by + [block], order_by=order_by, preceding=None, following=0)
+        group_by = group_by or None
+        if n is None:
+            return ibis.window(group_by=group_by, order_by=order_by)
+        return ibis.window(group_by=group_by, order_by=order_by, preceding=n - 1, following=0)
+
+    def _cs_window(self, order_by):
+        """截面窗口：按日期分区，按指定列排序"""
+        group_by = self.table[self.date_col] if self.date_col in self.table.columns else None
+        return ibis.window(group_by=group_by, order_by=order_by)
+
+    def _geometric_sum(self, col, r):
+        """
+        同一股票内的几何加权和 G_r(x)_t = sum(r^(t-k) * x_k, k<=t)
+
+        按行号分成长度为L的块（j为块内位置），块内的项按 r^(-j) 放大后累加，
+        上一块中的项由最近L行的滚动和补上，相隔L行以上的项权重低于_EMA_PRECISION：
+        G_t = r^j * (块内累加(x*(r^(-j) - r^(L-j))) + 最近L行求和(x*r^(L-j)))
+        只用到一层窗口函数，SQL长度与周期无关
+        """
+        if r == 0:
+            return col
+        size = _block_size(r)
+        pos = self.table[_POS_COL]
+        offset = pos % size
+        base = ibis.literal(r)
+        carry = col * base ** (size - offset)
+        head = col * base ** -offset - carry
+        total = head.sum().over(self._ts_window(block=pos // size)) + carry.sum().over(self._ts_window(size))
+        return total * base ** offset
+
+    def _linear_filter(self, col, spec):
+        """
+        按组合表示计算EMA类指标：sum(c*G_r(x)_t + e*r^(t+1)*x_0)
+
+        参数:
+        spec: ((r, (c, e)), ...)，见 _ema_spec、_macd_spec
+        """
+        first = col.first().over(self._ts_window())
+        pos = self.table[_POS_COL]
+        result = None
+        for r, (c, e) in spec:
+            terms = []
+            if c:
+                terms.append(self._geometric_sum(col, r) * c)
+            if e and r:
+                terms.append(first * (ibis.literal(r) ** (pos + 1) * e))
+            for term in terms:
+                result = term if result is None else result + term
+        return result
+
+    def _needs_position(self, *expressions):
+        """表达式中是否用到需要行号辅助列的函数（当前表已有该列时不再需要）"""
+        if _POS_COL in self.table.columns:
+            return False
+        for expr in expressions:
+            if isinstance(expr, str):
+                expr_part, _ = self._parse_as_expression(expr)
+                if _compile_expression(expr_part, self.schema)[2]:
+                    return True
+        return False
+
+    def _with_position(self):
+        """附加股票内行号辅助列（从0开始，按日期排序）"""
+        return self._derive(self.table.mutate(**{_POS_COL: ibis.row_number().over(self._ts_window())}))
+
+    def _without_position(self):
+        """去掉行号辅助列"""
+        if _POS_COL in self.table.columns:
+            return self._derive(self.table.drop(_POS_COL))
+        return self
+
+    @property
+    def schema(self):
+        """当前表结构（缓存）"""
+        if self._schema is None:
+            self._schema = self.table.schema()
+        return self._schema
+
+    @property
+    def namespace(self):
+        """命名空间，包含表的所有列和自定义函数"""
+        namespace = SimpleNamespace(**self._get_functions())
         for col in self.table.columns:
-            setattr(self.namespace, col, getattr(self.table, col))
+            setattr(namespace, col, getattr(self.table, col))
+        return namespace
         
-        # 添加自定义排名函数
-        self._add_custom_functions()
+    def _get_functions(self):
+        """获取自定义函数（首次访问时创建）"""
+        if self._functions is None:
+            self._functions = self._create_custom_functions()
+        return self._functions
     
-    def _add_custom_functions(self):
-        """添加自定义函数到命名空间"""
+    def _create_custom_functions(self):
+        """创建自定义函数"""
         
         def c_rank(col):
-            """普通排名函数"""
-            if isinstance(col, str):
-                col = getattr(self.table, col)
-            return ibis.rank().over(order_by=col)
+            """截面排名函数（按日期分组）"""
+            col = self._resolve_column(col)
+            return ibis.rank().over(self._cs_window(col))
         
         def c_pct_rank(col):
-            """百分比排名函数"""
-            if isinstance(col, str):
-                col = getattr(self.table, col)
-            return ibis.percent_rank().over(order_by=col)
+            """截面百分比排名函数（按日期分组）"""
+            col = self._resolve_column(col)
+            return ibis.percent_rank().over(self._cs_window(col))
         
         def c_dense_rank(col):
-            """密集排名函数"""
-            if isinstance(col, str):
-                col = getattr(self.table, col)
-            return ibis.dense_rank().over(order_by=col)
+            """截面密集排名函数（按日期分组）"""
+            col = self._resolve_column(col)
+            return ibis.dense_rank().over(self._cs_window(col))
         
-        def m_ta_macd_dif(col):
+        def m_lag(col, n):
+            """延迟函数：返回同一股票n期前的值"""
+            col = self._resolve_column(col)
+            return col.lag(int(n)).over(self._ts_window())
+
+        def m_ts_sum(col, n):
+            """时间序列滚动求和：同一股票最近n期的和"""
+            col = self._resolve_column(col)
+            return col.sum().over(self._ts_window(int(n)))
+
+        def m_ts_mean(col, n):
+            """时间序列滚动均值：同一股票最近n期的均值"""
+            col = self._resolve_column(col)
+            return col.mean().over(self._ts_window(int(n)))
+
+        def m_ema(col, n):
+            """指数移动平均：同一股票的n期EMA（与pandas的ewm(span=n, adjust=False)一致）"""
+            col = self._resolve_column(col)
+            return self._linear_filter(col, tuple(_ema_spec(int(n)).items()))
+
+        def m_ta_macd_dif(col, fast=12, slow=26):
             """MACD DIF（差离值）计算：EMA12 - EMA26"""
-            if isinstance(col, str):
-                col = getattr(self.table, col)
-            # 简化实现：使用固定窗口计算
-            # 计算DIF = (close - 3日前close)作为简化版
-            return col - col.lag(3)
-        
-        def m_ta_macd_dea(col):
+            col = self._resolve_column(col)
+            return self._linear_filter(col, _macd_spec(int(fast), int(slow)))
+
+        def m_ta_macd_dea(col, fast=12, slow=26, signal=9):
             """MACD DEA（讯号线）计算：DIF的9日EMA"""
-            if isinstance(col, str):
-                col = getattr(self.table, col)
-            # 简化实现：使用固定窗口计算
-            # 计算DEA = (close - 5日前close)作为简化版
-            return col - col.lag(5)
-        
-        def m_lag(col, n):
-            """延迟函数：返回n期前的值"""
-            return col.lag(n)
-            #
-            #if isinstance(col, (int, float, str,float64)):
-            #    col = getattr(self.table, col)
-            #return col.lag(n)
+            col = self._resolve_column(col)
+            return self._linear_filter(col, _macd_spec(int(fast), int(slow), int(signal)))
+
+        def m_ta_macd(col, fast=12, slow=26, signal=9):
+            """MACD 柱体计算：DIF - DEA"""
+            col = self._resolve_column(col)
+            return self._linear_filter(col, _macd_spec(int(fast), int(slow), int(signal), hist=True))
         
         def IF(condition, true_value, false_value):
             """条件函数：如果condition为真返回true_value，否则返回false_value"""
@@ -91,45 +396,43 @@ class SQLQueryBuilder:
         
         def NOT(a):
             """逻辑非操作"""
-            return ibis.not_(a)
-        
-        # 添加到命名空间
-        setattr(self.namespace, 'c_rank', c_rank)
-        setattr(self.namespace, 'c_pct_rank', c_pct_rank)
-        setattr(self.namespace, 'c_dense_rank', c_dense_rank)
-        setattr(self.namespace, 'm_ta_macd_dif', m_ta_macd_dif)
-        setattr(self.namespace, 'm_ta_macd_dea', m_ta_macd_dea)
-        setattr(self.namespace, 'm_lag', m_lag)
-        setattr(self.namespace, 'm_tag', m_tag)
-        setattr(self.namespace, 'IF', IF)
-        setattr(self.namespace, 'AND', AND)
-        setattr(self.namespace, 'OR', OR)
-        setattr(self.namespace, 'NOT', NOT)
+            return ~a
+        
+        return {
+            'c_rank': c_rank,
+            'c_pct_rank': c_pct_rank,
+            'c_dense_rank': c_dense_rank,
+            'm_ta_macd_dif': m_ta_macd_dif,
+            'm_ta_macd_dea': m_ta_macd_dea,
+            'm_ta_macd': m_ta_macd,
+            'm_lag': m_lag,
+            'm_ts_sum': m_ts_sum,
+            'm_ts_mean': m_ts_mean,
+            'm_ema': m_ema,
+            'm_tag': m_tag,
+            'IF': IF,
+            'AND': AND,
+            'OR': OR,
+            'NOT': NOT,
+        }
     
     def _parse_as_expression(self, expr_str):
         """解析带有 AS 关键字的表达式，如 'c_rank(dividend_yield_ratio) AS score'"""
-        # 使用正则表达式匹配 AS 语法
-        as_pattern = r'\s+AS\s+'
-        parts = re.split(as_pattern, expr_str, flags=re.IGNORECASE)
+        return _parse_as_expression(expr_str)
         
-        if len(parts) == 2:
-            # 有 AS 关键字，返回 (expression, alias)
-            return parts[0].strip(), parts[1].strip()
-        else:
-            # 没有 AS 关键字，返回 (expression, None)
-            return expr_str.strip(), None
+    def _eval_expression(self, expr_str):
+        """对表达式字符串求值，编译结果从缓存中获取"""
+        code, columns, _ = _compile_expression(expr_str, self.schema)
+        # 只为表达式实际引用到的列构建命名空间
+        namespace = dict(self._get_functions())
+        for col in columns:
+            namespace[col] = self.table[col]
+        return eval(code, _EVAL_GLOBALS, namespace)
     
     def _parse_expressions(self, *expressions, **kwargs):
         """解析多个表达式，处理 AS 语法和关键字参数"""
         parsed = {}
         
-        # 创建命名空间，包含当前表的所有列和自定义函数
-        namespace = self.namespace.__dict__.copy()
-        namespace['ibis'] = ibis
-        # 添加当前表的所有列到命名空间
-        for col in self.table.columns:
-            namespace[col] = getattr(self.table, col)
-        
         # 处理位置参数（AS表达式）
         for expr in expressions:
             if isinstance(expr, str):
@@ -138,25 +441,13 @@ class SQLQueryBuilder:
                 
                 if alias:
                     # 带有别名，执行表达式并使用别名作为列名
-                    # 将逻辑运算符替换为Ibis支持的形式
-                    # 替换所有逻辑运算符为Ibis支持的&/|/~形式
-                    expr_part_processed = expr_part.replace(' AND ', ' & ').replace(' OR ', ' | ').replace(' NOT ', ' ~ ')
-                    expr_part_processed = expr_part_processed.replace(' and ', ' & ').replace(' or ', ' | ').replace(' not ', ' ~ ')
-                    # 执行表达式
-                    parsed_expr = eval(expr_part_processed, {}, namespace)
-                    parsed[alias] = parsed_expr
+                    parsed[alias] = self._eval_expression(expr_part)
+                elif expr_part in self.table.columns:
+                    # 是现有列，直接添加
+                    parsed[expr_part] = getattr(self.table, expr_part)
                 else:
-                    # 没有别名，检查是否是现有列
-                    if expr_part in self.table.columns:
-                        # 是现有列，直接添加
-                        parsed[expr_part] = getattr(self.table, expr_part)
-                    else:
-                        # 是表达式，执行并使用表达式作为列名（简化处理）
-                        # 将逻辑运算符替换为 Ibis 支持的形式
-                        expr_part_processed = expr_part.replace(' AND ', ' & ').replace(' OR ', ' | ').replace(' NOT ', ' ~ ')
-                        expr_part_processed = expr_part_processed.replace(' and ', ' & ').replace(' or ', ' | ').replace(' not ', ' ~ ')
-                        parsed_expr = eval(expr_part_processed, {}, namespace)
-                        parsed[expr_part] = parsed_expr
+                    # 是表达式，执行并使用表达式作为列名（简化处理）
+                    parsed[expr_part] = self._eval_expression(expr_part)
             else:
                 # 不是字符串，直接使用
                 parsed[str(expr)] = expr
@@ -164,10 +455,7 @@ class SQLQueryBuilder:
         # 处理关键字参数（ExactQuery风格）
         for key, expr_str in kwargs.items():
             if isinstance(expr_str, str):
-                # 执行字符串表达式，将逻辑运算符替换为 Ibis 支持的形式
-                expr_str_processed = expr_str.replace(' and ', ' & ').replace(' or ', ' | ').replace(' not ', ' ~ ')
-                parsed_expr = eval(expr_str_processed, {}, namespace)
-                parsed[key] = parsed_expr
+                parsed[key] = self._eval_expression(expr_str)
             else:
                 # 直接使用表达式
                 parsed[key] = expr_str
@@ -176,47 +464,49 @@ class SQLQueryBuilder:
     
     def select(self, *expressions):
         """支持 SQL 风格的 SELECT 语句"""
+        if self._needs_position(*expressions):
+            return self._with_position().select(*expressions)._without_position()
+
         # 解析表达式
         parsed_exprs = self._parse_expressions(*expressions)
         
         # 如果没有指定表达式，选择所有列
         if not parsed_exprs:
-            return SQLQueryBuilder(self.table)
+            return self._derive(self.table)
         
         # 创建选择的表达式列表
         select_exprs = list(parsed_exprs.values())
         
         # 执行选择
         result_table = self.table.select(*select_exprs)
-        return SQLQueryBuilder(result_table)
+        return self._derive(result_table)
     
     def mutate(self, *expressions, **kwargs):
         """支持 SQL 风格的列添加，如 c_rank(dividend_yield_ratio) AS score
         同时支持 ExactQuery 风格的关键字参数
         """
+        if self._needs_position(*expressions, *kwargs.values()):
+            return self._with_position().mutate(*expressions, **kwargs)._without_position()
+
         # 解析表达式（包括位置参数和关键字参数）
         parsed_exprs = self._parse_expressions(*expressions, **kwargs)
         
         # 执行添加列
         result_table = self.table.mutate(**parsed_exprs)
-        return SQLQueryBuilder(result_table)
+        return self._derive(result_table)
     
     def filter(self, condition):
         """过滤方法，支持字符串条件和表达式条件"""
+        if self._needs_position(condition):
+            return self._with_position().filter(condition)._without_position()
+
         if isinstance(condition, str):
-            # 执行字符串条件，将逻辑运算符替换为 Ibis 支持的形式
-            condition_processed = condition.replace(' and ', ' & ').replace(' or ', ' | ').replace(' not ', ' ~ ')
-            namespace = self.namespace.__dict__.copy()
-            namespace['ibis'] = ibis
-            # 更新命名空间，包含可能新添加的列
-            for col in self.table.columns:
-                namespace[col] = getattr(self.table, col)
-            condition_expr = eval(condition_processed, {}, namespace)
+            condition_expr = self._eval_expression(condition)
         else:
             condition_expr = condition
         
         result_table = self.table.filter(condition_expr)
-        return SQLQueryBuilder(result_table)
+        return self._derive(result_table)
     
     def execute(self):
         """执行查询"""
@@ -224,4 +514,4 @@ class SQLQueryBuilder:
     
     def __getattr__(self, name):
         """转发到原始表"""
-        return getattr(self.table, name)
\ No newline at end of file
+        return getattr(self.table, name)
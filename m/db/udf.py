@@ -1,25 +1,226 @@
 # 自定义函数定义
-from collections import deque
+#
+# 时间序列窗口函数以Arrow批量方式注册到DuckDB（type='arrow'），
+# 输入是按股票聚合后的有序列表，每一行对应一个分区（一只股票的完整序列），
+# 因此窗口计算天然按分区进行，不会在查询或分区之间共享状态。
+#
+# 用法示例：
+#   SELECT code,
+#          UNNEST(dates) AS date,
+#          UNNEST(ts_sum(closes, 5)) AS close_sum5
+#   FROM (
+#       SELECT code,
+#              list(date ORDER BY date) AS dates,
+#              list(close ORDER BY date) AS closes
+#       FROM stock_daily
+#       GROUP BY code
+#   )
+#
+# 数据不足一个窗口的位置返回NULL，窗口内含有NULL时结果也为NULL。
+import numpy as np
+import pyarrow as pa
+
+
+def _unpack(x, n):
+    """
+    将Arrow列表参数展开为扁平数组
+
+    参数:
+    x: 列表数组（每行为一个分区的完整序列）
+    n: 窗口大小数组（与x等长）
+
+    返回:
+    (values, lengths, windows, positions, valid_lists)
+    values: 所有分区拼接后的数值（NULL转为NaN）
+    lengths: 每个分区的长度
+    windows: 每个元素对应的窗口大小（滞后类函数中为滞后期数）
+    positions: 每个元素在所属分区内的位置
+    valid_lists: 每行是否为非NULL列表
+    """
+    if isinstance(x, pa.ChunkedArray):
+        x = x.combine_chunks()
+    if isinstance(n, pa.ChunkedArray):
+        n = n.combine_chunks()
+
+    valid_lists = x.is_valid().to_numpy(zero_copy_only=False)
+    lengths = x.value_lengths().fill_null(0).to_numpy(zero_copy_only=False).astype(np.int64)
+    values = x.flatten().cast(pa.float64()).to_numpy(zero_copy_only=False)
+    sizes = n.fill_null(1).to_numpy(zero_copy_only=False).astype(np.int64)
+
+    starts = np.cumsum(lengths) - lengths
+    positions = np.arange(len(values), dtype=np.int64) - np.repeat(starts, lengths)
+    windows = np.maximum(np.repeat(sizes, lengths), 0)
+    return values, lengths, windows, positions, valid_lists
+
+
+def _pack(result, lengths, valid_lists):
+    """将扁平结果按原分区长度重新组装为Arrow列表数组"""
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int32)
+    np.cumsum(lengths, out=offsets[1:])
+    values = pa.array(result, type=pa.float64(), from_pandas=True)
+    mask = pa.array(~valid_lists)
+    return pa.ListArray.from_arrays(pa.array(offsets), values, mask=mask)
+
+
+def _rolling_sums(values, windows, positions):
+    """
+    基于前缀和计算滚动窗口的和与有效标记
+
+    返回:
+    (sums, valid): 每个位置的窗口和；valid表示窗口完整且不含NaN
+    """
+    windows = np.maximum(windows, 1)
+    missing = np.isnan(values)
+    prefix = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, values))))
+    prefix_missing = np.concatenate(([0], np.cumsum(missing)))
+
+    end = np.arange(1, len(values) + 1)
+    begin = np.maximum(end - windows, 0)
+    sums = prefix[end] - prefix[begin]
+    valid = (positions >= windows - 1) & (prefix_missing[end] == prefix_missing[begin])
+    return sums, valid
+
+
+def _rolling_extreme(values, windows, positions, reducer):
+    """
+    计算滚动窗口的最大值/最小值
+
+    使用倍增表（sparse table）：level[k][i] 为 values[i:i+2^k] 的极值，
+    长度为w的窗口由两段长度为2^k的区间覆盖，复杂度O(N log w)
+    """
+    windows = np.maximum(windows, 1)
+    result = np.full(len(values), np.nan)
+    valid = positions >= windows - 1
+    if not valid.any():
+        return result
+
+    ends = np.flatnonzero(valid)
+    sizes = windows[valid]
+    starts = ends - sizes + 1
+    levels_needed = np.floor(np.log2(sizes)).astype(np.int64)
+
+    level = values
+    for k in range(int(levels_needed.max()) + 1):
+        if k > 0:
+            span = 1 << (k - 1)
+            level = reducer(level[:-span], level[span:])
+        selected = levels_needed == k
+        if selected.any():
+            span = 1 << k
+            left = level[starts[selected]]
+            right = level[ends[selected] - span + 1]
+            result[ends[selected]] = reducer(left, right)
+    return result
+
 
-# 时间序列窗口求和
 def ts_sum(x, n):
     """
     时间序列窗口求和
-    x: 当前数据值
+    x: 每个分区的有序数值列表
+    n: 窗口大小
+    返回: 与x等长的列表，每个位置为最近n个数据的和
+    """
+    values, lengths, windows, positions, valid_lists = _unpack(x, n)
+    sums, valid = _rolling_sums(values, windows, positions)
+    return _pack(np.where(valid, sums, np.nan), lengths, valid_lists)
+
+
+def ts_mean(x, n):
+    """
+    时间序列窗口均值
+    x: 每个分区的有序数值列表
     n: 窗口大小
-    返回: 最近n个数据的和，如果数据不足n个则返回0.0
-    """
-    # 为每个n值创建一个独立的deque
-    if not hasattr(ts_sum, '_deques'):
-        ts_sum._deques = {}
-    
-    if n not in ts_sum._deques:
-        ts_sum._deques[n] = deque(maxlen=n)
-    
-    deque_n = ts_sum._deques[n]
-    deque_n.append(x)
-    
-    if len(deque_n) < n:
-        return 0.0
-    else:
-        return sum(deque_n)
+    返回: 与x等长的列表，每个位置为最近n个数据的均值
+    """
+    values, lengths, windows, positions, valid_lists = _unpack(x, n)
+    sums, valid = _rolling_sums(values, windows, positions)
+    return _pack(np.where(valid, sums / np.maximum(windows, 1), np.nan), lengths, valid_lists)
+
+
+def ts_std(x, n):
+    """
+    时间序列窗口标准差（样本标准差，ddof=1）
+    x: 每个分区的有序数值列表
+    n: 窗口大小
+    返回: 与x等长的列表，每个位置为最近n个数据的标准差
+    """
+    values, lengths, windows, positions, valid_lists = _unpack(x, n)
+    windows = np.maximum(windows, 1)
+    if len(values) == 0:
+        return _pack(values, lengths, valid_lists)
+
+    # 先减去分区均值，降低平方和相减时的精度损失
+    starts = np.cumsum(lengths) - lengths
+    nonempty = lengths > 0
+    centers = np.zeros(len(lengths))
+    centers[nonempty] = np.add.reduceat(np.nan_to_num(values), starts[nonempty]) / lengths[nonempty]
+    centered = values - np.repeat(centers, lengths)
+
+    sums, valid = _rolling_sums(centered, windows, positions)
+    squares, _ = _rolling_sums(centered * centered, windows, positions)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (squares - sums * sums / windows) / (windows - 1)
+    result = np.sqrt(np.maximum(variance, 0.0))
+    return _pack(np.where(valid & (windows > 1), result, np.nan), lengths, valid_lists)
+
+
+def ts_max(x, n):
+    """
+    时间序列窗口最大值
+    x: 每个分区的有序数值列表
+    n: 窗口大小
+    返回: 与x等长的列表，每个位置为最近n个数据的最大值
+    """
+    values, lengths, windows, positions, valid_lists = _unpack(x, n)
+    return _pack(_rolling_extreme(values, windows, positions, np.maximum), lengths, valid_lists)
+
+
+def ts_min(x, n):
+    """
+    时间序列窗口最小值
+    x: 每个分区的有序数值列表
+    n: 窗口大小
+    返回: 与x等长的列表，每个位置为最近n个数据的最小值
+    """
+    values, lengths, windows, positions, valid_lists = _unpack(x, n)
+    return _pack(_rolling_extreme(values, windows, positions, np.minimum), lengths, valid_lists)
+
+
+def ts_delay(x, n):
+    """
+    时间序列滞后
+    x: 每个分区的有序数值列表
+    n: 滞后期数
+    返回: 与x等长的列表，每个位置为n期前的值
+    """
+    values, lengths, delays, positions, valid_lists = _unpack(x, n)
+    valid = positions >= delays
+    index = np.arange(len(values)) - delays
+    result = np.where(valid, values[np.maximum(index, 0)] if len(values) else values, np.nan)
+    return _pack(result, lengths, valid_lists)
+
+
+def ts_delta(x, n):
+    """
+    时间序列差分
+    x: 每个分区的有序数值列表
+    n: 差分期数
+    返回: 与x等长的列表，每个位置为当前值减去n期前的值
+    """
+    values, lengths, delays, positions, valid_lists = _unpack(x, n)
+    valid = positions >= delays
+    index = np.arange(len(values)) - delays
+    result = np.where(valid, values - values[np.maximum(index, 0)] if len(values) else values, np.nan)
+    return _pack(result, lengths, valid_lists)
+
+
+# 默认注册到DuckDB的时间序列函数
+TS_FUNCTIONS = {
+    'ts_sum': ts_sum,
+    'ts_mean': ts_mean,
+    'ts_std': ts_std,
+    'ts_max': ts_max,
+    'ts_min': ts_min,
+    'ts_delay': ts_delay,
+    'ts_delta': ts_delta,
+}
@@ -106,24 +106,21 @@ class ExtractDataV1:
                     print(f"[DEBUG] ExtractDataV1 从表 {self.table_name} 获取数据")
                 
                 # 从ClickHouse获取所有股票的数据
-                all_stock_data = self._get_data_from_clickhouse(stock_code_strings, query_start_date, query_end_date)
+                all_df = self._get_data_from_clickhouse(stock_code_strings, query_start_date, query_end_date)
                 
-                if all_stock_data:
+                if all_df is not None and not all_df.empty:
                     if self.debug:
-                        print(f"[DEBUG] ExtractDataV1 从ClickHouse获取了 {len(all_stock_data)} 条数据")
+                        print(f"[DEBUG] ExtractDataV1 从ClickHouse获取了 {len(all_df)} 条数据")
                     
-                    # 导入pandas用于DataFrame操作
-                    import pandas as pd
-                    
-                    # 将所有数据转换为DataFrame
-                    all_df = pd.DataFrame(all_stock_data)
+                    # 按股票代码一次分组，不逐个股票扫描全表
+                    groups = {str(code): group for code, group in all_df.groupby('code', sort=False)}
                     
                     # 遍历每个股票代码，将数据拆分为单独的DataFrame
                     for stock_code in stock_code_strings:
-                        # 过滤当前股票的数据
-                        stock_df = all_df[all_df['code'] == stock_code]
+                        # 当前股票的数据
+                        stock_df = groups.get(stock_code)
                         
-                        if not stock_df.empty:
+                        if stock_df is not None and not stock_df.empty:
                             # 将当前股票的数据存储到result_data字典中
                             self.result_data[stock_code] = stock_df
                             if self.debug:
@@ -149,7 +146,7 @@ class ExtractDataV1:
         query_end_date: 查询结束日期
         
         返回:
-        股票数据列表
+        股票数据DataFrame，没有股票代码或获取失败时返回None
         """
         if self.debug:
             print(f"[DEBUG] ExtractDataV1 开始从ClickHouse获取数据")
@@ -161,58 +158,71 @@ class ExtractDataV1:
             import pandas as pd
             from m.config import GlobalConfig
             
-            # 获取数据库配置
-            db_ip_config = GlobalConfig.get_config("DATABASE_IP", "127.0.0.1:8123")
-            db_ip, db_port = db_ip_config.split(":")
-            
-            if self.debug:
-                print(f"[DEBUG] ExtractDataV1 ClickHouse配置: IP={db_ip}, Port={db_port}")
+            from m.db import DBMgr, QueryCache
             
-            # 构建SQL查询，使用FORMAT CSVWithNames直接获取带列名的数据
+            # 构建SQL查询
             if stock_codes:
                 # 生成股票代码的IN子句
                 codes_in_clause = "', '" .join(stock_codes)
                 codes_in_clause = f"'{codes_in_clause}'"
                 
-                # 构建完整的SQL查询，使用FORMAT CSVWithNames
                 # 添加时间范围条件：date >= query_start_date AND date <= query_end_date
-                sql_query = f"SELECT * FROM {self.table_name} WHERE code IN ({codes_in_clause}) AND date >= '{query_start_date}' AND date <= '{query_end_date}' FORMAT CSVWithNames"
+                base_query = f"SELECT * FROM {self.table_name} WHERE code IN ({codes_in_clause}) AND date >= '{query_start_date}' AND date <= '{query_end_date}'"
             else:
-                # 如果没有股票代码，返回空列表
-                return []
+                # 如果没有股票代码，返回None
+                return None
             
-            # 对SQL语句进行URL编码，使用quote而不是quote_plus，避免空格被替换为+号
-            quoted_sql = urllib.parse.quote(sql_query)
+            # 本地数据仓库中有该表时，直接在本地查询
+            if DBMgr.has_local_table(self.table_name):
+                if self.debug:
+                    print(f"[DEBUG] ExtractDataV1 从本地数据仓库查询表 {self.table_name}")
+                return DBMgr.query(base_query)
             
-            # 发送HTTP请求到ClickHouse
-            url = f"http://{db_ip}:{db_port}/?query={quoted_sql}"
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()  # 检查请求是否成功
+            # 远程查询结果写入主机级共享缓存（见m.db.QueryCache），同一查询只下载一次
+            def load():
+                # 获取数据库配置
+                db_ip_config = GlobalConfig.get_config("DATABASE_IP", "127.0.0.1:8123")
+                db_ip, db_port = db_ip_config.split(":")
             
-            if self.debug:
-                print(f"[DEBUG] ExtractDataV1 ClickHouse响应状态: {response.status_code}")
-                # 打印响应数据的前200个字符，以便调试
-                print(f"[DEBUG] ExtractDataV1 ClickHouse响应前200字符: {response.text[:200]}...")
+                if self.debug:
+                    print(f"[DEBUG] ExtractDataV1 ClickHouse配置: IP={db_ip}, Port={db_port}")
             
-            # 解析CSV数据
-            # 显式指定分隔符为逗号，并且第一行是列名
-            # 显式指定code列为字符串类型，保留前导零
-            df = pd.read_csv(StringIO(response.text), sep=',', dtype={'code': str})
+                # 使用FORMAT CSVWithNames直接获取带列名的数据
+                sql_query = f"{base_query} FORMAT CSVWithNames"
             
-            if self.debug:
-                print(f"[DEBUG] ExtractDataV1 ClickHouse返回数据列: {df.columns.tolist()}")
-                print(f"[DEBUG] ExtractDataV1 ClickHouse返回数据行数: {len(df)}")
-                if len(df) > 0:
-                    # 打印第一行数据，检查第一列是否完整
-                    first_row = df.iloc[0].to_dict()
-                    print(f"[DEBUG] ExtractDataV1 ClickHouse返回第一行数据: {first_row}")
-                    # 打印第一列的名称和值，检查是否完整
-                    first_column = df.columns[0]
-                    first_value = first_row[first_column]
-                    print(f"[DEBUG] ExtractDataV1 第一列名称: {first_column}, 第一列值: {first_value}, 长度: {len(str(first_value))}")
+                # 对SQL语句进行URL编码，使用quote而不是quote_plus，避免空格被替换为+号
+                quoted_sql = urllib.parse.quote(sql_query)
+            
+                # 发送HTTP请求到ClickHouse
+                url = f"http://{db_ip}:{db_port}/?query={quoted_sql}"
+                response = requests.get(url, timeout=30)
+                response.raise_for_status()  # 检查请求是否成功
+            
+                if self.debug:
+                    print(f"[DEBUG] ExtractDataV1 ClickHouse响应状态: {response.status_code}")
+                    # 打印响应数据的前200个字符，以便调试
+                    print(f"[DEBUG] ExtractDataV1 ClickHouse响应前200字符: {response.text[:200]}...")
+            
+                # 解析CSV数据
+                # 显式指定分隔符为逗号，并且第一行是列名
+                # 显式指定code列为字符串类型，保留前导零
+                df = pd.read_csv(StringIO(response.text), sep=',', dtype={'code': str})
+            
+                if self.debug:
+                    print(f"[DEBUG] ExtractDataV1 ClickHouse返回数据列: {df.columns.tolist()}")
+                    print(f"[DEBUG] ExtractDataV1 ClickHouse返回数据行数: {len(df)}")
+                    if len(df) > 0:
+                        # 打印第一行数据，检查第一列是否完整
+                        first_row = df.iloc[0].to_dict()
+                        print(f"[DEBUG] ExtractDataV1 ClickHouse返回第一行数据: {first_row}")
+                        # 打印第一列的名称和值，检查是否完整
+                        first_column = df.columns[0]
+                        first_value = first_row[first_column]
+                        print(f"[DEBUG] ExtractDataV1 第一列名称: {first_column}, 第一列值: {first_value}, 长度: {len(str(first_value))}")
+                return df
             
-            # 将DataFrame转换为字典列表
-            return df.to_dict('records')
+            # 直接返回DataFrame，缓存命中时数值列引用内存映射的文件，不转换为字典列表
+            return QueryCache.fetch(base_query, load, debug=self.debug)
                 
         except Exception as e:
             if self.debug:
@@ -220,7 +230,7 @@ class ExtractDataV1:
                 # 打印详细的错误信息和堆栈跟踪
                 import traceback
                 traceback.print_exc()
-            return []
+            return None
     
     def get_data(self):
         """
@@ -87,7 +87,7 @@ class InputV1:
                 # 从ClickHouse获取数据
                 stock_data = self._get_data_from_clickhouse(stock_code_strings)
                 
-                if stock_data:
+                if stock_data is not None and not stock_data.empty:
                     if self.debug:
                         print(f"[DEBUG] InputV1 从ClickHouse获取了 {len(stock_data)} 条数据")
                     
@@ -110,7 +110,7 @@ class InputV1:
         3. 提取指定列
         
         参数:
-        data: 原始股票数据列表
+        data: 原始股票数据DataFrame
         """
         if self.debug:
             print(f"[DEBUG] InputV1 开始使用SQLQueryBuilder处理数据")
@@ -120,8 +120,7 @@ class InputV1:
             import pandas as pd
             from m.db.sql_builder import SQLQueryBuilder
             
-            # 将数据转换为pandas DataFrame
-            df = pd.DataFrame(data)
+            df = data
             
             if df.empty:
                 if self.debug:
@@ -201,7 +200,7 @@ class InputV1:
         stock_codes: 股票代码列表
         
         返回:
-        股票数据列表
+        股票数据DataFrame，获取失败时返回None
         """
         if self.debug:
             print(f"[DEBUG] InputV1 开始从ClickHouse获取数据")
@@ -213,60 +212,73 @@ class InputV1:
             import pandas as pd
             from m.config import GlobalConfig
             
-            # 获取数据库配置
-            db_ip_config = GlobalConfig.get_config("DATABASE_IP", "127.0.0.1:8123")
-            db_ip, db_port = db_ip_config.split(":")
+            from m.db import DBMgr, QueryCache
             
-            if self.debug:
-                print(f"[DEBUG] InputV1 ClickHouse配置: IP={db_ip}, Port={db_port}")
-            
-            # 构建SQL查询，使用FORMAT CSVWithNames直接获取带列名的数据
+            # 构建SQL查询
             if stock_codes:
                 # 生成股票代码的IN子句
                 codes_in_clause = "', '" .join(stock_codes)
                 codes_in_clause = f"'{codes_in_clause}'"
                 
-                # 构建完整的SQL查询，使用FORMAT CSVWithNames
-                sql_query = f"SELECT * FROM {self.table_name} WHERE code IN ({codes_in_clause}) FORMAT CSVWithNames"
+                base_query = f"SELECT * FROM {self.table_name} WHERE code IN ({codes_in_clause})"
             else:
                 # 如果没有股票代码，查询所有数据
-                sql_query = f"SELECT * FROM {self.table_name} FORMAT CSVWithNames"
+                base_query = f"SELECT * FROM {self.table_name}"
             
-            # 对SQL语句进行URL编码
-            quoted_sql = urllib.parse.quote(sql_query)
+            # 本地数据仓库中有该表时，直接在本地查询
+            if DBMgr.has_local_table(self.table_name):
+                if self.debug:
+                    print(f"[DEBUG] InputV1 从本地数据仓库查询表 {self.table_name}")
+                return DBMgr.query(base_query)
             
-            # 构建HTTP请求URL
-            url = f"http://{db_ip}:{db_port}/?query={quoted_sql}"
+            # 远程查询结果写入主机级共享缓存（见m.db.QueryCache），同一查询只下载一次
+            def load():
+                # 获取数据库配置
+                db_ip_config = GlobalConfig.get_config("DATABASE_IP", "127.0.0.1:8123")
+                db_ip, db_port = db_ip_config.split(":")
             
-            if self.debug:
-                print(f"[DEBUG] InputV1 ClickHouse请求URL: {url}")
-                print(f"[DEBUG] InputV1 ClickHouse执行SQL: {sql_query}")
+                if self.debug:
+                    print(f"[DEBUG] InputV1 ClickHouse配置: IP={db_ip}, Port={db_port}")
             
-            # 发送HTTP请求
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()  # 检查请求是否成功
+                # 使用FORMAT CSVWithNames直接获取带列名的数据
+                sql_query = f"{base_query} FORMAT CSVWithNames"
             
-            if self.debug:
-                print(f"[DEBUG] InputV1 ClickHouse响应状态: {response.status_code}")
+                # 对SQL语句进行URL编码
+                quoted_sql = urllib.parse.quote(sql_query)
             
-            # 解析响应数据
-            # 现在使用FORMAT CSVWithNames，所以应该有列头
-            # 使用逗号分隔符，并且第一行是列名
-            # 显式指定code列为字符串类型，保留前导零
-            df = pd.read_csv(StringIO(response.text), sep=',', dtype={'code': str})
+                # 构建HTTP请求URL
+                url = f"http://{db_ip}:{db_port}/?query={quoted_sql}"
             
-            if self.debug:
-                print(f"[DEBUG] InputV1 ClickHouse返回数据列: {df.columns.tolist()}")
-                print(f"[DEBUG] InputV1 ClickHouse返回数据行数: {len(df)}")
-                if len(df) > 0:
-                    print(f"[DEBUG] InputV1 ClickHouse返回数据前5行: {df.head().to_dict('records')[:5]}")
+                if self.debug:
+                    print(f"[DEBUG] InputV1 ClickHouse请求URL: {url}")
+                    print(f"[DEBUG] InputV1 ClickHouse执行SQL: {sql_query}")
+            
+                # 发送HTTP请求
+                response = requests.get(url, timeout=30)
+                response.raise_for_status()  # 检查请求是否成功
+            
+                if self.debug:
+                    print(f"[DEBUG] InputV1 ClickHouse响应状态: {response.status_code}")
+            
+                # 解析响应数据
+                # 现在使用FORMAT CSVWithNames，所以应该有列头
+                # 使用逗号分隔符，并且第一行是列名
+                # 显式指定code列为字符串类型，保留前导零
+                df = pd.read_csv(StringIO(response.text), sep=',', dtype={'code': str})
+            
+                if self.debug:
+                    print(f"[DEBUG] InputV1 ClickHouse返回数据列: {df.columns.tolist()}")
+                    print(f"[DEBUG] InputV1 ClickHouse返回数据行数: {len(df)}")
+                    if len(df) > 0:
+                        print(f"[DEBUG] InputV1 ClickHouse返回数据前5行: {df.head().to_dict('records')[:5]}")
+                return df
             
-            # 将DataFrame转换为字典列表
-            return df.to_dict('records')
+            # 直接返回DataFrame，缓存命中时数值列引用内存映射的文件，不转换为字典列表
+            return QueryCache.fetch(base_query, load, debug=self.debug)
         except Exception as e:
             if self.debug:
                 print(f"[ERROR] InputV1 从ClickHouse获取数据失败: {e}")
-            return []
+            return None
     
     def get_data(self):
         """
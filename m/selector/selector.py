@@ -6,7 +6,7 @@ from m.config import GlobalConfig
 import pandas as pd
 from io import StringIO
 # 导入共享连接管理器
-from m.db import DBMgr
+from m.db import DBMgr, QueryCache
 
 class SelectorV1:
     """
@@ -196,6 +196,64 @@ class SelectorV1:
         # 从selected_stocks中提取股票代码列表
         return [stock['code'] for stock in self.selected_stocks]
     
+    def _query_local_codes(self, sql, tables):
+        """
+        在本地数据仓库中执行选股SQL
+        
+        参数:
+        sql: 选股SQL语句
+        tables: SQL用到的表名列表
+        
+        返回:
+        股票代码列表；本地数据仓库未启用或缺少所需表时返回None
+        """
+        if not all(DBMgr.has_local_table(table) for table in tables):
+            return None
+        df = DBMgr.query(sql)
+        return [str(code) for code in df['code'].tolist()] if 'code' in df.columns else []
+    
+    def _fetch_remote_codes(self, sql, db_ip):
+        """
+        通过ClickHouse的8123端口查询股票代码
+        
+        响应按制表符分隔的表格解析出非空的code列时，结果写入主机级共享缓存（见m.db.QueryCache）；
+        需要按行解析的响应和空结果不写入缓存，下次重新查询
+        
+        返回:
+        股票代码列表，请求失败时抛出requests的异常
+        """
+        # 按行解析、不写入缓存的结果
+        fallback = []
+        
+        def load():
+            # 对SQL语句进行URL编码
+            quoted_sql = urllib.parse.quote(sql)
+            
+            # 构建HTTP请求URL，使用8123端口和正确的API路径
+            url = f"http://{db_ip}:8123/?query={quoted_sql}"
+            
+            # 发送HTTP请求
+            response = requests.get(url)
+            response.raise_for_status()  # 检查请求是否成功
+            
+            # ClickHouse默认使用制表符分隔，code列按字符串读取，保留前导零
+            try:
+                df = pd.read_csv(StringIO(response.text), sep='\t', dtype={'code': str})
+                if 'code' in df.columns and len(df):
+                    return pd.DataFrame({'code': [str(code) for code in df['code']]})
+            except Exception:
+                pass
+            
+            # 直接按行解析文本作为备用方案，移除可能的表头
+            lines = [line.strip() for line in response.text.strip().split('\n') if line.strip()]
+            if lines and lines[0] == 'code':
+                lines = lines[1:]
+            fallback.extend(lines)
+            return None
+        
+        df = QueryCache.fetch(sql, load)
+        return fallback if df is None else df['code'].tolist()
+    
     def _fetch_stocks_from_sw_index(self):
         """
         根据申万行业获取对应的股票代码
@@ -203,11 +261,6 @@ class SelectorV1:
         返回:
         股票代码列表
         """
-        import urllib.parse
-        import requests
-        from io import StringIO
-        import pandas as pd
-        
         # 获取数据库IP地址配置（只取IP部分）
         db_ip_config = GlobalConfig.DATABASE_IP
         db_ip = db_ip_config.split(":")[0]
@@ -230,46 +283,21 @@ class SelectorV1:
      );"""
         
         try:
-            # 对SQL语句进行URL编码
-            quoted_sql = urllib.parse.quote(sql)
+            # 本地数据仓库中有所需的表时，直接在本地查询
+            stock_codes = self._query_local_codes(sql, ['sw_industry_stocks_v', 'sw_industry_data_v'])
+            if stock_codes is not None:
+                print(f"[INFO] 从本地数据仓库获取{len(stock_codes)}个申万行业股票代码")
+                return stock_codes
             
-            # 构建HTTP请求URL，使用8123端口和正确的API路径
-            url = f"http://{db_ip}:8123/?query={quoted_sql}"
-            
-            # 发送HTTP请求
-            response = requests.get(url)
-            response.raise_for_status()  # 检查请求是否成功
-            
-            # 尝试多种方式解析响应数据
-            try:
-                # 尝试使用不同的分隔符解析，ClickHouse默认使用制表符分隔
-                df = pd.read_csv(StringIO(response.text), sep='\t')
-                
-                # 处理结果
-                stock_codes = df['code'].tolist() if 'code' in df.columns else []
-                
-                # 如果仍然没有获取到数据，尝试直接解析文本
-                if not stock_codes and response.text:
-                    # 按行分割，直接提取股票代码
-                    lines = response.text.strip().split('\n')
-                    # 跳过可能的表头
-                    if lines and lines[0] != 'code':
-                        stock_codes = lines
-                    elif len(lines) > 1:
-                        stock_codes = lines[1:]
-            except Exception:
-                # 直接解析文本作为备用方案
-                lines = response.text.strip().split('\n')
-                stock_codes = [line.strip() for line in lines if line.strip()]
-                # 移除可能的表头
-                if stock_codes and stock_codes[0] == 'code':
-                    stock_codes = stock_codes[1:]
+            # 远程查询结果写入主机级共享缓存（见m.db.QueryCache）
+            stock_codes = self._fetch_remote_codes(sql, db_ip)
             
             print(f"[INFO] 成功获取{len(stock_codes)}个申万行业股票代码")
             return stock_codes
         except Exception as e:
             print(f"[ERROR] 获取申万行业股票数据失败: {e}")
-            print(f"[ERROR] 响应内容: {response.text if 'response' in locals() else '无响应'}")
+            response = getattr(e, 'response', None)
+            print(f"[ERROR] 响应内容: {response.text if response is not None else '无响应'}")
             return []
     
     def _get_stock_codes_by_exchanges(self):
@@ -286,11 +314,6 @@ class SelectorV1:
         返回:
         股票代码列表
         """
-        import urllib.parse
-        import requests
-        from io import StringIO
-        import pandas as pd
-        
         # 交易所映射：中文名称 -> 市场代码
         exchange_mapping = {
             "上交所": "SH",
@@ -364,49 +387,24 @@ class SelectorV1:
         """
         
         try:
+            # 本地数据仓库中有所需的表时，直接在本地查询
+            stock_codes = self._query_local_codes(sql, ['stock_info_v'])
+            if stock_codes is not None:
+                print(f"[INFO] 从本地数据仓库获取{len(stock_codes)}个股票代码")
+                return stock_codes
+            
             # 获取数据库IP地址配置
             db_ip = self._ip
             
-            # 对SQL语句进行URL编码
-            quoted_sql = urllib.parse.quote(sql)
-            
-            # 构建HTTP请求URL，使用8123端口和正确的API路径
-            url = f"http://{db_ip}:8123/?query={quoted_sql}"
-            
-            # 发送HTTP请求
-            response = requests.get(url)
-            response.raise_for_status()  # 检查请求是否成功
-            
-            # 尝试多种方式解析响应数据
-            try:
-                # 尝试使用不同的分隔符解析，ClickHouse默认使用制表符分隔
-                df = pd.read_csv(StringIO(response.text), sep='\t')
-                
-                # 处理结果
-                stock_codes = df['code'].tolist() if 'code' in df.columns else []
-                
-                # 如果仍然没有获取到数据，尝试直接解析文本
-                if not stock_codes and response.text:
-                    # 按行分割，直接提取股票代码
-                    lines = response.text.strip().split('\n')
-                    # 跳过可能的表头
-                    if lines and lines[0] != 'code':
-                        stock_codes = lines
-                    elif len(lines) > 1:
-                        stock_codes = lines[1:]
-            except Exception:
-                # 直接解析文本作为备用方案
-                lines = response.text.strip().split('\n')
-                stock_codes = [line.strip() for line in lines if line.strip()]
-                # 移除可能的表头
-                if stock_codes and stock_codes[0] == 'code':
-                    stock_codes = stock_codes[1:]
+            # 远程查询结果写入主机级共享缓存（见m.db.QueryCache）
+            stock_codes = self._fetch_remote_codes(sql, db_ip)
             
             print(f"[INFO] 成功获取{len(stock_codes)}个股票代码")
             return stock_codes
         except Exception as e:
             print(f"[ERROR] 通过8123端口获取股票代码失败: {e}")
-            print(f"[ERROR] 响应内容: {response.text if 'response' in locals() else '无响应'}")
+            response = getattr(e, 'response', None)
+            print(f"[ERROR] 响应内容: {response.text if response is not None else '无响应'}")
             return []
     
     def _get_stock_codes_by_stock_indexes(self):
@@ -419,11 +417,6 @@ class SelectorV1:
         返回:
         股票代码列表
         """
-        import urllib.parse
-        import requests
-        from io import StringIO
-        import pandas as pd
-        
         # 处理指数列表
         target_indexes = self.indexes
         
@@ -446,49 +439,24 @@ class SelectorV1:
         """
         
         try:
+            # 本地数据仓库中有所需的表时，直接在本地查询
+            stock_codes = self._query_local_codes(sql, ['stock_index_v'])
+            if stock_codes is not None:
+                print(f"[INFO] 从本地数据仓库获取{len(stock_codes)}个股票代码")
+                return stock_codes
+            
             # 获取数据库IP地址配置
             db_ip = self._ip
             
-            # 对SQL语句进行URL编码
-            quoted_sql = urllib.parse.quote(sql)
-            
-            # 构建HTTP请求URL，使用8123端口和正确的API路径
-            url = f"http://{db_ip}:8123/?query={quoted_sql}"
-            
-            # 发送HTTP请求
-            response = requests.get(url)
-            response.raise_for_status()  # 检查请求是否成功
-            
-            # 尝试多种方式解析响应数据
-            try:
-                # 尝试使用不同的分隔符解析，ClickHouse默认使用制表符分隔
-                df = pd.read_csv(StringIO(response.text), sep='\t')
-                
-                # 处理结果
-                stock_codes = df['code'].tolist() if 'code' in df.columns else []
-                
-                # 如果仍然没有获取到数据，尝试直接解析文本
-                if not stock_codes and response.text:
-                    # 按行分割，直接提取股票代码
-                    lines = response.text.strip().split('\n')
-                    # 跳过可能的表头
-                    if lines and lines[0] != 'code':
-                        stock_codes = lines
-                    elif len(lines) > 1:
-                        stock_codes = lines[1:]
-            except Exception:
-                # 直接解析文本作为备用方案
-                lines = response.text.strip().split('\n')
-                stock_codes = [line.strip() for line in lines if line.strip()]
-                # 移除可能的表头
-                if stock_codes and stock_codes[0] == 'code':
-                    stock_codes = stock_codes[1:]
+            # 远程查询结果写入主机级共享缓存（见m.db.QueryCache）
+            stock_codes = self._fetch_remote_codes(sql, db_ip)
             
             print(f"[INFO] 成功获取{len(stock_codes)}个股票代码")
             return stock_codes
         except Exception as e:
             print(f"[ERROR] 通过8123端口获取股票代码失败: {e}")
-            print(f"[ERROR] 响应内容: {response.text if 'response' in locals() else '无响应'}")
+            response = getattr(e, 'response', None)
+            print(f"[ERROR] 响应内容: {response.text if response is not None else '无响应'}")
             return []
     
     def get_stock_codes_by_exchanges(self):
@@ -26,7 +26,9 @@ class StrategyV1(CtaTemplate):
             # 假设initialize函数需要context一个参数
             self.trader.initialize(self.trader.context)
         
-        pass
+        # 策略实例放入context，handle_data中可以通过 context['strategy'].buy(...) 下单
+        if self.trader:
+            self.trader.context['strategy'] = self
     
     def on_start(self):
         """策略启动"""
@@ -44,8 +46,7 @@ class StrategyV1(CtaTemplate):
         """K线推送"""
         # 如果trader对象存在，调用其handle_data函数
         if self.trader and hasattr(self.trader, 'handle_data'):
-            # 这里需要根据handle_data函数的参数要求传递合适的参数
-            # 假设handle_data函数需要context和data两个参数
+            # data为K线列表，每个回测引擎只有一只股票，列表中只有当前K线（股票代码见bar.symbol）
             self.trader.handle_data(self.trader.context, [bar])
     
     def on_order(self, order: OrderData):
@@ -7,10 +7,10 @@ from .trader_v2 import TraderV2
 def v1(data, start_date, end_date, initialize, before_trading_start, 
          handle_tick, handle_data, handle_trade, handle_order, after_trading, 
          capital_base=1000000, frequency="daily", product_type="股票", 
-         before_start_days=0, volume_limit=1, order_price_field_buy="open", 
+         before_start_days=0, volume_limit=None, order_price_field_buy="open", 
          order_price_field_sell="close", benchmark="000300.SH", 
          plot_charts=True, disable_cache=False, debug=False, 
-         backtest_only=False, m_cached=False, m_name="m4"):
+         backtest_only=False, m_cached=False, m_name="m4", max_workers=None):
     """
     trader v1函数，创建并返回回测引擎实例
     
@@ -27,7 +27,7 @@ def v1(data, start_date, end_date, initialize, before_trading_start,
     after_trading: 交易后处理函数
     capital_base: 初始资金
     frequency: 回测频率
-    volume_limit: 成交量限制
+    volume_limit: 成交量限制（K线成交量的倍数），None表示不限制
     order_price_field_buy: 买入订单价格字段
     order_price_field_sell: 卖出订单价格字段
     benchmark: 基准指数
@@ -37,6 +37,7 @@ def v1(data, start_date, end_date, initialize, before_trading_start,
     backtest_only: 是否仅回测
     m_cached: 是否缓存
     m_name: 模块名称
+    max_workers: 并行回测的进程数，None表示使用CPU核数
     
     返回:
     TraderV1实例
@@ -71,7 +72,8 @@ def v1(data, start_date, end_date, initialize, before_trading_start,
         debug=debug, 
         backtest_only=backtest_only, 
         m_cached=m_cached, 
-        m_name=m_name
+        m_name=m_name, 
+        max_workers=max_workers
     )
     
     # 如果不是仅回测，运行回测
@@ -86,10 +88,14 @@ def v2(data,  initialize, before_trading_start,
          start_date=None, end_date=None,
          after_backtest=None, 
          capital_base=1000000, frequency="daily", 
-         volume_limit=1, order_price_field_buy="open", 
+         volume_limit=None, order_price_field_buy="open", 
          order_price_field_sell="close", benchmark="000300.SH", 
          plot_charts=True, disable_cache=False, debug=False, 
-         backtest_only=False, m_cached=False, m_name="m4"):
+         backtest_only=False, m_cached=False, m_name="m4", 
+         data_frequency="daily", slippage_model=None, t_plus_one=False, 
+         trading_calendar=None, missing_bar="ffill", triggers=None, 
+         checkpoint_path=None, checkpoint_interval=None, resume=False, 
+         warm_start=None, plot_mode="sync"):
     """
     trader v2函数，创建并返回回测引擎实例
     
@@ -108,7 +114,7 @@ def v2(data,  initialize, before_trading_start,
     frequency: 回测频率
     product_type: 产品类型
     before_start_days: 开始前天数
-    volume_limit: 成交量限制
+    volume_limit: 成交量限制（K线成交量的倍数），None表示不限制
     order_price_field_buy: 买入订单价格字段
     order_price_field_sell: 卖出订单价格字段
     benchmark: 基准指数
@@ -118,6 +124,17 @@ def v2(data,  initialize, before_trading_start,
     backtest_only: 是否仅回测
     m_cached: 是否缓存
     m_name: 模块名称
+    data_frequency: 输入数据的频率，为1m时由分钟线合成回测频率的K线
+    slippage_model: 滑点模型（见m.core.slippage），None时使用固定滑点
+    t_plus_one: 是否按A股T+1规则限制当日买入的股票不能当日卖出
+    trading_calendar: 交易日历（日期序列），None时使用所有股票日期的并集
+    missing_bar: 停牌等缺失K线的处理方式，"ffill"向前填充，None不填充
+    triggers: 事件触发条件，设置后handle_data只在被触发的（日期, 股票）上调用
+    checkpoint_path: 检查点文件路径，None时不保存检查点
+    checkpoint_interval: 每隔多少根K线保存一次检查点，None时只在回测结束时保存
+    resume: 是否从checkpoint_path已有的检查点继续回测
+    warm_start: 预热状态的检查点文件路径，从该状态开始新的回测
+    plot_mode: 绘图方式，"sync"立即绘图（默认），"background"后台进程绘图，"deferred"只保存绘图数据
     
     返回:
     TraderV2实例
@@ -137,11 +154,22 @@ def v2(data,  initialize, before_trading_start,
         after_backtest=after_backtest, 
         capital_base=capital_base, 
         frequency=frequency, 
+        data_frequency=data_frequency, 
         volume_limit=volume_limit, 
         order_price_field_buy=order_price_field_buy, 
         order_price_field_sell=order_price_field_sell, 
+        slippage_model=slippage_model, 
+        t_plus_one=t_plus_one, 
         benchmark=benchmark, 
+        trading_calendar=trading_calendar, 
+        missing_bar=missing_bar, 
+        triggers=triggers, 
+        checkpoint_path=checkpoint_path, 
+        checkpoint_interval=checkpoint_interval, 
+        resume=resume, 
+        warm_start=warm_start, 
         plot_charts=plot_charts, 
+        plot_mode=plot_mode, 
         disable_cache=disable_cache, 
         debug=debug, 
         backtest_only=backtest_only, 
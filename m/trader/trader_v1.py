@@ -2,8 +2,14 @@
 
 from vnpy_ctastrategy.backtesting import BacktestingEngine
 from vnpy.trader.constant import Interval, Exchange
+from vnpy.trader.object import BarData
 import sys
 import os
+import copy
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
 
 # 将项目根目录添加到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -11,6 +17,62 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 # 导入StrategyV1类
 from m.strategy.strategy_v1 import StrategyV1
 
+# 进程池工作进程使用的回测引擎实例（fork时由子进程继承，不需要序列化数据和回调函数）
+_WORKER_TRADER = None
+
+# K线基础字段，其余数值字段作为附加属性挂到BarData上（如指标k、d等）
+_BAR_FIELDS = ('date', 'datetime', 'code', 'open', 'high', 'low', 'close', 'volume', 'amount', 'turnover')
+
+
+def _run_symbol_worker(code):
+    """进程池任务：回测单只股票"""
+    return _WORKER_TRADER._run_symbol(code)
+
+
+def _parse_symbol(code):
+    """
+    将股票代码转换为vn.py的代码和交易所
+
+    支持 000001.SZ / 600000.SH / 430047.BJ 以及不带后缀的6位代码
+    """
+    code = str(code)
+    if '.' in code:
+        symbol, suffix = code.split('.', 1)
+        exchange = {'SH': Exchange.SSE, 'SZ': Exchange.SZSE, 'BJ': Exchange.BSE}.get(suffix.upper())
+        if exchange is None:
+            exchange = Exchange(suffix.upper())
+        return symbol, exchange
+    if code.startswith(('6', '9')):
+        return code, Exchange.SSE
+    if code.startswith(('4', '8')):
+        return code, Exchange.BSE
+    return code, Exchange.SZSE
+
+
+class _SymbolTrader:
+    """
+    单只股票回测使用的轻量交易上下文
+
+    提供StrategyV1需要的回调函数和独立的context副本，
+    不包含initialize（主进程已经初始化过context）
+    """
+    def __init__(self, trader, code):
+        self.code = code
+        self.debug = trader.debug
+        self.handle_data = trader.handle_data
+        self.handle_tick = trader.handle_tick
+        self.handle_trade = trader.handle_trade
+        self.handle_order = trader.handle_order
+        try:
+            self.context = copy.deepcopy(trader.context)
+        except Exception:
+            self.context = dict(trader.context)
+            self.context['portfolio'] = dict(trader.context['portfolio'])
+        # 每只股票只使用分配给它的资金
+        self.context['portfolio']['cash'] = trader.symbol_capital
+        self.context['portfolio']['total_value'] = trader.symbol_capital
+
+
 class TraderV1:
     """
     Trader V1 回测引擎类
@@ -18,10 +80,10 @@ class TraderV1:
     def __init__(self, data, start_date, end_date, initialize, before_trading_start, 
                  handle_tick, handle_data, handle_trade, handle_order, after_trading, 
                  capital_base=1000000, frequency="daily", product_type="股票", 
-                 before_start_days=0, volume_limit=1, order_price_field_buy="open", 
+                 before_start_days=0, volume_limit=None, order_price_field_buy="open", 
                  order_price_field_sell="close", benchmark="000300.SH", 
                  plot_charts=True, disable_cache=False, debug=False, 
-                 backtest_only=False, m_cached=False, m_name="m4"):
+                 backtest_only=False, m_cached=False, m_name="m4", max_workers=None):
         """
         初始化回测引擎
         
@@ -40,16 +102,17 @@ class TraderV1:
         frequency: 回测频率
         product_type: 产品类型
         before_start_days: 开始前天数
-        volume_limit: 成交量限制
+        volume_limit: 成交量限制（K线成交量的倍数），None表示不限制
         order_price_field_buy: 买入订单价格字段
         order_price_field_sell: 卖出订单价格字段
-        benchmark: 基准指数
+        benchmark: 基准指数代码，组合逐日结果中附带对齐的基准收益率（见m.core.benchmark）
         plot_charts: 是否绘制图表
         disable_cache: 是否禁用缓存
         debug: 是否调试模式
         backtest_only: 是否仅回测
         m_cached: 是否缓存
         m_name: 模块名称
+        max_workers: 并行回测的进程数，None表示使用CPU核数，1表示在当前进程中依次回测
         """
         # 存储参数
         self.data = data
@@ -63,6 +126,8 @@ class TraderV1:
         self.handle_order = handle_order
         self.after_trading = after_trading
         self.capital_base = capital_base
+        # 每只股票的回测引擎分到的资金（回测时按股票数量平分capital_base）
+        self.symbol_capital = capital_base
         self.frequency = frequency
         self.product_type = product_type
         self.before_start_days = before_start_days
@@ -76,6 +141,23 @@ class TraderV1:
         self.backtest_only = backtest_only
         self.m_cached = m_cached
         self.m_name = m_name
+        self.max_workers = max_workers
+        
+        # 各股票的回测数据：股票代码 -> DataFrame
+        if hasattr(data, 'get_data'):
+            self.stock_data = data.get_data()
+        elif isinstance(data, dict):
+            self.stock_data = data
+        else:
+            self.stock_data = {}
+        
+        # BarData缓存：股票代码 -> (DataFrame, 开始日期, 结束日期, BarData列表)，
+        # 同一只股票的数据和日期范围不变时复用，进程池fork出的工作进程直接继承
+        self.bar_cache = {}
+        
+        # 回测结果
+        self.symbol_results = {}  # 股票代码 -> vn.py逐日盯市结果
+        self.daily_results = None  # 组合逐日盈亏
         
         # 初始化上下文
         self.context = {}
@@ -126,42 +208,223 @@ class TraderV1:
     def _run_daily(self):
         """
         日线级别回测
+
+        每只股票使用独立的vn.py BacktestingEngine回测，多只股票在多个进程中并行，
+        最后按日汇总各股票的盈亏得到组合结果
         """
-        # 简化实现，实际需要遍历日线数据
         if self.debug:
-            print(f"[DEBUG] 运行日线回测")
-
-        # 创建回测引擎
-        engine = BacktestingEngine()
-
-        engine.vt_symbol = "000100.SZ"
-        engine.symbol = "000100"
-        engine.exchange = Exchange.SZSE
-        engine.interval = Interval.DAILY
-        #engine.mode = BacktestingMode.BAR
-
-        engine.gateway_name = "BACKTESTING" #日线回测网关，分钟线回测网关，tick回测网关，实盘网关都要不一样
+            print(f"[DEBUG] 运行日线回测，股票数量: {len(self.stock_data)}")
+        
         # 示例：调用before_trading_start 交易前处理函数
         self.before_trading_start(self.context)
         
-        # 设置回测参数
-        engine.capital = 1000000  # 初始资金
-        engine.rate = 0.0001       # 手续费率
-        engine.slippage = 0.2      # 滑点
-        engine.size = 100          # 合约乘数
-        engine.pricetick = 0.01    # 最小变动价位
+        codes = list(self.stock_data.keys())
+        results = self._run_symbols(codes)
+        self._merge_results(results)
+        
+        # 示例：调用after_trading
+        self.after_trading(self.context)
+    
+    def _run_symbols(self, codes):
+        """
+        回测所有股票，可用fork时在进程池中并行
 
+        capital_base按股票数量平分给各股票的回测引擎，汇总后的组合资金与capital_base一致
+        """
+        global _WORKER_TRADER
+        
+        self.symbol_capital = self.capital_base / max(len(codes), 1)
+        max_workers = self.max_workers or os.cpu_count() or 1
+        max_workers = min(max_workers, len(codes))
+        if max_workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            return [self._run_symbol(code) for code in codes]
+        
+        # 在主进程中转换K线，工作进程fork时继承缓存，之后的回测不再重复转换
+        for code in codes:
+            self._get_bars(code)
+        
+        _WORKER_TRADER = self
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     mp_context=multiprocessing.get_context('fork')) as pool:
+                return list(pool.map(_run_symbol_worker, codes))
+        finally:
+            _WORKER_TRADER = None
+    
+    def _get_bars(self, code):
+        """
+        将一只股票的DataFrame批量转换为vn.py的BarData列表（按股票缓存）
+
+        除OHLCV外的数值字段（如指标）作为属性附加到BarData上
+        """
+        df = self.stock_data[code]
+        if df is None or len(df) == 0:
+            return []
+        
+        cached = self.bar_cache.get(code)
+        if cached is not None and cached[0] is df and cached[1:3] == (self.start_date, self.end_date):
+            return cached[3]
+        source = df
+        
+        time_field = 'datetime' if 'datetime' in df.columns else 'date'
+        times = pd.to_datetime(df[time_field])
+        mask = np.ones(len(df), dtype=bool)
+        if self.start_date:
+            mask &= (times >= pd.Timestamp(self.start_date)).to_numpy()
+        if self.end_date:
+            mask &= (times < pd.Timestamp(self.end_date).normalize() + pd.Timedelta(days=1)).to_numpy()
+        df = df[mask]
+        times = times[mask]
+        if len(df) == 0:
+            return []
+        
+        symbol, exchange = _parse_symbol(code)
+        order = np.argsort(times.to_numpy(), kind='stable')
+        
+        def column(*names):
+            for name in names:
+                if name in df.columns:
+                    return df[name].to_numpy(dtype=np.float64)[order].tolist()
+            return [0.0] * len(df)
+        
+        datetimes = times.iloc[order].dt.to_pydatetime().tolist()
+        opens = column('open', 'open_price')
+        highs = column('high', 'high_price')
+        lows = column('low', 'low_price')
+        closes = column('close', 'close_price')
+        volumes = column('volume')
+        turnovers = column('amount', 'turnover')
+        
+        extra_names = [name for name in df.columns
+                       if name not in _BAR_FIELDS and pd.api.types.is_numeric_dtype(df[name])]
+        extra_values = [df[name].to_numpy()[order].tolist() for name in extra_names]
+        
+        bars = []
+        for i, dt in enumerate(datetimes):
+            bar = BarData(
+                symbol=symbol, exchange=exchange, datetime=dt, interval=Interval.DAILY,
+                volume=volumes[i], turnover=turnovers[i],
+                open_price=opens[i], high_price=highs[i], low_price=lows[i], close_price=closes[i],
+                gateway_name="BACKTESTING"
+            )
+            for name, values in zip(extra_names, extra_values):
+                setattr(bar, name, values[i])
+            bars.append(bar)
+        
+        self.bar_cache[code] = (source, self.start_date, self.end_date, bars)
+        return bars
+    
+    def _run_symbol(self, code):
+        """
+        使用独立的vn.py回测引擎回测一只股票
+
+        返回:
+        字典，包含股票代码、逐日盯市结果和成交记录
+        """
+        bars = self._get_bars(code)
+        if not bars:
+            return {'code': code, 'daily': pd.DataFrame(), 'trades': []}
+        
+        # 创建回测引擎
+        engine = BacktestingEngine()
+        if not self.debug:
+            engine.output = lambda msg: None
+        
+        #日线回测网关，分钟线回测网关，tick回测网关，实盘网关都要不一样
+        engine.set_parameters(
+            vt_symbol=bars[0].vt_symbol,
+            interval=Interval.DAILY,
+            start=bars[0].datetime,
+            end=bars[-1].datetime,
+            rate=0.0001,        # 手续费率
+            slippage=0.2,       # 滑点
+            size=100,           # 合约乘数
+            pricetick=0.01,     # 最小变动价位
+            capital=self.symbol_capital
+        )
+        
         # 添加数据
-        engine.history_data = self.data
+        engine.history_data = bars
         
-        # 添加策略，并将TraderV1对象自身作为参数传递进去
-        engine.add_strategy(StrategyV1, {'trader': self})
+        # 添加策略，每只股票使用独立的交易上下文
+        engine.add_strategy(StrategyV1, {'trader': _SymbolTrader(self, code)})
         
         # 运行回测
         engine.run_backtesting()
+        daily = engine.calculate_result()
         
-        # 示例：调用after_trading
-        self.after_trading(self.context)
+        trades = [{
+            'stock_code': code,
+            'datetime': trade.datetime,
+            'direction': trade.direction.value if trade.direction else None,
+            'offset': trade.offset.value if trade.offset else None,
+            'price': trade.price,
+            'volume': trade.volume
+        } for trade in engine.trades.values()]
+        
+        return {'code': code, 'daily': daily, 'trades': trades}
+    
+    def _merge_results(self, results):
+        """按日汇总各股票的回测结果，更新组合资金和持仓"""
+        frames = []
+        positions = {}
+        self.trades = []
+        for result in results:
+            code = result['code']
+            daily = result['daily']
+            self.symbol_results[code] = daily
+            self.trades.extend(result['trades'])
+            if daily is None or daily.empty:
+                continue
+            frames.append(daily['net_pnl'].rename(code))
+            if daily['end_pos'].iloc[-1]:
+                positions[code] = daily['end_pos'].iloc[-1]
+        
+        self.trades.sort(key=lambda trade: trade['datetime'])
+        
+        if frames:
+            pnl = pd.concat(frames, axis=1).sort_index().fillna(0.0)
+            portfolio = pd.DataFrame({'net_pnl': pnl.sum(axis=1)})
+        else:
+            portfolio = pd.DataFrame({'net_pnl': pd.Series(dtype=float)})
+        portfolio['balance'] = self.capital_base + portfolio['net_pnl'].cumsum()
+        portfolio['drawdown'] = portfolio['balance'] - portfolio['balance'].cummax()
+        portfolio['benchmark_return'] = self._benchmark_returns(portfolio.index)
+        self.daily_results = portfolio
+        
+        total_value = portfolio['balance'].iloc[-1] if len(portfolio) else self.capital_base
+        self.context['portfolio']['positions'] = positions
+        self.context['portfolio']['total_value'] = total_value
+        
+        if self.debug:
+            print(f"[DEBUG] 组合回测完成，股票数量: {len(results)}，成交笔数: {len(self.trades)}，最终总市值: {total_value:.2f}")
+    
+    def _benchmark_returns(self, dates):
+        """与组合逐日结果对齐的基准每日收益率，没有基准数据时为NaN"""
+        if not self.benchmark or len(dates) == 0:
+            return np.nan
+        from m.core.benchmark import benchmark_returns
+        returns = benchmark_returns(self.benchmark, dates, data=self.stock_data, debug=self.debug)
+        return np.nan if returns is None else returns
+    
+    def get_results(self):
+        """
+        获取回测结果
+        """
+        final_value = self.context['portfolio']['total_value']
+        total_return = (final_value - self.capital_base) / self.capital_base * 100
+        
+        return {
+            'context': self.context,
+            'trades': self.trades,
+            'daily_results': self.daily_results,
+            'symbol_results': self.symbol_results,
+            'final_value': final_value,
+            'total_return': total_return,
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'stock_count': len(self.stock_data)
+        }
     
     def _run_tick(self):
         """
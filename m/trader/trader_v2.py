@@ -1,6 +1,8 @@
 # 导入必要的类
 import sys
 import os
+import pickle
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
@@ -26,10 +28,14 @@ class TraderV2:
                  handle_data, handle_tick,handle_trade, handle_order, after_trading, 
                  after_backtest=None, 
                  capital_base=1000000, frequency="daily", 
-                 volume_limit=1, order_price_field_buy="open", 
+                 volume_limit=None, order_price_field_buy="open", 
                  order_price_field_sell="close", benchmark="000300.SH", 
                  plot_charts=True, disable_cache=False, debug=False, 
-                 backtest_only=False, m_cached=False, m_name="m4"):
+                 backtest_only=False, m_cached=False, m_name="m4", 
+                 data_frequency="daily", slippage_model=None, t_plus_one=False, 
+                 trading_calendar=None, missing_bar="ffill", triggers=None, 
+                 checkpoint_path=None, checkpoint_interval=None, resume=False, 
+                 warm_start=None, plot_mode="sync"):
         """
         初始化回测引擎
         
@@ -40,21 +46,39 @@ class TraderV2:
         initialize: 初始化函数
         before_trading_start: 交易前处理函数
         handle_data: 数据处理函数
+        handle_tick: Tick处理函数（frequency="tick"时按时间顺序逐条调用）
         handle_trade: 成交处理函数
         handle_order: 订单处理函数
         after_trading: 交易后处理函数
         capital_base: 初始资金
-        frequency: 回测频率
-        volume_limit: 成交量限制
+        frequency: 回测频率，可选 daily、1m、5m、15m、30m、60m、tick
+        volume_limit: 成交量限制，每根K线单只股票最多成交 volume_limit × K线成交量，剩余部分挂单到后续K线，
+                      None表示不限制（默认）
         order_price_field_buy: 买入订单价格字段
         order_price_field_sell: 卖出订单价格字段
-        benchmark: 基准指数
+        benchmark: 基准指数代码，从回测数据或基准数据表（配置BENCHMARK_TABLE）中获取，用于计算alpha/beta
         plot_charts: 是否绘制图表
         disable_cache: 是否禁用缓存
         debug: 是否调试模式
         backtest_only: 是否仅回测
         m_cached: 是否缓存
         m_name: 模块名称
+        data_frequency: 输入数据的频率，为1m时由分钟线合成frequency指定频率的K线
+        slippage_model: 滑点模型（见m.core.slippage），None时使用固定滑点
+        t_plus_one: 是否按A股T+1规则限制当日买入的股票不能当日卖出
+        trading_calendar: 交易日历（日期序列），None时使用所有股票日期的并集
+        missing_bar: 停牌等缺失K线的处理方式，"ffill"向前填充价格（用于估值），None不填充；
+                     两种方式下handle_data都只收到当天真实存在K线的股票
+        triggers: 事件触发条件（见m.core.events.trigger_mask），设置后handle_data只在有事件的K线上调用，
+                  data中只包含被触发的股票，这些股票的ArrayManager在调用前从面板载入历史数据
+        checkpoint_path: 检查点文件路径（.npz），None时不保存检查点
+        checkpoint_interval: 每隔多少根K线保存一次检查点，None时只在回测结束时保存
+        resume: 是否从checkpoint_path已有的检查点继续回测（文件不存在时从头开始）
+        warm_start: 预热状态的检查点文件路径，从该状态开始新的回测以跳过预热期（不会覆盖该文件）
+        plot_mode: 绘图方式，绘图数据总是先保存为 backtest_plot_data_<m_name>.npz
+                   "sync" 在当前进程中立即生成图表（默认）
+                   "background" 在后台进程中生成图表，不阻塞回测，需要图表文件时调用wait_plots()
+                   "deferred" 只保存绘图数据，之后按需调用m.core.plotting.render_artifact生成图表
         """
         # 存储参数
         self.start_date = start_date
@@ -62,17 +86,31 @@ class TraderV2:
         self.initialize = initialize
         self.before_trading_start = before_trading_start
         self.handle_data = handle_data
+        self.handle_tick = handle_tick
         self.handle_trade = handle_trade
         self.handle_order = handle_order
         self.after_trading = after_trading
         self.after_backtest = after_backtest
         self.capital_base = capital_base
         self.frequency = frequency
+        self.data_frequency = data_frequency
         self.volume_limit = volume_limit
         self.order_price_field_buy = order_price_field_buy
         self.order_price_field_sell = order_price_field_sell
+        self.slippage_model = slippage_model
+        self.t_plus_one = t_plus_one
         self.benchmark = benchmark
+        self.trading_calendar = trading_calendar
+        self.missing_bar = missing_bar
+        self.triggers = triggers
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        # 检查点中按列追加保存的成交记录和订单记录（见m.core.checkpoint.RecordColumns）
+        self.record_columns = None
+        self.resume = resume
+        self.warm_start = warm_start
         self.plot_charts = plot_charts
+        self.plot_mode = plot_mode
         self.disable_cache = disable_cache
         self.debug = debug
         self.backtest_only = backtest_only
@@ -109,6 +147,8 @@ class TraderV2:
         # 初始化上下文
         self.context = {}
         self.orders = []
+        # handle_data中提交、等待本根K线批量撮合的订单记录：订单ID -> 订单记录
+        self.batched_orders = {}
         self.trades = []
         self.positions = {}
         
@@ -125,11 +165,29 @@ class TraderV2:
         # 当前日期时间
         self.current_datetime = None
         
+        # Tick回测中当前事件的时间（int64纳秒），以及各股票最新一条记录
+        self.current_timestamp = None
+        self.latest_ticks = {}
+        
         # 股票代码列表
         self.stock_codes = list(self.data.keys()) if isinstance(self.data, dict) else []
         
-        # 时间序列（所有股票的公共日期）
-        self.dates = self._get_common_dates()
+        # 时间序列（交易日历）
+        self.dates = self._get_trading_dates()
+        
+        # 按交易日历对齐的日线面板（回测开始时构建）
+        self.panel = None
+        self.panel_index = None
+        
+        # 从检查点恢复时，检查点对应K线的时间（int64纳秒），回测从其后一根K线开始
+        self.resume_timestamp = None
+        
+        # 每日收盘后的资金曲线（日期, 总资产），用于绩效分析
+        self.equity_dates = []
+        self.equity_values = []
+        
+        # 预先计算的触发事件：第t根K线上被触发的股票列号（未设置triggers时为None）
+        self.events = None
         
         # 数据管理器，每个股票对应一个ArrayManager
         self.array_managers = {}
@@ -143,44 +201,54 @@ class TraderV2:
         self.cost_manager = TradingCostManager(initial_capital=capital_base)
         
         # 订单管理器
-        self.order = OrderManager(initial_capital=capital_base, trading_cost_manager=self.cost_manager)
+        self.order = OrderManager(initial_capital=capital_base, trading_cost_manager=self.cost_manager,
+                                  volume_limit=volume_limit, slippage_model=slippage_model,
+                                  price_field_buy=order_price_field_buy,
+                                  price_field_sell=order_price_field_sell,
+                                  t_plus_one=t_plus_one)
         
         # 将订单管理器添加到context中
         self.context['order'] = self.order
         
-        # 绘图管理器
+        # 绘图管理器（matplotlib在真正绘图时才导入）
         from m.core.plotting import PlottingManager
         self.plotting_manager = PlottingManager(debug=debug)
         
+        # 绘图数据文件，以及后台绘图任务（plot_mode="background"时）
+        self.plot_artifact = None
+        self.plot_future = None
+        
         if self.debug:
             print(f"[DEBUG] TraderV2 初始化完成，模块名: {self.m_name}")
             print(f"[DEBUG] 股票数量: {len(self.stock_codes)}, 回测天数: {len(self.dates)}")
     
-    def _get_common_dates(self):
+    def _get_trading_dates(self):
         """
-        获取所有股票的公共日期
+        获取回测使用的交易日历
+
+        优先使用传入的trading_calendar，否则取所有股票日期的并集，
+        单只股票停牌或晚上市不会缩短整个回测区间
         """
-        if not self.stock_codes:
+        if self.trading_calendar is not None:
+            days = pd.to_datetime(pd.Series(list(self.trading_calendar))).to_numpy(dtype='datetime64[D]')
+        elif self.stock_codes:
+            days = np.concatenate([
+                pd.to_datetime(self.data[code]['date' if 'date' in self.data[code].columns else 'datetime'])
+                .to_numpy(dtype='datetime64[D]')
+                for code in self.stock_codes
+            ])
+        else:
             return []
         
-        # 获取第一个股票的日期
-        common_dates = set(pd.to_datetime(self.data[self.stock_codes[0]]['date']).dt.date)
-        
-        # 求所有股票日期的交集
-        for code in self.stock_codes[1:]:
-            dates = set(pd.to_datetime(self.data[code]['date']).dt.date)
-            common_dates = common_dates.intersection(dates)
-        
-        # 转换为排序后的列表
-        common_dates = sorted(list(common_dates))
+        days = np.unique(days)
         
         # 过滤日期范围
-        start_date = pd.to_datetime(self.start_date).date()
-        end_date = pd.to_datetime(self.end_date).date()
-        
-        filtered_dates = [date for date in common_dates if start_date <= date <= end_date]
+        if self.start_date:
+            days = days[days >= np.datetime64(pd.to_datetime(self.start_date).date(), 'D')]
+        if self.end_date:
+            days = days[days <= np.datetime64(pd.to_datetime(self.end_date).date(), 'D')]
         
-        return filtered_dates
+        return days.astype(object).tolist()
     
     def run(self):
         """
@@ -189,6 +257,12 @@ class TraderV2:
         if self.debug:
             print(f"[DEBUG] 开始运行回测，开始日期: {self.start_date}，结束日期: {self.end_date}")
         
+        # 从检查点恢复状态（恢复后不再调用initialize）
+        if self.resume and self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            self.load_checkpoint(self.checkpoint_path)
+        elif self.warm_start:
+            self.load_checkpoint(self.warm_start)
+        
         # 1. 初始化策略
         if not self.initialized:
             self.initialize(self.context)
@@ -196,10 +270,12 @@ class TraderV2:
         
         # 2. 运行回测主逻辑
         # 这里简化实现，实际回测需要根据频率和数据类型处理
-        if self.frequency == "daily":
-            self._run_daily()
-        elif self.frequency == "tick":
+        if self.frequency == "tick":
             self._run_tick()
+        elif self.frequency == "daily" and self.data_frequency == "daily":
+            self._run_daily()
+        else:
+            self._run_bars()
         
         if self.debug:
             print(f"[DEBUG] 回测结束")
@@ -236,28 +312,48 @@ class TraderV2:
                 print(f"[DEBUG] 没有交易历史记录，跳过绘图")
             return
         
-        # 绘制收益曲线
-        equity_fig = self.plotting_manager.plot_equity_curve(
-            trade_history, 
-            initial_capital=self.capital_base,
-            save_path=f"backtest_equity_curve_{self.m_name}.png"
-        )
-        
-        # 绘制回撤曲线
-        drawdown_fig = self.plotting_manager.plot_drawdown(
-            trade_history, 
-            initial_capital=self.capital_base,
-            save_path=f"backtest_drawdown_{self.m_name}.png"
-        )
-        
-        # 绘制交易分布图
-        trade_dist_fig = self.plotting_manager.plot_trade_distribution(
-            trade_history,
-            save_path=f"backtest_trade_distribution_{self.m_name}.png"
-        )
+        # 保存绘图数据，图表按plot_mode生成
+        from m.core.plotting import save_plot_artifact, render_artifact, render_artifact_async
+        self.plot_artifact = save_plot_artifact(f"backtest_plot_data_{self.m_name}.npz", trade_history,
+                                                initial_capital=self.capital_base, m_name=self.m_name)
+        if self.plot_mode == "background":
+            self.plot_future = render_artifact_async(self.plot_artifact, debug=self.debug)
+            self.plot_future.add_done_callback(self._check_plot)
+        elif self.plot_mode == "sync":
+            render_artifact(self.plot_artifact, debug=self.debug)
+        elif self.plot_mode != "deferred":
+            raise ValueError(f"不支持的绘图方式: {self.plot_mode}")
         
         if self.debug:
-            print(f"[DEBUG] 回测结果图表绘制完成")
+            print(f"[DEBUG] 绘图数据已保存到: {self.plot_artifact}，绘图方式: {self.plot_mode}")
+    
+    def _check_plot(self, future):
+        """后台绘图结束时检查结果，出错时给出警告"""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            print(f"[WARNING] 后台绘图失败: {type(error).__name__}: {error}")
+        elif self.debug:
+            print(f"[DEBUG] 后台绘图完成: {future.result()}")
+    
+    def wait_plots(self, timeout=None):
+        """
+        等待后台绘图（plot_mode="background"）完成
+        
+        参数:
+        timeout: 最长等待秒数，None表示一直等待
+        
+        返回:
+        生成的图片路径列表，没有后台绘图任务或绘图失败时返回空列表
+        """
+        if self.plot_future is None:
+            return []
+        try:
+            return self.plot_future.result(timeout=timeout)
+        except Exception:
+            # 失败原因已由_check_plot输出
+            return []
     
     def _close_all_positions(self, context, daily_data):
         """
@@ -270,6 +366,11 @@ class TraderV2:
         if self.debug:
             print(f"[DEBUG] 开始关闭所有持仓")
         
+        # 回测结束，撤销所有挂单（持仓的挂单在平仓时撤销）
+        for order in self.order.get_open_orders():
+            if order['stock_code'] not in self.order.positions:
+                self.order.cancel_order(order['order_id'])
+        
         # 获取所有持仓
         positions = self.order.get_all_positions()
         
@@ -301,8 +402,8 @@ class TraderV2:
             if self.debug:
                 print(f"[DEBUG] 卖出股票: {stock_code}，数量: {volume}，价格: {sell_price}，时间: {current_datetime}")
             
-            # 执行卖出操作
-            result = self.order.sell(stock_code, sell_price, volume, timestamp=current_datetime)
+            # 执行卖出操作，不受volume_limit限制
+            result = self.order.liquidate(stock_code, sell_price, timestamp=current_datetime)
             
             if result['success']:
                 if self.debug:
@@ -310,6 +411,11 @@ class TraderV2:
             else:
                 if self.debug:
                     print(f"[DEBUG] 卖出失败: {result['message']}")
+            
+            # 当日买入（T+1）或没有价格等原因未能卖出的部分
+            remaining = self.order.positions.get(stock_code, 0)
+            if remaining > 0:
+                print(f"[WARNING] 回测结束时未能平仓: {stock_code} 剩余{remaining}股，{result['message']}")
         
         # 同步持仓到context
         self._sync_positions_to_context()
@@ -317,55 +423,382 @@ class TraderV2:
         if self.debug:
             print(f"[DEBUG] 所有持仓已关闭")
     
+    def _build_events(self):
+        """根据triggers预先计算每根K线上被触发的股票"""
+        if self.triggers is None:
+            self.events = None
+            return
+        from m.core.events import build_event_index
+        self.events = build_event_index(self.panel, self.triggers)
+        if self.debug:
+            total = sum(len(columns) for columns in self.events)
+            active = sum(1 for columns in self.events if len(columns))
+            print(f"[DEBUG] 触发事件数: {total}，有事件的K线数: {active}/{len(self.events)}")
+    
+    def _dispatch(self, t, timestamp):
+        """
+        处理面板上的第t根K线：更新ArrayManager、撮合挂单并调用handle_data
+        
+        设置了triggers时只在有事件的K线上调用handle_data，data中只包含被触发的股票，
+        这些股票的ArrayManager从面板一次性载入历史数据，其余股票不做逐根处理
+        
+        返回:
+        当前K线所有有数据的股票（股票代码 -> BarRow）
+        """
+        panel = self.panel
+        bars = panel.bars(t)
+        if self.events is None:
+            for code, bar in bars.items():
+                # 更新ArrayManager
+                self.array_managers[code].update_bar(bar)
+            
+            # 按当前K线成交量撮合挂单
+            self.order.update_bars(bars, timestamp=timestamp)
+            self._handle_bars(bars)
+            return bars
+        
+        self.order.update_bars(bars, timestamp=timestamp)
+        columns = self.events[t]
+        if len(columns):
+            for j in columns:
+                am = self.array_managers[panel.codes[j]]
+                am.load_history(panel.history(t, j, am.size))
+            self._handle_bars(panel.bars(t, columns))
+        return bars
+    
+    def _handle_bars(self, bars):
+        """
+        调用handle_data，其中提交的市价单在handle_data返回后一起撮合，
+        成交价格（含滑点）一次性批量计算
+        """
+        self.order.begin_batch()
+        try:
+            self.handle_data(self.context, bars)
+        finally:
+            trades = self.order.flush_batch()
+        
+        batched, self.batched_orders = self.batched_orders, {}
+        if not batched:
+            return
+        filled = {}
+        for trade in trades:
+            volume, _ = filled.get(trade['order_id'], (0, None))
+            filled[trade['order_id']] = (volume + trade['volume'], trade['price'])
+        for order_id, order in batched.items():
+            volume, price = filled.get(order_id, (0, 0))
+            order['filled_price'] = price
+            order['filled_amount'] = volume if order['amount'] > 0 else -volume
+            if order_id in self.order.open_orders:
+                order['status'] = 'open'
+            elif volume == abs(order['amount']):
+                order['status'] = 'filled'
+            else:
+                order['status'] = 'rejected'
+        if trades:
+            self._sync_positions_to_context()
+    
     def _run_daily(self):
         """
         日线级别回测
+
+        所有股票的日线按交易日历对齐为 (交易日 × 股票) 的面板，
+        每天只把当天真实存在K线的股票传给handle_data
         """
+        from m.core.panel import BarPanel
+        
         if self.debug:
             print(f"[DEBUG] 运行日线回测")
         
-        # 遍历每个交易日
-        for date in self.dates:
+        self.panel = BarPanel.from_frames(self.data, frequency='daily',
+                                          start_date=self.start_date, end_date=self.end_date)
+        self.panel = self.panel.align(self.dates, fill=self.missing_bar)
+        if self.debug:
+            print(f"[DEBUG] 交易日数: {len(self.panel)}，有效K线数: {int(self.panel.valid.sum())}，"
+                  f"缺失K线数: {int(self.panel.filled.sum())}")
+        self._build_events()
+        
+        daily_data = {}
+        # 遍历每个交易日（从检查点恢复时从检查点之后的交易日开始）
+        for t in range(self._start_index(), len(self.dates)):
+            date = self.dates[t]
             # 设置当前日期
+            self.panel_index = t
             self.current_datetime = date
             self.context['current_datetime'] = date
             
             # 交易前处理
             self.before_trading_start(self.context)
             
-            # 准备当日数据
-            daily_data = {}
-            for code in self.stock_codes:
-                # 获取当日数据
-                df = self.data[code]
-                df['date'] = pd.to_datetime(df['date'])
-                today_data = df[df['date'].dt.date == date]
-                
-                if not today_data.empty:
-                    # 获取当日第一行数据（日线数据）
-                    daily_data[code] = today_data.iloc[0]
-                    
-                    # 更新ArrayManager
-                    bar = daily_data[code]
-                    self.array_managers[code].update_bar(bar)
-            
-            # 处理数据
-            self.handle_data(self.context, daily_data)
+            # 更新数据、撮合挂单并调用handle_data（只包含当天有K线的股票）
+            daily_data = self._dispatch(t, date)
             
             # 交易后处理
             self.after_trading(self.context)
+            self._record_equity()
+            self._save_periodic_checkpoint(t)
+        
+        # 平仓前保存最终状态，可作为后续回测的预热状态
+        self._save_final_checkpoint()
         
-        # 回测结束后关闭所有持仓
+        # 回测结束后关闭所有持仓（最后一天的资产按平仓后计算）
         self._close_all_positions(self.context, daily_data)
+        self._record_equity()
+    
+    def _record_equity(self, timestamp=None):
+        """
+        记录当天收盘后的总资产（同一天重复记录时覆盖）
+
+        参数:
+        timestamp: 记录的时间，None时使用当前时间
+        """
+        timestamp = self.current_datetime if timestamp is None else timestamp
+        if timestamp is None:
+            return
+        date = pd.Timestamp(timestamp).normalize()
+        value = self.order.current_capital
+        for code, volume in self.order.positions.items():
+            value += volume * self._get_current_price(code, 'close')
+        
+        if self.equity_dates and self.equity_dates[-1] == date:
+            self.equity_values[-1] = value
+        else:
+            self.equity_dates.append(date)
+            self.equity_values.append(value)
+    
+    def _benchmark_returns(self):
+        """
+        与资金曲线日期对齐的基准每日收益率（见m.core.benchmark），没有基准数据时返回None
+        """
+        if not self.benchmark or not self.equity_dates:
+            return None
+        from m.core.benchmark import benchmark_returns
+        data = self.data if isinstance(self.data, dict) else None
+        return benchmark_returns(self.benchmark, self.equity_dates, data=data, debug=self.debug)
+    
+    def _start_index(self):
+        """回测开始的K线序号：从检查点恢复时为检查点之后的第一根K线"""
+        if self.resume_timestamp is None:
+            return 0
+        return int(np.searchsorted(self.panel.timestamps, self.resume_timestamp, side='right'))
+    
+    def _save_periodic_checkpoint(self, t):
+        """按checkpoint_interval定期保存检查点"""
+        if self.checkpoint_path and self.checkpoint_interval and (t + 1) % self.checkpoint_interval == 0:
+            self._try_save_checkpoint(t)
+    
+    def _save_final_checkpoint(self):
+        """回测结束（平仓前）保存检查点"""
+        if self.checkpoint_path and self.panel_index is not None:
+            self._try_save_checkpoint(self.panel_index)
+    
+    def _try_save_checkpoint(self, t):
+        """回测过程中保存检查点，context等无法序列化时只给出警告，不中断回测"""
+        try:
+            self.save_checkpoint(self.checkpoint_path, t)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            print(f"[WARNING] 保存检查点失败（context中有无法序列化的对象），跳过: {e}")
+    
+    def save_checkpoint(self, path, t=None):
+        """
+        保存当前回测状态到检查点文件
+        
+        ArrayManager的缓冲区按数组保存，成交记录和订单记录按列追加保存为数组（每条记录只转换一次），
+        context和订单管理器的其余状态序列化保存，元数据头记录检查点对应的K线时间，用于恢复时定位
+        
+        参数:
+        path: 检查点文件路径
+        t: 检查点对应的面板K线序号，None时使用当前K线
+        """
+        from m.core.checkpoint import RecordColumns, save_checkpoint
+        
+        t = self.panel_index if t is None else t
+        if self.panel is None or t is None:
+            raise ValueError("回测尚未开始，无法保存检查点")
+        
+        arrays = {}
+        array_managers = {}
+        for code, am in self.array_managers.items():
+            state = am.get_state()
+            array_managers[code] = {'size': state['size'], 'count': state['count']}
+            for field, values in state['fields'].items():
+                arrays[f"am/{code}/{field}"] = values
+        
+        order_state = self.order.get_state()
+        if self.record_columns is None:
+            self.record_columns = {'trades': RecordColumns(), 'orders': RecordColumns()}
+        records = {'trades': order_state.pop('trade_history'), 'orders': self.orders}
+        for name, columns in self.record_columns.items():
+            # 只转换上次保存之后新增的记录
+            columns.extend(records[name][len(columns):])
+            arrays.update(columns.to_arrays(f"{name}/"))
+        
+        meta = {
+            'm_name': self.m_name,
+            'frequency': self.frequency,
+            'index': int(t),
+            'timestamp': int(self.panel.timestamps[t]),
+            'datetime': str(self.panel.datetime(t)),
+            'array_managers': array_managers,
+            'records': {name: columns.keys for name, columns in self.record_columns.items()},
+        }
+        state = {
+            'context': {key: value for key, value in self.context.items() if key != 'order'},
+            'order': order_state,
+            'trades': self.trades,
+            'equity': (self.equity_dates, self.equity_values),
+        }
+        save_checkpoint(path, arrays, meta, state)
+        if self.debug:
+            print(f"[DEBUG] 已保存检查点: {path}，时间: {meta['datetime']}")
+    
+    def load_checkpoint(self, path):
+        """
+        从检查点文件恢复回测状态
+        
+        恢复后run()跳过initialize，从检查点之后的第一根K线继续回测
+        
+        参数:
+        path: 检查点文件路径
+        """
+        from m.core.checkpoint import RecordColumns, load_checkpoint
+        
+        arrays, meta, state = load_checkpoint(path)
+        if meta.get('frequency') != self.frequency:
+            raise ValueError(f"检查点频率 {meta.get('frequency')} 与回测频率 {self.frequency} 不一致")
+        
+        for code, info in meta['array_managers'].items():
+            prefix = f"am/{code}/"
+            fields = {name[len(prefix):]: values for name, values in arrays.items() if name.startswith(prefix)}
+            if code not in self.array_managers:
+                self.array_managers[code] = ArrayManager()
+            self.array_managers[code].set_state({'size': info['size'], 'count': info['count'], 'fields': fields})
+        
+        self.record_columns = {name: RecordColumns.from_arrays(arrays, f"{name}/", keys)
+                               for name, keys in meta['records'].items()}
+        order_state = dict(state['order'], trade_history=self.record_columns['trades'].records())
+        self.order.set_state(order_state)
+        self.context = state['context']
+        self.context['order'] = self.order
+        self.orders = self.record_columns['orders'].records()
+        self.trades = state['trades']
+        self.equity_dates, self.equity_values = state['equity']
+        self.resume_timestamp = meta['timestamp']
+        self.initialized = True
+        if self.debug:
+            print(f"[DEBUG] 已从检查点恢复: {path}，时间: {meta['datetime']}")
     
+    def _run_bars(self):
+        """
+        分钟线合成K线回测
+
+        由分钟线数据一次性合成frequency指定频率的对齐面板，
+        按时间轴逐根K线更新ArrayManager并调用handle_data
+        """
+        from m.core.panel import BarPanel
+        from m.core.bar_aggregator import NS_PER_DAY
+
+        if self.debug:
+            print(f"[DEBUG] 运行{self.frequency}回测，数据频率: {self.data_frequency}")
+
+        panel = self.panel = BarPanel.from_frames(self.data, frequency=self.frequency,
+                                                  start_date=self.start_date, end_date=self.end_date)
+        if self.debug:
+            print(f"[DEBUG] 合成K线数量: {len(panel)}，股票数量: {len(panel.codes)}")
+        self._build_events()
+
+        bars = {}
+        start = self._start_index()
+        # 从检查点恢复时，检查点所在交易日的before_trading_start已经调用过
+        current_day = int(panel.timestamps[start - 1]) // NS_PER_DAY if start > 0 else None
+        for t in range(start, len(panel)):
+            day = int(panel.timestamps[t]) // NS_PER_DAY
+            # 跨日时先以上一根K线的状态完成前一天的收盘处理
+            if day != current_day and current_day is not None:
+                self.after_trading(self.context)
+                self._record_equity()
+            self.panel_index = t
+            self.current_datetime = panel.datetime(t)
+            self.context['current_datetime'] = self.current_datetime
+            if day != current_day:
+                current_day = day
+                self.before_trading_start(self.context)
+
+            bars = self._dispatch(t, self.current_datetime)
+            self._save_periodic_checkpoint(t)
+
+        if current_day is not None:
+            self.after_trading(self.context)
+            self._record_equity()
+        self._save_final_checkpoint()
+
+        # 回测结束后关闭所有持仓（最后一天的资产按平仓后计算）
+        self._close_all_positions(self.context, bars)
+        self._record_equity()
+
     def _run_tick(self):
         """
         Tick级别回测
+
+        各股票的Tick/分钟数据写入内存映射文件后按时间k路归并回放，
+        每个事件以该股票的TickView对象传给handle_tick(context, tick)，
+        跨日时依次调用after_trading、记录资金曲线和before_trading_start。
+        每个事件先更新该股票的ArrayManager和最新行情，有挂单时撮合该股票的挂单。
+        context['current_timestamp']为当前事件的int64纳秒时间戳（tick.datetime按需转换），
+        context['current_datetime']为当前交易日
         """
-        # 简化实现，实际需要遍历tick数据
+        from m.core.tick_engine import TickReplayer, NS_PER_DAY
+
         if self.debug:
             print(f"[DEBUG] 运行Tick回测")
-    
+
+        if self.handle_tick is None:
+            if self.debug:
+                print(f"[DEBUG] 未提供handle_tick，跳过Tick回测")
+            return
+
+        replayer = TickReplayer(self.data, start_date=self.start_date, end_date=self.end_date,
+                                debug=self.debug)
+        try:
+            context = self.context
+            handle_tick = self.handle_tick
+            order = self.order
+            array_managers = self.array_managers
+            # 各股票最新一条记录（回放器对每只股票复用同一个视图），作为挂单撮合和估值的行情
+            latest = self.latest_ticks = {}
+            current_day = None
+            for tick in replayer:
+                code = tick.code
+                timestamp = tick.timestamp
+                day = timestamp // NS_PER_DAY
+                if day != current_day:
+                    if current_day is not None:
+                        self.after_trading(context)
+                        self._record_equity()
+                    current_day = day
+                    self.current_datetime = context['current_datetime'] = pd.Timestamp(day * NS_PER_DAY)
+                    # 进入新的交易日（T+1可卖数量），不撮合挂单
+                    order.update_bars(latest, timestamp=self.current_datetime, codes=())
+                    self.before_trading_start(context)
+
+                self.current_timestamp = context['current_timestamp'] = timestamp
+                latest[code] = tick
+                am = array_managers.get(code)
+                if am is not None:
+                    am.update_bar(tick)
+                if order.has_pending(code):
+                    order.update_bars(latest, timestamp=tick.datetime, codes=(code,))
+                handle_tick(context, tick)
+
+            if current_day is not None:
+                self.after_trading(context)
+                self._record_equity()
+
+            # 回测结束后以各股票最后一条记录的价格关闭所有持仓
+            self._close_all_positions(context, replayer.last_views())
+            self._record_equity()
+        finally:
+            replayer.close()
+
     def get_results(self):
         """
         获取回测结果
@@ -377,8 +810,14 @@ class TraderV2:
         final_value = self.context['portfolio']['total_value']
         total_return = (final_value - self.capital_base) / self.capital_base * 100
         
-        # 计算每日收益等指标
-        # 这里简化实现，实际需要更复杂的计算
+        # 由每日资金曲线计算绩效指标
+        from m.core.analytics import compute_analytics
+        equity_curve = pd.Series(self.equity_values, index=pd.DatetimeIndex(self.equity_dates), dtype=np.float64)
+        analytics = None
+        if len(equity_curve):
+            analytics = compute_analytics(equity_curve.to_numpy(), dates=equity_curve.index,
+                                          trade_history=self.order.get_trade_history(),
+                                          benchmark_returns=self._benchmark_returns())
         
         return {
             'context': self.context,
@@ -387,61 +826,65 @@ class TraderV2:
             'positions': self.positions,
             'final_value': final_value,
             'total_return': total_return,
+            'equity_curve': equity_curve,
+            'analytics': analytics,
             'start_date': self.start_date,
             'end_date': self.end_date,
             'stock_count': len(self.stock_codes)
         }
     
-    def order(self, stock_code, amount, style='market'):
+    def place_order(self, stock_code, amount, style='market', limit_price=None, stop_price=None):
         """
         下单函数
         
         参数:
         stock_code: 股票代码
         amount: 下单数量，正数为买入，负数为卖出
-        style: 下单类型，market为市价单
+        style: 下单类型，market为市价单，limit为限价单，stop为止损单
+        limit_price: 限价单价格
+        stop_price: 止损单触发价格
         """
         if self.debug:
-            print(f"[DEBUG] 下单: 股票 {stock_code}，数量 {amount}")
+            print(f"[DEBUG] 下单: 股票 {stock_code}，数量 {amount}，类型 {style}")
         
-        # 获取当前价格
-        if amount > 0:  # 买入
-            price = self._get_current_price(stock_code, self.order_price_field_buy)
-        else:  # 卖出
-            price = self._get_current_price(stock_code, self.order_price_field_sell)
-        
-        # 使用OrderManager执行交易
-        if amount > 0:
-            # 买入
-            result = self.order.buy(stock_code, price, amount, timestamp=self.current_datetime)
-        else:
-            # 卖出
-            result = self.order.sell(stock_code, price, abs(amount), timestamp=self.current_datetime)
+        # 市价单按order_price_field_buy/order_price_field_sell取当前K线价格
+        current_time = self._current_time()
+        result = self.order.order(stock_code, amount, style=style, limit_price=limit_price,
+                                  stop_price=stop_price, timestamp=current_time)
         
         # 创建订单记录
+        if not result['success']:
+            status = 'rejected'
+        else:
+            status = result['status']
         order = {
             'stock_code': stock_code,
             'amount': amount,
             'style': style,
-            'datetime': self.current_datetime,
-            'status': 'filled' if result['success'] else 'rejected',
+            'limit_price': limit_price,
+            'stop_price': stop_price,
+            'datetime': current_time,
+            'status': status,
             'order_id': result.get('order_id', None),
             'message': result.get('message', '')
         }
         
-        if result['success']:
+        if result['success'] and result['filled_volume'] > 0:
             # 从交易历史中获取最新的交易记录
             trade_history = self.order.get_trade_history()
             if trade_history:
                 latest_trade = trade_history[-1]
                 order['filled_price'] = latest_trade['price']
-                order['filled_amount'] = amount
+            order['filled_amount'] = result['filled_volume'] if amount > 0 else -result['filled_volume']
             
             # 同步持仓到context
             self._sync_positions_to_context()
         else:
             order['filled_price'] = 0
             order['filled_amount'] = 0
+            if result['success'] and self.order.batch is not None:
+                # 成交结果在handle_data返回后批量撮合时更新
+                self.batched_orders[order['order_id']] = order
         
         # 添加到订单列表
         self.orders.append(order)
@@ -451,6 +894,12 @@ class TraderV2:
         
         return order
     
+    def _current_time(self):
+        """当前事件时间：Tick回测中由int64时间戳转换（只在下单时转换），其余为当前K线时间"""
+        if self.current_timestamp is not None:
+            return pd.Timestamp(self.current_timestamp)
+        return self.current_datetime
+    
     def _sync_positions_to_context(self):
         """
         同步OrderManager的持仓到context中
@@ -477,6 +926,19 @@ class TraderV2:
         """
         获取当前价格
         """
+        # 优先使用对齐面板中的价格（停牌时为向前填充的价格）
+        if self.panel is not None and self.panel_index is not None:
+            price = self.panel.value(self.panel_index, stock_code, price_field)
+            if price == price:
+                return price
+        
+        # Tick回测中使用该股票最新一条记录的价格
+        tick = self.latest_ticks.get(stock_code)
+        if tick is not None:
+            price = getattr(tick, price_field, None)
+            if price is not None and price == price:
+                return float(price)
+        
         # 从当前数据中获取价格
         for code in self.stock_codes:
             if code == stock_code:
@@ -0,0 +1,25 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from m.core.analytics import compute_analytics
+
+
+def test_analytics_are_plain_values():
+    dates = pd.bdate_range('2024-01-02', periods=6)
+    equity = np.array([100.0, 102.0, 99.0, 97.0, 101.0, 104.0])
+    trades = [
+        {'stock_code': 'A', 'direction': 'buy', 'price': 10.0, 'volume': 100, 'total_cost': 1000.0},
+        {'stock_code': 'A', 'direction': 'sell', 'price': 11.0, 'volume': 100, 'total_revenue': 1100.0,
+         'pnl': 100.0},
+    ]
+    result = compute_analytics(equity, dates=dates, trade_history=trades,
+                               benchmark_returns=np.full(6, 0.001))
+    for key, value in result.items():
+        if key != 'pnl_by_stock':
+            assert type(value) in (float, int, str), key
+    assert result['max_drawdown_start'] == '2024-01-03T00:00:00'
+    assert result['max_drawdown_end'] == '2024-01-05T00:00:00'
+    assert result['pnl_by_stock'] == {'A': 100.0}
+    json.dumps(result)
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from m.core.bar_aggregator import aggregate, bucket_starts, frame_to_arrays
+from m.core.panel import BarPanel
+
+
+def session_minutes(day, label='right'):
+    offset = 1 if label == 'right' else 0
+    morning = pd.date_range(f'{day} 09:30', periods=120, freq='min') + pd.Timedelta(minutes=offset)
+    afternoon = pd.date_range(f'{day} 13:00', periods=120, freq='min') + pd.Timedelta(minutes=offset)
+    return morning.append(afternoon)
+
+
+def minute_frame(times):
+    close = np.arange(len(times), dtype=float) + 10
+    return pd.DataFrame({'datetime': times, 'open': close, 'high': close + 1, 'low': close - 1,
+                         'close': close, 'volume': 100.0})
+
+
+@pytest.mark.parametrize('label', ['right', 'left'])
+def test_missing_minute_keeps_bars_aligned(label):
+    times = session_minutes('2024-01-02', label)
+    data = {'A': minute_frame(times), 'B': minute_frame(times.delete(7))}
+    panel = BarPanel.from_frames(data, frequency='30m')
+
+    assert len(panel) == 8
+    assert panel.valid.all()
+    expected = ['10:00', '10:30', '11:00', '11:30', '13:30', '14:00', '14:30', '15:00']
+    assert [pd.Timestamp(t).strftime('%H:%M') for t in panel.timestamps] == expected
+    volume = panel.fields['volume']
+    assert volume[0].tolist() == [3000.0, 2900.0]
+    assert (volume[1:] == 3000.0).all()
+
+
+def test_auction_and_gap_minutes_join_neighbouring_bars():
+    times = pd.DatetimeIndex(['2024-01-02 09:25', '2024-01-02 09:31', '2024-01-02 11:30',
+                              '2024-01-02 13:01', '2024-01-02 15:00'])
+    starts, bar_times = bucket_starts(times.to_numpy(dtype='datetime64[ns]').astype(np.int64), '60m')
+    assert starts.tolist() == [0, 2, 3, 4]
+    assert [pd.Timestamp(t).strftime('%H:%M') for t in bar_times] == ['10:30', '11:30', '14:00', '15:00']
+
+
+def test_aggregate_fields():
+    times, fields = frame_to_arrays(minute_frame(session_minutes('2024-01-02')))
+    bar_times, bars = aggregate(times, fields, '60m')
+    assert len(bar_times) == 4
+    assert bars['open'].tolist() == [10.0, 70.0, 130.0, 190.0]
+    assert bars['close'].tolist() == [69.0, 129.0, 189.0, 249.0]
+    assert bars['high'].tolist() == [70.0, 130.0, 190.0, 250.0]
+    assert bars['volume'].tolist() == [6000.0] * 4
+
+    day_times, day_bars = aggregate(times, fields, 'daily')
+    assert day_times.tolist() == [pd.Timestamp('2024-01-02').value]
+    assert day_bars['low'].tolist() == [9.0]
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import m.extract_data
+from m.core import benchmark
+
+
+@pytest.fixture
+def extractor(monkeypatch):
+    calls = []
+
+    class FakeExtractor:
+        def __init__(self, start_date, end_date, data, table_name):
+            calls.append((data[0], start_date, end_date))
+            self.code = data[0]
+            self.dates = pd.bdate_range(start_date, end_date)
+
+        def get_data(self):
+            close = 100 + np.arange(len(self.dates), dtype=float)
+            return {self.code: pd.DataFrame({'date': self.dates, 'close': close})}
+
+    monkeypatch.setattr(m.extract_data, 'ExtractDataV1', FakeExtractor)
+    benchmark.clear_cache()
+    yield calls
+    benchmark.clear_cache()
+
+
+def test_returns_aligned_to_calendar(extractor):
+    dates = pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-05'])
+    returns = benchmark.benchmark_returns('000300.SH', dates, table_name='index_daily')
+    np.testing.assert_allclose(returns, [np.nan, 1 / 100, 2 / 101])
+    benchmark.benchmark_returns('000300.SH', dates, table_name='index_daily')
+    assert len(extractor) == 1
+
+
+def test_cache_is_bounded(extractor):
+    size = benchmark.BENCHMARK_CACHE_SIZE
+    for day in range(size + 1):
+        start = pd.Timestamp('2024-01-01') + pd.Timedelta(days=day)
+        benchmark.load_benchmark_bars('000300.SH', start, start + pd.Timedelta(days=10), table_name='t')
+    assert benchmark._benchmark_bars.cache_info().currsize == size
+    # 最早的条目已被淘汰，重新提取
+    benchmark.load_benchmark_bars('000300.SH', '2024-01-01', '2024-01-11', table_name='t')
+    assert len(extractor) == size + 2
+
+
+def test_failed_load_is_not_cached(extractor, monkeypatch):
+    fake = m.extract_data.ExtractDataV1
+    failing = type('FailingExtractor', (fake,), {'get_data': lambda self: {}})
+    monkeypatch.setattr(m.extract_data, 'ExtractDataV1', failing)
+    assert benchmark.load_benchmark_bars('000300.SH', '2024-01-01', '2024-01-11', table_name='t') is None
+    assert benchmark._benchmark_bars.cache_info().currsize == 0
+
+    # 数据库恢复后重新提取成功
+    monkeypatch.setattr(m.extract_data, 'ExtractDataV1', fake)
+    dates, close = benchmark.load_benchmark_bars('000300.SH', '2024-01-01', '2024-01-11', table_name='t')
+    assert len(close) == 9
+    assert len(extractor) == 2
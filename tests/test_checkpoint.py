@@ -0,0 +1,30 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from m.core.checkpoint import RecordColumns, load_checkpoint, save_checkpoint
+
+
+def test_record_columns_round_trip(tmp_path):
+    records = [
+        {'order_id': 1, 'timestamp': pd.Timestamp('2024-01-02 09:31'), 'stock_code': 'A', 'price': 10.5},
+        {'order_id': 2, 'timestamp': None, 'stock_code': 'B', 'price': 9.0, 'pnl': -5.0},
+        {'order_id': 3, 'timestamp': pd.Timestamp('2024-01-03'), 'stock_code': 'A', 'price': 11.0,
+         'date': datetime.date(2024, 1, 3)},
+    ]
+    columns = RecordColumns()
+    columns.extend(records[:1])
+    columns.extend(records[1:])
+
+    path = str(tmp_path / 'state.npz')
+    save_checkpoint(path, columns.to_arrays('trades/'), {'keys': columns.keys}, {})
+    arrays, meta, _ = load_checkpoint(path)
+    assert all(array.dtype != object for array in arrays.values())
+    assert arrays['trades/order_id'].dtype == np.int64
+    restored = RecordColumns.from_arrays(arrays, 'trades/', meta['keys'])
+    assert restored.records() == records
+
+    # 恢复后继续追加
+    restored.extend([{'order_id': 4, 'stock_code': 'C', 'price': 1}])
+    assert restored.records()[-1] == {'order_id': 4, 'stock_code': 'C', 'price': 1.0}
@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from m.db.dbmgr import DBMgr
+
+
+@pytest.fixture
+def warehouse(tmp_path):
+    DBMgr.open(str(tmp_path / "it's" / 'warehouse.duckdb'))
+    yield tmp_path
+    DBMgr.open(None)
+    DBMgr.close()
+
+
+def test_import_paths_with_quotes(warehouse):
+    path = warehouse / "it's" / 'daily.csv'
+    pd.DataFrame({'code': ['000001', '600000'], 'close': [1.0, 2.0]}).to_csv(path, index=False)
+    assert DBMgr.import_csv('daily', str(path)) == 2
+    assert DBMgr.import_csv('daily', str(path), replace=False) == 4
+
+    parquet = warehouse / "it's" / 'daily.parquet'
+    pd.DataFrame({'code': ['000002'], 'close': [3.0]}).to_parquet(parquet)
+    assert DBMgr.import_parquet('daily', str(parquet), replace=False) == 5
+    assert DBMgr.query("SELECT code FROM daily ORDER BY close")['code'].tolist()[0] == '000001'
+
+
+def test_warehouse_shared_between_processes(warehouse):
+    path = warehouse / "it's" / 'daily.parquet'
+    pd.DataFrame({'code': ['000001'], 'close': [1.0]}).to_parquet(path)
+    DBMgr.import_parquet('daily', str(path))
+    # 导入结束后恢复只读，其他进程可以同时打开
+    assert DBMgr.query("SELECT COUNT(*) AS n FROM daily")['n'][0] == 1
+
+    script = (
+        "from m.db.dbmgr import DBMgr\n"
+        f"DBMgr.open({DBMgr.warehouse_path()!r})\n"
+        "print(DBMgr.query('SELECT COUNT(*) AS n FROM daily')['n'][0])\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=60,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().endswith('1')
+
+
+@pytest.fixture
+def memory_db():
+    DBMgr.open(None)
+    yield
+    DBMgr.close()
+
+
+def test_threads_query_concurrently(memory_db):
+    DBMgr.register('prices', pd.DataFrame({'code': ['a', 'b'] * 500, 'close': range(1000)}))
+    barrier = threading.Barrier(8)
+
+    def work(i):
+        barrier.wait()
+        cursor = DBMgr.get()
+        totals = [DBMgr.query(f"SELECT SUM(close) AS s FROM prices WHERE code = '{'ab'[i % 2]}'")['s'][0]
+                  for _ in range(20)]
+        return id(cursor), set(totals)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(work, range(8)))
+    # 每个线程使用自己的游标，结果一致
+    assert len({cursor for cursor, _ in results}) == 8
+    assert [totals for _, totals in results] == [{249500}, {250000}] * 4
+
+
+def test_view_registered_after_cursor_created(memory_db):
+    created = threading.Event()
+    registered = threading.Event()
+    result = {}
+
+    def work():
+        DBMgr.get()
+        created.set()
+        registered.wait(10)
+        result['rows'] = DBMgr.query("SELECT COUNT(*) AS n FROM late")['n'][0]
+        DBMgr.unregister('late')
+        result['visible'] = DBMgr.has_table('late')
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    assert created.wait(10)
+    DBMgr.register('late', pd.DataFrame({'x': [1, 2, 3]}))
+    registered.set()
+    thread.join(10)
+    assert result == {'rows': 3, 'visible': False}
+    # 其他线程取消注册后，当前线程也看不到
+    assert not DBMgr.has_table('late')
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from m.core.downsample import downsample, lttb, minmax
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(7)
+    x = np.arange(1000, dtype=np.float64)
+    y = rng.standard_normal(1000).cumsum()
+    # 单点尖峰
+    y[437] = y.max() + 50
+    y[612] = y.min() - 50
+    return x, y
+
+
+@pytest.mark.parametrize('threshold', [3, 10, 99, 500])
+def test_lttb_keeps_endpoints_and_length(series, threshold):
+    x, y = series
+    index = lttb(x, y, threshold)
+    assert len(index) == threshold
+    assert index[0] == 0 and index[-1] == len(x) - 1
+    assert (np.diff(index) > 0).all()
+
+
+def test_lttb_keeps_spikes(series):
+    x, y = series
+    index = lttb(x, y, 50)
+    assert 437 in index and 612 in index
+
+
+@pytest.mark.parametrize('threshold', [2, 1000, 2000])
+def test_lttb_passthrough(series, threshold):
+    x, y = series
+    assert lttb(x, y, threshold).tolist() == list(range(len(x)))
+
+
+@pytest.mark.parametrize('buckets', [1, 7, 100])
+def test_minmax_keeps_bucket_extremes(series, buckets):
+    _, y = series
+    index = minmax(y, buckets)
+    assert len(index) <= 2 * buckets + 2
+    assert index[0] == 0 and index[-1] == len(y) - 1
+    assert (np.diff(index) > 0).all()
+    edges = np.linspace(1, len(y) - 1, buckets + 1).astype(np.int64)
+    selected = set(index.tolist())
+    for start, end in zip(edges[:-1], edges[1:]):
+        bucket = y[start:end]
+        assert start + int(np.argmin(bucket)) in selected
+        assert start + int(np.argmax(bucket)) in selected
+
+
+def test_minmax_passthrough(series):
+    _, y = series
+    assert minmax(y[:10], 4).tolist() == list(range(10))
+    assert minmax(y, 0).tolist() == list(range(len(y)))
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+@pytest.mark.parametrize('max_points', [4, 51, 300])
+def test_downsample(series, method, max_points):
+    x, y = series
+    sampled_x, sampled_y = downsample(x, y, max_points, method=method)
+    assert len(sampled_x) == len(sampled_y) <= max_points
+    assert (sampled_x[0], sampled_x[-1]) == (x[0], x[-1])
+    assert (sampled_y[0], sampled_y[-1]) == (y[0], y[-1])
+    assert sampled_y.max() == y.max() and sampled_y.min() == y.min()
+
+
+def test_downsample_short_series_unchanged(series):
+    x, y = series
+    for max_points in (len(y), len(y) + 1, None):
+        sampled_x, sampled_y = downsample(x, y, max_points)
+        assert sampled_x is x and sampled_y is y
+
+
+def test_downsample_unknown_method(series):
+    x, y = series
+    with pytest.raises(ValueError):
+        downsample(x, y, 10, method='mean')
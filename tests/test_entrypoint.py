@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'docker', 'app'))
+
+import qwesdk_entrypoint as entrypoint  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    (tmp_path / 'qwesdk-1.2.0.tar.gz').write_bytes(b'package')
+    monkeypatch.setattr(entrypoint, 'MARKER_PATH', tmp_path / 'marker.json')
+    state = {'installed': '1.2.0', 'installs': 0}
+
+    def install_package(path):
+        state['installs'] += 1
+        state['installed'] = '1.2.0'
+        return True
+
+    monkeypatch.setattr(entrypoint, 'get_installed_version', lambda: state['installed'])
+    monkeypatch.setattr(entrypoint, 'install_package', install_package)
+    monkeypatch.setattr(entrypoint.subprocess, 'run', lambda *args, **kwargs: None)
+    return tmp_path, state
+
+
+def test_missing_marker_with_same_version_skips_install(app):
+    app_dir, state = app
+    assert entrypoint.main(app_dir)
+    assert state['installs'] == 0
+    assert entrypoint.read_marker()['version'] == '1.2.0'
+    # 之后的启动使用标记文件
+    assert entrypoint.main(app_dir)
+    assert state['installs'] == 0
+
+
+def test_missing_marker_with_other_version_installs(app):
+    app_dir, state = app
+    state['installed'] = '1.1.0'
+    assert entrypoint.main(app_dir)
+    assert state['installs'] == 1
+    assert entrypoint.read_marker()['version'] == '1.2.0'
+
+
+def test_changed_package_reinstalls(app):
+    app_dir, state = app
+    entrypoint.main(app_dir)
+    (app_dir / 'qwesdk-1.2.0.tar.gz').write_bytes(b'rebuilt package')
+    assert entrypoint.main(app_dir)
+    assert state['installs'] == 1
+
+
+def test_unwritable_marker_is_reported(app, monkeypatch, capsys):
+    app_dir, state = app
+    monkeypatch.setattr(entrypoint, 'MARKER_PATH', app_dir / 'missing' / 'marker.json')
+    assert entrypoint.main(app_dir)
+    assert state['installs'] == 0
+    assert '写入安装标记失败' in capsys.readouterr().out
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from m.core.events import build_event_index, trigger_mask
+from m.core.panel import BarPanel
+
+
+@pytest.fixture
+def panel():
+    # 两只股票，5根K线；B的第3根K线缺失（停牌），k/d中有NaN
+    k = np.array([[1.0, 5.0], [3.0, 4.0], [2.0, np.nan], [4.0, 2.0], [np.nan, 6.0]])
+    d = np.array([[2.0, 3.0], [2.0, 4.0], [2.5, 3.0], [3.0, 3.0], [3.0, 3.0]])
+    signal = np.array([[0.0, 1.0], [np.nan, 0.0], [2.0, 0.0], [0.0, -1.0], [0.0, np.nan]])
+    valid = np.ones(k.shape, dtype=bool)
+    valid[2, 1] = False
+    timestamps = pd.bdate_range('2024-01-02', periods=5).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    return BarPanel(timestamps, ['A', 'B'], {'k': k, 'd': d, 'signal': signal}, valid)
+
+
+def test_signal_field(panel):
+    # 非0且非NaN
+    assert trigger_mask(panel, 'signal').tolist() == [[False, True], [False, False], [True, False],
+                                                      [False, True], [False, False]]
+
+
+@pytest.mark.parametrize('op, expected', [
+    ('>', [[False, True], [True, False], [False, False], [True, False], [False, True]]),
+    ('>=', [[False, True], [True, True], [False, False], [True, False], [False, True]]),
+    ('<', [[True, False], [False, False], [True, False], [False, True], [False, False]]),
+    ('<=', [[True, False], [False, True], [True, False], [False, True], [False, False]]),
+    ('==', [[False, False], [False, True], [False, False], [False, False], [False, False]]),
+    # NaN与任何值都不相等
+    ('!=', [[True, True], [True, False], [True, True], [True, True], [True, True]]),
+])
+def test_compare_fields(panel, op, expected):
+    assert trigger_mask(panel, ('k', op, 'd')).tolist() == expected
+
+
+def test_compare_constant(panel):
+    assert trigger_mask(panel, ('k', '>=', 4)).tolist() == [[False, True], [False, True], [False, False],
+                                                            [True, False], [False, True]]
+
+
+def test_cross(panel):
+    # 上一根 k-d<=0 且当前 >0 为上穿；上一根或当前为NaN时不触发（B第4根K线的上一根为NaN，不算下穿）
+    up = [[False, False], [True, False], [False, False], [True, False], [False, True]]
+    down = [[False, False], [False, False], [True, False], [False, False], [False, False]]
+    assert trigger_mask(panel, ('cross_up', 'k', 'd')).tolist() == up
+    assert trigger_mask(panel, ('cross_down', 'k', 'd')).tolist() == down
+    assert trigger_mask(panel, ('cross', 'k', 'd')).tolist() == (np.array(up) | np.array(down)).tolist()
+    # 第一根K线没有上一根，不触发
+    assert not trigger_mask(panel, ('cross', 'k', 0)).any()
+    assert trigger_mask(panel, ('cross_up', 'k', 3.5)).tolist() == [[False, False], [False, False], [False, False],
+                                                                   [True, False], [False, True]]
+
+
+def test_callable_and_array(panel):
+    mask = np.zeros(panel.valid.shape, dtype=bool)
+    mask[1, 0] = True
+    assert trigger_mask(panel, mask).tolist() == mask.tolist()
+    assert trigger_mask(panel, lambda p: p.fields['k'] > 4).tolist() == (panel.fields['k'] > 4).tolist()
+
+
+@pytest.mark.parametrize('trigger, error', [
+    ('missing', KeyError),
+    (('cross_up', 'k', 'missing'), KeyError),
+    (('k', '~', 'd'), ValueError),
+    (np.zeros((2, 2), dtype=bool), ValueError),
+])
+def test_invalid_triggers(panel, trigger, error):
+    with pytest.raises(error):
+        trigger_mask(panel, trigger)
+
+
+def test_build_event_index(panel):
+    events = build_event_index(panel, ['signal', ('cross_up', 'k', 'd')])
+    # 任一条件满足即触发，每根K线上的列号按顺序排列
+    assert [column.tolist() for column in events] == [[1], [0], [0], [0, 1], [1]]
+    # B停牌的K线即使条件满足也不触发
+    assert [column.tolist() for column in build_event_index(panel, ('d', '>=', 3))] == [[1], [1], [], [0, 1], [0, 1]]
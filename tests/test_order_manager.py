@@ -0,0 +1,154 @@
+import numpy as np
+import pytest
+
+from m.core.order_manager import OrderManager, _PriceBook
+from m.core.slippage import BpsSlippage, FixedSlippage, SpreadSlippage, SqrtImpactSlippage
+
+
+def bar(price, volume=1e6, **fields):
+    return dict(open=price, high=price + 0.5, low=price - 0.5, close=price, volume=volume, **fields)
+
+
+def manager(**kwargs):
+    kwargs.setdefault('slippage_model', FixedSlippage(0.0))
+    return OrderManager(initial_capital=1e7, **kwargs)
+
+
+def test_no_volume_cap_by_default():
+    om = manager()
+    om.update_bars({'A': bar(10.0, volume=100)}, timestamp='2024-01-02')
+    result = om.order('A', 10000, timestamp='2024-01-02')
+    assert result['status'] == 'filled'
+    assert om.positions['A'] == 10000
+
+
+def test_resting_market_order_repriced_each_bar():
+    om = manager(volume_limit=0.5)
+    om.update_bars({'A': bar(10.0, volume=1000)}, timestamp='2024-01-02')
+    result = om.order('A', 1000, price=10.0, timestamp='2024-01-02')
+    assert result['status'] == 'open' and result['filled_volume'] == 500
+
+    trades = om.update_bars({'A': bar(12.0, volume=1000)}, timestamp='2024-01-03')
+    assert [trade['price'] for trade in trades] == [12.0]
+    assert om.positions['A'] == 1000
+
+
+def test_liquidate_ignores_volume_cap():
+    om = manager(volume_limit=0.5)
+    om.update_bars({'A': bar(10.0, volume=1000)}, timestamp='2024-01-02')
+    om.order('A', 400, timestamp='2024-01-02')
+    om.update_bars({'A': bar(11.0, volume=1000)}, timestamp='2024-01-03')
+    om.order('A', 1000, timestamp='2024-01-03')
+    # 卖单挂在队列中，只成交了一半
+    sell = om.order('A', -400, timestamp='2024-01-03')
+    assert om.positions['A'] == 900 and om.get_open_orders()
+
+    om.update_bars({'A': bar(12.0, volume=100)}, timestamp='2024-01-04')
+    result = om.liquidate('A', None, timestamp='2024-01-04')
+    assert result['status'] == 'filled'
+    assert 'A' not in om.positions
+    assert om.get_open_orders() == [] and om.pending_sell == {}
+    assert om.order_queues.get('A') is None
+    assert om.open_orders.get(sell['order_id']) is None
+
+
+def test_liquidate_keeps_same_day_buys():
+    om = manager(t_plus_one=True)
+    om.update_bars({'A': bar(10.0)}, timestamp='2024-01-02')
+    om.order('A', 100, timestamp='2024-01-02')
+    assert om.liquidate('A', None, timestamp='2024-01-02') == {'success': False, 'message': '没有可卖持仓'}
+    assert om.positions['A'] == 100
+
+
+class CountingSlippage(FixedSlippage):
+    """记录每次批量计算的订单数"""
+
+    def __init__(self, slippage):
+        super().__init__(slippage)
+        self.batches = []
+
+    def cost(self, prices, volumes, bar_volumes, spreads):
+        self.batches.append(len(prices))
+        return super().cost(prices, volumes, bar_volumes, spreads)
+
+
+def test_batch_prices_orders_in_one_call():
+    slippage = CountingSlippage(0.1)
+    om = manager(slippage_model=slippage)
+    om.update_bars({'A': bar(10.0), 'B': bar(20.0)}, timestamp='2024-01-02')
+    om.buy('A', None, 100, timestamp='2024-01-02')
+    assert slippage.batches == [1]
+
+    om.begin_batch()
+    first = om.buy('A', None, 100, timestamp='2024-01-02')
+    om.buy('B', None, 200, timestamp='2024-01-02')
+    om.sell('A', None, 100, timestamp='2024-01-02')
+    assert first['status'] == 'open' and om.positions == {'A': 100}
+    # 批量中的卖单已占用可卖数量
+    assert om.get_sellable_volume('A') == 0
+    trades = om.flush_batch()
+    assert slippage.batches == [1, 3]
+    assert [(trade['stock_code'], trade['price']) for trade in trades] == [('A', 10.1), ('B', 20.1), ('A', 9.9)]
+    assert om.positions == {'A': 100, 'B': 200} and om.get_open_orders() == []
+
+
+def test_batch_rejects_orders_beyond_cash():
+    om = OrderManager(initial_capital=1500, slippage_model=FixedSlippage(0.0))
+    om.update_bars({'A': bar(10.0)}, timestamp='2024-01-02')
+    om.begin_batch()
+    om.buy('A', None, 100, timestamp='2024-01-02')
+    om.buy('A', None, 100, timestamp='2024-01-02')
+    trades = om.flush_batch()
+    assert len(trades) == 1 and om.positions['A'] == 100
+    assert om.get_open_orders() == []
+
+
+def test_price_book_pops_crossed_orders_by_priority():
+    book = _PriceBook()
+    for order_id, key in [(1, 9.8), (2, 10.2), (3, 10.0), (4, 10.2), (5, 9.5)]:
+        book.insert(key, {'order_id': order_id})
+    assert [order['order_id'] for order in book.pop_triggered(10.0)] == [2, 4, 3]
+    assert len(book) == 2
+    assert book.pop_triggered(10.0) == []
+    assert [order['order_id'] for order in book.pop_triggered(0)] == [1, 5]
+
+
+def test_limit_and_stop_orders_trigger_on_high_low():
+    om = manager()
+    om.update_bars({'A': bar(10.0)}, timestamp='2024-01-02')
+    om.order('A', 1000, timestamp='2024-01-02')
+    buy_limit = om.order('A', 100, style='limit', limit_price=9.0, timestamp='2024-01-02')
+    sell_stop = om.order('A', -300, style='stop', stop_price=9.2, timestamp='2024-01-02')
+    assert buy_limit['status'] == sell_stop['status'] == 'open'
+
+    # 最低价9.5：都不触发
+    assert om.update_bars({'A': bar(10.0)}, timestamp='2024-01-03') == []
+    # 跳空低开到8.5：限价单按更优的开盘价成交，止损单按开盘价成交
+    trades = om.update_bars({'A': bar(8.5)}, timestamp='2024-01-04')
+    assert sorted((trade['direction'], trade['price']) for trade in trades) == [('buy', 8.5), ('sell', 8.5)]
+    assert om.positions['A'] == 800 and om.get_open_orders() == []
+
+
+def test_t_plus_one_blocks_same_day_sell():
+    om = manager(t_plus_one=True)
+    om.update_bars({'A': bar(10.0)}, timestamp='2024-01-02')
+    om.order('A', 100, timestamp='2024-01-02')
+    assert om.order('A', -100, timestamp='2024-01-02')['success'] is False
+    om.update_bars({'A': bar(10.0)}, timestamp='2024-01-03')
+    assert om.order('A', -100, timestamp='2024-01-03')['status'] == 'filled'
+
+
+@pytest.mark.parametrize('model, expected', [
+    (FixedSlippage(0.02), [10.02, 19.98]),
+    (BpsSlippage(10), [10.01, 19.98]),
+    (SpreadSlippage(), [10.05, 19.95]),
+])
+def test_slippage_models(model, expected):
+    prices = model.execution_prices([10.0, 20.0], [100, 100], [1, -1], bar_volumes=[1e6, 1e6],
+                                    spreads=[0.1, 0.1])
+    np.testing.assert_allclose(prices, expected)
+
+
+def test_sqrt_impact_grows_with_participation():
+    prices = SqrtImpactSlippage().execution_prices([10.0] * 3, [1e3, 1e4, 1e5], [1] * 3, bar_volumes=[1e6] * 3)
+    assert 10.0 < prices[0] < prices[1] < prices[2]
@@ -0,0 +1,85 @@
+import json
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'docker', 'app'))
+
+import output_stream  # noqa: E402
+from output_stream import OutputStream, RingBuffer  # noqa: E402
+
+
+class FakeRedis:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, channel, message):
+        self.messages.append((channel, json.loads(message)))
+
+
+class FakeTask:
+    def __init__(self, task_id='task-1'):
+        self.request = types.SimpleNamespace(id=task_id)
+        self.states = []
+
+    def update_state(self, state, meta):
+        self.states.append((state, meta))
+
+
+def test_ring_buffer_keeps_latest_chars():
+    buffer = RingBuffer(10)
+    for text in ['abcd', 'efgh', 'ijkl']:
+        buffer.append(text)
+    assert buffer.size == 10
+    assert buffer.dropped == 2
+    assert buffer.tail(5) == 'hijkl'
+    assert buffer.tail(100) == 'cdefghijkl'
+    assert buffer.getvalue() == "...[已省略前 2 个字符]...\ncdefghijkl"
+
+
+def test_ring_buffer_drops_oversized_chunk():
+    buffer = RingBuffer(4)
+    buffer.append('0123456789')
+    assert buffer.getvalue().endswith('\n6789')
+    assert buffer.dropped == 6
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    monkeypatch.setattr(output_stream, 'PUBLISH_INTERVAL', 3600)
+    monkeypatch.setattr(output_stream, 'PROGRESS_INTERVAL', 3600)
+    return OutputStream(FakeTask(), 'p1', redis=FakeRedis())
+
+
+def test_write_batches_until_interval(stream):
+    stream('stdout', 'a\n')
+    stream('stdout', 'b\n')
+    stream('stderr', 'c\n')
+    assert stream.redis.messages == []
+    stream.close(0)
+    messages = [message for _, message in stream.redis.messages]
+    assert messages == [{'stream': 'stdout', 'text': 'a\nb\n', 'seq': 1},
+                        {'stream': 'stderr', 'text': 'c\n', 'seq': 2},
+                        {'event': 'end', 'returncode': 0, 'seq': 3}]
+    assert stream.lines == {'stdout': 2, 'stderr': 1}
+
+
+def test_tick_flushes_pending_output_when_idle(stream, monkeypatch):
+    stream('stdout', 'waiting\n')
+    stream.tick()
+    assert stream.redis.messages == []
+
+    monkeypatch.setattr(output_stream, 'PUBLISH_INTERVAL', 0)
+    monkeypatch.setattr(output_stream, 'PROGRESS_INTERVAL', 0)
+    stream.tick()
+    assert [message['text'] for _, message in stream.redis.messages] == ['waiting\n']
+    state, meta = stream.task.states[-1]
+    assert state == 'PROGRESS'
+    assert meta['stdout_tail'] == 'waiting\n'
+
+    # 没有待发布的输出时只更新进度
+    stream.tick()
+    assert len(stream.redis.messages) == 1
+    assert len(stream.task.states) == 2
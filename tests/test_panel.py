@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from m.core.panel import BarPanel
+
+
+def daily_frame(dates, start=10.0):
+    close = start + np.arange(len(dates), dtype=float)
+    return pd.DataFrame({'date': pd.to_datetime(dates), 'close': close, 'volume': close * 100})
+
+
+@pytest.fixture
+def frames():
+    # A在第2、4天停牌，B第2天才上市且最后一天停牌，两者的交易日不完全相同
+    return {
+        'A': daily_frame(['2024-01-02', '2024-01-04', '2024-01-08']),
+        'B': daily_frame(['2024-01-03', '2024-01-04', '2024-01-05'], start=20.0),
+    }
+
+
+@pytest.fixture
+def calendar():
+    return pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05', '2024-01-08'])
+
+
+def expected_frame(frame, calendar, fill):
+    reindexed = frame.set_index('date').reindex(calendar)
+    return reindexed.ffill() if fill else reindexed
+
+
+@pytest.mark.parametrize('fill', ['ffill', None])
+def test_align_matches_pandas_reindex(frames, calendar, fill):
+    panel = BarPanel.from_frames(frames).align(calendar, fill=fill)
+
+    assert panel.timestamps.tolist() == calendar.to_numpy(dtype='datetime64[ns]').astype(np.int64).tolist()
+    assert panel.valid.tolist() == [[True, False], [False, True], [True, True], [False, True], [True, False]]
+    expected_filled = [[False, False], [True, False], [False, False], [True, False], [False, True]]
+    assert panel.filled.tolist() == (expected_filled if fill else np.zeros((5, 2), dtype=bool).tolist())
+
+    for j, code in enumerate(panel.codes):
+        expected = expected_frame(frames[code], calendar, fill)
+        for name in ('close', 'volume'):
+            np.testing.assert_array_equal(panel.fields[name][:, j], expected[name].to_numpy())
+
+
+def test_align_drops_bars_outside_calendar(frames):
+    calendar = pd.to_datetime(['2024-01-03', '2024-01-04'])
+    panel = BarPanel.from_frames(frames).align(calendar)
+    # A在1月2日的K线不在日历中，被丢弃，也不用于向前填充1月3日
+    assert panel.valid.tolist() == [[False, True], [True, True]]
+    assert panel.filled.tolist() == [[False, False], [False, False]]
+    assert np.isnan(panel.fields['close'][0, 0])
+    assert panel.fields['close'][1].tolist() == [11.0, 21.0]
+
+
+def test_align_normalizes_daily_timestamps(frames):
+    calendar = pd.to_datetime(['2024-01-02 15:00', '2024-01-03 15:00'])
+    panel = BarPanel.from_frames(frames).align(calendar)
+    assert [pd.Timestamp(t) for t in panel.timestamps] == list(pd.to_datetime(['2024-01-02', '2024-01-03']))
+    assert panel.valid.tolist() == [[True, False], [False, True]]
+
+
+def test_history_skips_filled_bars(frames, calendar):
+    panel = BarPanel.from_frames(frames).align(calendar)
+    a = panel.code_index['A']
+    # 截至第4行（1月8日），A只有3根真实K线，停牌日的填充值不计入
+    assert panel.history(4, a, 2)['close'].tolist() == [11.0, 12.0]
+    assert panel.history(4, a, 10)['close'].tolist() == [10.0, 11.0, 12.0]
+    # 截至停牌日（第3行）的窗口不包含当天
+    assert panel.history(3, a, 2)['close'].tolist() == [10.0, 11.0]
+    b = panel.code_index['B']
+    assert panel.history(0, b, 5)['close'].tolist() == []
+    assert panel.value(4, 'B', 'close') == 22.0
+    assert np.isnan(panel.value(0, 'B', 'close'))
+
+
+def series_daily_data(frames, date):
+    """原来的daily_data：当天有数据的股票 -> 该行的Series"""
+    daily_data = {}
+    for code, frame in frames.items():
+        today = frame[frame['date'] == date]
+        if not today.empty:
+            daily_data[code] = today.iloc[0]
+    return daily_data
+
+
+def test_panel_rows_match_series_daily_data(frames, calendar):
+    panel = BarPanel.from_frames(frames).align(calendar)
+    for t, date in enumerate(calendar):
+        rows = panel.bars(t)
+        expected = series_daily_data(frames, date)
+        # 停牌（向前填充）和未上市的股票不出现在当天数据中
+        assert list(rows) == list(expected)
+        assert sorted(rows.keys()) == sorted(expected)
+        assert len(rows) == len(expected)
+        for code, series in expected.items():
+            assert code in rows
+            bar = rows[code]
+            assert bar.close == series['close'] == bar['close']
+            assert bar.get('volume') == series['volume']
+        for code in set(frames) - set(expected):
+            assert code not in rows
+            assert rows.get(code) is None
+            with pytest.raises(KeyError):
+                rows[code]
+
+
+def test_bar_row_access(frames, calendar):
+    panel = BarPanel.from_frames(frames).align(calendar)
+    bar = panel.bars(2)['B']
+    assert bar.code == bar['code'] == 'B'
+    assert bar.datetime == bar['datetime'] == pd.Timestamp('2024-01-04')
+    assert bar.date == pd.Timestamp('2024-01-04')
+    assert not bar.filled
+    assert sorted(bar.keys()) == ['close', 'volume']
+    assert 'close' in bar and 'k' not in bar
+    assert bar.get('k', 0) == 0
+    assert not hasattr(bar, 'k')
+    with pytest.raises(KeyError):
+        bar['k']
+    assert bar.to_dict() == {'close': 21.0, 'volume': 2100.0, 'code': 'B', 'datetime': pd.Timestamp('2024-01-04')}
+
+
+def test_panel_rows_with_columns(frames, calendar):
+    panel = BarPanel.from_frames(frames).align(calendar)
+    # 只包含指定列（如被触发的股票）时，填充的K线也可以访问并带有filled标记
+    rows = panel.bars(3, np.array([panel.code_index['A']]))
+    assert list(rows) == ['A'] and 'B' not in rows
+    assert rows['A'].filled
+    assert rows['A'].close == 11.0
+    assert [code for code, _ in rows.items()] == ['A']
+    assert [bar.code for bar in rows.values()] == ['A']
@@ -0,0 +1,18 @@
+import multiprocessing
+import time
+
+import pytest
+
+from m.core.plotting import render_artifact_async
+
+
+def test_render_async_reports_errors_and_exits(tmp_path):
+    future = render_artifact_async(str(tmp_path / 'missing.npz'))
+    with pytest.raises(FileNotFoundError):
+        future.result(timeout=60)
+
+    # 进程池提交后即关闭，绘图结束后不残留工作进程
+    deadline = time.monotonic() + 10
+    while multiprocessing.active_children() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert multiprocessing.active_children() == []
@@ -0,0 +1,105 @@
+import sys
+
+import pandas as pd
+import pytest
+
+from m.db.dbmgr import DBMgr
+from m.db.query_cache import QueryCache
+from m.extract_data.extract_data_v1 import ExtractDataV1
+from m.selector import selector as selector_module
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('QWESDK_QUERY_CACHE_DIR', str(tmp_path / 'cache'))
+    return tmp_path / 'cache'
+
+
+def counting_loader(result):
+    calls = []
+
+    def load():
+        calls.append(1)
+        return result
+    return load, calls
+
+
+def test_fetch_caches_dataframe(cache_dir):
+    load, calls = counting_loader(pd.DataFrame({'code': ['000001', '600000'], 'close': [1.0, 2.0]}))
+    first = QueryCache.fetch('SELECT 1', load)
+    second = QueryCache.fetch('SELECT 1', load)
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+    assert second['code'].tolist() == ['000001', '600000']
+
+
+def test_fetch_does_not_cache_none(cache_dir):
+    load, calls = counting_loader(None)
+    assert QueryCache.fetch('SELECT 2', load) is None
+    assert QueryCache.fetch('SELECT 2', load) is None
+    assert len(calls) == 2
+
+
+def test_evict_removes_lock_files(cache_dir):
+    QueryCache.fetch('SELECT 3', counting_loader(pd.DataFrame({'a': [1]}))[0])
+    QueryCache.fetch('SELECT 4', counting_loader(None)[0])
+    assert len(list(cache_dir.glob('[!.]*.lock'))) == 2
+    assert QueryCache.clear() == 1
+    assert list(cache_dir.glob('*.arrow')) == []
+    assert list(cache_dir.glob('[!.]*.lock')) == []
+
+
+def test_fetch_without_fcntl(cache_dir, monkeypatch):
+    # 没有fcntl的平台不加锁，缓存仍然可用
+    monkeypatch.setitem(sys.modules, 'fcntl', None)
+    load, calls = counting_loader(pd.DataFrame({'a': [1.0]}))
+    QueryCache.fetch('SELECT 5', load)
+    assert QueryCache.fetch('SELECT 5', load)['a'].tolist() == [1.0]
+    assert len(calls) == 1
+    assert QueryCache.clear() == 1
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.mark.parametrize('text, expected, cached', [
+    ('code\n000001\n600000\n', ['000001', '600000'], True),
+    ('code\n', [], False),
+    ('', [], False),
+])
+def test_selector_caches_only_parsed_codes(cache_dir, monkeypatch, text, expected, cached):
+    requests_made = []
+
+    def get(url):
+        requests_made.append(url)
+        return FakeResponse(text)
+
+    monkeypatch.setattr(selector_module.requests, 'get', get)
+    selector = selector_module.SelectorV1.__new__(selector_module.SelectorV1)
+    assert selector._fetch_remote_codes('SELECT code FROM t', '127.0.0.1') == expected
+    assert selector._fetch_remote_codes('SELECT code FROM t', '127.0.0.1') == expected
+    assert len(requests_made) == (1 if cached else 2)
+
+
+def test_extract_data_splits_local_frame(tmp_path):
+    DBMgr.open(str(tmp_path / 'warehouse.duckdb'))
+    try:
+        path = tmp_path / 'daily.parquet'
+        pd.DataFrame({'code': ['000001', '600000', '000001'],
+                      'date': ['2024-01-02', '2024-01-02', '2024-01-03'],
+                      'close': [1.0, 2.0, 1.5]}).to_parquet(path)
+        DBMgr.import_parquet('daily', str(path))
+        data = ExtractDataV1('2024-01-01', data=['600000', '000001', '000002'], table_name='daily',
+                             end_date='2024-01-31').get_data()
+    finally:
+        DBMgr.open(None)
+        DBMgr.close()
+    assert list(data) == ['600000', '000001']
+    assert data['000001']['close'].tolist() == [1.0, 1.5]
+    assert data['600000']['close'].tolist() == [2.0]
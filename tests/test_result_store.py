@@ -0,0 +1,79 @@
+import datetime
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'docker', 'app'))
+
+from result_store import ResultStore, load_results  # noqa: E402
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def get(self, key):
+        return self.data.get(key)
+
+
+def save_all(store):
+    frame = pd.DataFrame({'date': pd.to_datetime(['2024-01-02', '2024-01-03']), 'value': [1.0, 1.5]})
+    store.save_result('frame', frame)
+    store.save_result('series', pd.Series([1, 2, 3], name='close'))
+    store.save_result('array', np.arange(4, dtype=np.float64))
+    store.save_result('trades', [{'code': '000001', 'amount': 100}, {'code': '600000', 'amount': -100}])
+    store.save_result('results', {'final_value': 1.25, 'positions': {'000001': 100},
+                                  'dates': [datetime.date(2024, 1, 2)]})
+    store.save_result('note', 'done')
+    return frame
+
+
+def check_loaded(loaded, frame):
+    pd.testing.assert_frame_equal(loaded['frame'], frame)
+    pd.testing.assert_series_equal(loaded['series'], pd.Series([1, 2, 3], name='close'))
+    np.testing.assert_array_equal(loaded['array'], np.arange(4, dtype=np.float64))
+    assert loaded['trades'] == [{'code': '000001', 'amount': 100}, {'code': '600000', 'amount': -100}]
+    # 字典按最外层拆分，标量直接放在清单中
+    assert loaded['results.final_value'] == 1.25
+    assert loaded['results.positions'] == {'000001': 100}
+    assert loaded['results.dates'] == ['2024-01-02']
+    assert loaded['note'] == 'done'
+
+
+def test_round_trip_file_backend(tmp_path):
+    store = ResultStore('task/1', backend='file', store_dir=str(tmp_path))
+    frame = save_all(store)
+    manifest = store.finalize()
+
+    assert manifest['backend'] == 'file'
+    artifacts = manifest['artifacts']
+    assert artifacts['frame']['format'] == 'arrow' and artifacts['frame']['rows'] == 2
+    assert artifacts['results.positions']['format'] == 'msgpack'
+    assert artifacts['note'] == {'format': 'inline', 'value': 'done'}
+    check_loaded(load_results(manifest), frame)
+    assert load_results(manifest, names=['note']) == {'note': 'done'}
+
+
+def test_round_trip_redis_backend(tmp_path):
+    redis = FakeRedis()
+    store = ResultStore('task-2', backend='redis', store_dir=str(tmp_path))
+    frame = save_all(store)
+    manifest = store.finalize(redis=redis)
+
+    assert manifest['backend'] == 'redis'
+    assert not os.path.exists(store.directory)
+    check_loaded(load_results(manifest, redis=redis), frame)
+    with pytest.raises(ValueError):
+        load_results(manifest, names=['frame'])
+
+
+def test_finalize_without_results(tmp_path):
+    store = ResultStore('task-3', backend='file', store_dir=str(tmp_path))
+    assert store.finalize() is None
+    assert not os.path.exists(store.directory)
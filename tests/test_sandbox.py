@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'docker', 'app'))
+
+import sandbox  # noqa: E402
+
+
+def alive(pid):
+    """进程是否仍在运行（僵尸进程视为已结束）"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def run(code, **kwargs):
+    kwargs.setdefault('memory_limit_mb', 0)
+    kwargs.setdefault('cpu_seconds', 0)
+    return sandbox.run(code, **kwargs)
+
+
+def test_output_and_returncode():
+    result = run("import sys\nprint('hello')\nprint('oops', file=sys.stderr)\nraise SystemExit(3)")
+    assert result['returncode'] == 3
+    assert result['stdout'] == 'hello\n'
+    assert result['stderr'] == 'oops\n'
+
+
+def test_timeout_kills_child():
+    start = time.monotonic()
+    result = run("import time\nprint('started', flush=True)\ntime.sleep(60)", timeout=1)
+    assert time.monotonic() - start < 10
+    assert result['returncode'] == 1
+    assert result['stdout'] == 'started\n'
+    assert '执行超时' in result['stderr']
+
+
+@pytest.mark.parametrize('spawn', [
+    "import subprocess\np = subprocess.Popen(['sleep', '60'])\nprint(p.pid)",
+    "import os, time\npid = os.fork()\nif pid == 0:\n    time.sleep(60)\n    os._exit(0)\nprint(pid)",
+])
+def test_grandchildren_do_not_block_or_leak(spawn):
+    # 孙进程继承了输出管道，子进程退出后不应等待它关闭管道
+    start = time.monotonic()
+    result = run(spawn, timeout=30)
+    assert time.monotonic() - start < 10
+    assert result['returncode'] == 0
+    pid = int(result['stdout'])
+    deadline = time.monotonic() + 5
+    while alive(pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not alive(pid)
+
+
+def test_grandchildren_killed_on_timeout():
+    code = "import subprocess, time\np = subprocess.Popen(['sleep', '60'])\nprint(p.pid, flush=True)\ntime.sleep(60)"
+    result = run(code, timeout=1)
+    assert '执行超时' in result['stderr']
+    pid = int(result['stdout'])
+    deadline = time.monotonic() + 5
+    while alive(pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not alive(pid)
+
+
+def test_on_idle_called_while_child_is_silent():
+    outputs = []
+    idle = []
+    run("import time\nprint('start', flush=True)\ntime.sleep(0.5)\nprint('end')",
+        on_output=lambda stream, text: outputs.append(text), on_idle=lambda: idle.append(len(outputs)))
+    # 子进程等待期间已经收到第一段输出，且多次调用on_idle
+    assert sum(1 for count in idle if count == 1) >= 2
+    assert ''.join(outputs) == 'start\nend\n'
@@ -0,0 +1,115 @@
+import ibis
+import numpy as np
+import pandas as pd
+import pytest
+
+from m.db.sql_builder import SQLQueryBuilder, _normalize_keywords
+
+
+@pytest.fixture
+def builder():
+    df = pd.DataFrame({
+        'code': ['a', 'a', 'b', 'b'],
+        'date': pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-01', '2020-01-02']),
+        'pe': [1.0, 3.0, 2.0, 4.0],
+        'pb': [0.5, 1.5, 2.5, 0.8],
+    })
+    return SQLQueryBuilder(ibis.memtable(df))
+
+
+def filtered(builder, condition):
+    return sorted(builder.filter(condition).execute()['pe'].tolist())
+
+
+@pytest.mark.parametrize('condition, expected', [
+    ('NOT (pe > 1.5)', [1.0]),
+    ('NOT(pe > 1.5)', [1.0]),
+    ('pe > 3.5 OR NOT (pe > 1.5)', [1.0, 4.0]),
+    ('pe > 3.5 or not pe > 1.5', [1.0, 4.0]),
+    ('NOT pe > 1.5 AND pb < 1', [1.0]),
+])
+def test_not(builder, condition, expected):
+    assert filtered(builder, condition) == expected
+
+
+@pytest.mark.parametrize('condition, expected', [
+    # AND 优先于 OR
+    ('pe > 3.5 OR pe > 1.5 AND pb > 2', [2.0, 4.0]),
+    ('(pe > 3.5 OR pe > 1.5) AND pb > 2', [2.0]),
+    ('pe > 0 and pb < 1', [1.0, 4.0]),
+    ('pe > 0 AND (pb < 1)', [1.0, 4.0]),
+    ('1.5 < pe < 3.5', [2.0, 3.0]),
+    # 函数形式
+    ('AND(pe > 1.5, pb > 1)', [2.0, 3.0]),
+    ('OR(pe < 1.5, pb < 1)', [1.0, 4.0]),
+])
+def test_and_or_precedence(builder, condition, expected):
+    assert filtered(builder, condition) == expected
+
+
+def test_keyword_calls_and_operators():
+    assert _normalize_keywords('AND(a, b)').split() == ['AND(a,', 'b)']
+    assert 'and' in _normalize_keywords('a AND (b)').split()
+    assert _normalize_keywords('NOT (a)').split()[0] == 'not'
+
+
+def test_mutate_alias(builder):
+    result = builder.mutate('pe * 2 AS pe2').execute()
+    assert result['pe2'].tolist() == (result['pe'] * 2).tolist()
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(0)
+    frames = []
+    for code, size in [('a', 3), ('b', 40), ('c', 1200)]:
+        frames.append(pd.DataFrame({
+            'code': code,
+            'date': pd.bdate_range('2015-01-01', periods=size),
+            'close': 10 + rng.standard_normal(size).cumsum(),
+        }))
+    # 打乱行顺序，结果不依赖输入顺序
+    return pd.concat(frames).sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def expected_ema(prices, func):
+    ordered = prices.sort_values(['code', 'date'])
+    return ordered.assign(expected=ordered.groupby('code')['close'].transform(func))
+
+
+def ewm(series, span):
+    return series.ewm(span=span, adjust=False).mean()
+
+
+def macd(series, part):
+    dif = ewm(series, 12) - ewm(series, 26)
+    dea = ewm(dif, 9)
+    return {'dif': dif, 'dea': dea, 'hist': dif - dea}[part]
+
+
+@pytest.mark.parametrize('expression, func', [
+    ('m_ema(close, 5)', lambda s: ewm(s, 5)),
+    ('m_ema(close, 26)', lambda s: ewm(s, 26)),
+    ('m_ema(close, 1)', lambda s: s),
+    ('m_ta_macd_dif(close)', lambda s: macd(s, 'dif')),
+    ('m_ta_macd_dea(close)', lambda s: macd(s, 'dea')),
+    ('m_ta_macd(close)', lambda s: macd(s, 'hist')),
+])
+def test_ema_matches_pandas(prices, expression, func):
+    result = SQLQueryBuilder(ibis.memtable(prices)).mutate(f"{expression} AS value").execute()
+    assert list(result.columns) == ['code', 'date', 'close', 'value']
+    merged = expected_ema(prices, func).merge(result, on=['code', 'date'])
+    assert len(merged) == len(prices)
+    assert merged['value'].notna().all()
+    np.testing.assert_allclose(merged['value'], merged['expected'], rtol=1e-9, atol=1e-9)
+
+
+def test_ema_in_filter_and_select(prices):
+    builder = SQLQueryBuilder(ibis.memtable(prices))
+    expected = expected_ema(prices, lambda s: ewm(s, 5))
+    kept = builder.filter('close > m_ema(close, 5)').execute()
+    assert sorted(map(tuple, kept[['code', 'date']].values.tolist())) == \
+        sorted(map(tuple, expected.loc[expected['close'] > expected['expected'], ['code', 'date']].values.tolist()))
+
+    selected = builder.select('code', 'date', 'm_ema(close, 5) AS ema5').execute()
+    assert len(selected.columns) == 3 and '_m_pos' not in selected.columns
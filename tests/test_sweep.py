@@ -0,0 +1,43 @@
+import json
+import math
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'docker', 'app'))
+
+from sweep import aggregate, expand_grid, plan_routes, split_chunks  # noqa: E402
+
+
+def test_expand_and_split():
+    combos = expand_grid({'fast': [5, 10], 'slow': [20, 30, 60]})
+    assert len(combos) == 6
+    assert combos[1] == (1, {'fast': 5, 'slow': 30})
+    chunks = split_chunks(combos, 4)
+    assert [len(chunk) for chunk in chunks] == [4, 2]
+    assert plan_routes(5, ['w1', 'w2']) == ['w1', 'w2', None, 'w1', 'w2']
+
+
+def test_aggregate_ranks_and_summarizes():
+    rows = [
+        {'index': 2, 'params': {'fast': 10, 'slow': 20}, 'sharpe': 1.5},
+        {'index': 0, 'params': {'fast': 5, 'slow': 20}, 'sharpe': 0.5},
+        {'index': 1, 'params': {'fast': 5, 'slow': 30}, 'sharpe': float('nan')},
+        {'index': 3, 'params': {'fast': 10, 'slow': 30}, 'error': 'ValueError: boom'},
+    ]
+    summary = aggregate(rows, metric='sharpe', top=2)
+    assert summary['count'] == 4 and summary['failed'] == 1
+    assert [row['index'] for row in summary['top']] == [2, 0]
+    assert summary['best']['index'] == 2
+    assert summary['metric_stats'] == {'mean': 1.0, 'std': 0.5, 'min': 0.5, 'max': 1.5, 'count': 2}
+    assert summary['by_param']['fast']['10'] == {'count': 1, 'mean': 1.5, 'max': 1.5}
+    # 指标为NaN的组合不计入平均值
+    assert summary['by_param']['slow']['30'] == {'count': 0, 'mean': None, 'max': None}
+    assert summary['errors'] == [{'index': 3, 'params': {'fast': 10, 'slow': 30}, 'error': 'ValueError: boom'}]
+    # NaN已转换为None，结果可以直接JSON序列化
+    json.loads(json.dumps(summary, allow_nan=False))
+
+
+def test_aggregate_all_failed():
+    summary = aggregate([{'index': 0, 'params': {}, 'error': 'x'}])
+    assert summary['best'] is None and summary['failed'] == 1
+    assert not any(isinstance(value, float) and math.isnan(value) for value in summary.values())
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from m.trader.trader_v2 import TraderV2
+
+
+def noop(*args):
+    pass
+
+
+def make_ticks(start_price):
+    times = pd.date_range('2024-01-02 09:30', periods=5, freq='min').append(
+        pd.date_range('2024-01-03 09:30', periods=5, freq='min'))
+    close = start_price + np.arange(len(times), dtype=float)
+    return pd.DataFrame({'datetime': times, 'open': close, 'high': close + 0.5, 'low': close - 0.5,
+                         'close': close, 'volume': 1e6})
+
+
+def run(handle_tick):
+    trader = TraderV2(
+        data={'000001.SZ': make_ticks(20.0), '600000.SH': make_ticks(50.0)},
+        start_date='2024-01-02', end_date='2024-01-03',
+        initialize=noop, before_trading_start=noop, handle_data=noop, handle_tick=handle_tick,
+        handle_trade=noop, handle_order=noop, after_trading=noop,
+        frequency='tick', benchmark=None, plot_charts=False)
+    trader.context['trader'] = trader
+    trader.run()
+    return trader
+
+
+def test_limit_order_fills_on_later_tick():
+    seen = []
+
+    def handle_tick(context, tick):
+        seen.append((tick.code, context['current_timestamp']))
+        if tick.code == '000001.SZ' and len(seen) == 1:
+            # 限价单从该股票的下一条记录开始撮合
+            context['trader'].place_order(tick.code, 100, style='limit', limit_price=22.0)
+
+    trader = run(handle_tick)
+    # 事件按时间顺序交错回放，时间戳为int64
+    assert [ts for _, ts in seen] == sorted(ts for _, ts in seen)
+    assert all(isinstance(ts, int) for _, ts in seen)
+
+    trades = trader.order.get_trade_history()
+    buys = [trade for trade in trades if trade['direction'] == 'buy']
+    assert len(buys) == 1 and buys[0]['price'] <= 22.0
+
+    # 资金曲线按交易日记录，估值使用最新Tick价格而不是默认价格
+    assert len(trader.equity_values) == 2
+    assert trader._get_current_price('600000.SH', 'close') == 59.0
+    assert trader.array_managers['600000.SH'].count == 10
+    assert trader.get_results()['analytics'] is not None
@@ -0,0 +1,35 @@
+import inspect
+
+import m.trader
+from m.trader import TraderV1, TraderV2
+
+# 公开接口原有的参数顺序，新参数只能追加在后面，避免按位置传参的调用出错
+V1_PARAMS = ['data', 'start_date', 'end_date', 'initialize', 'before_trading_start', 'handle_tick',
+             'handle_data', 'handle_trade', 'handle_order', 'after_trading', 'capital_base', 'frequency',
+             'product_type', 'before_start_days', 'volume_limit', 'order_price_field_buy',
+             'order_price_field_sell', 'benchmark', 'plot_charts', 'disable_cache', 'debug',
+             'backtest_only', 'm_cached', 'm_name']
+V2_PARAMS = ['data', 'initialize', 'before_trading_start', 'handle_data', 'handle_tick', 'handle_trade',
+             'handle_order', 'after_trading', 'start_date', 'end_date', 'after_backtest', 'capital_base',
+             'frequency', 'volume_limit', 'order_price_field_buy', 'order_price_field_sell', 'benchmark',
+             'plot_charts', 'disable_cache', 'debug', 'backtest_only', 'm_cached', 'm_name']
+TRADER_V2_PARAMS = ['self', 'data', 'start_date', 'end_date', 'initialize', 'before_trading_start',
+                    'handle_data', 'handle_tick', 'handle_trade', 'handle_order', 'after_trading',
+                    'after_backtest', 'capital_base', 'frequency', 'volume_limit', 'order_price_field_buy',
+                    'order_price_field_sell', 'benchmark', 'plot_charts', 'disable_cache', 'debug',
+                    'backtest_only', 'm_cached', 'm_name']
+
+
+def params(func):
+    return list(inspect.signature(func).parameters)
+
+
+def test_positional_parameters_unchanged():
+    assert params(m.trader.v1)[:len(V1_PARAMS)] == V1_PARAMS
+    assert params(TraderV1.__init__)[1:len(V1_PARAMS) + 1] == V1_PARAMS
+    assert params(m.trader.v2)[:len(V2_PARAMS)] == V2_PARAMS
+    assert params(TraderV2.__init__)[:len(TRADER_V2_PARAMS)] == TRADER_V2_PARAMS
+
+
+def test_v2_forwards_all_parameters():
+    assert set(params(m.trader.v2)) == set(params(TraderV2.__init__)) - {'self'}
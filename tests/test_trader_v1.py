@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from m.trader.trader_v1 import TraderV1
+
+
+def noop(*args):
+    pass
+
+
+def make_daily(start_price, days=10):
+    dates = pd.bdate_range('2024-01-02', periods=days)
+    close = start_price + np.arange(days, dtype=float)
+    return pd.DataFrame({'date': dates, 'open': close, 'high': close + 0.5, 'low': close - 0.5,
+                         'close': close, 'volume': 1e6})
+
+
+def test_capital_split_between_symbols():
+    cash = set()
+
+    def handle_data(context, data):
+        cash.add(context['portfolio']['cash'])
+
+    trader = TraderV1({'000001.SZ': make_daily(10.0), '600000.SH': make_daily(20.0)},
+                      '2024-01-02', '2024-01-15', noop, noop, noop, handle_data, noop, noop, noop,
+                      capital_base=1e6, benchmark=None, plot_charts=False, max_workers=1)
+    trader.run()
+    # 每只股票的回测引擎只分到一半资金，没有成交时组合资金不变
+    assert cash == {5e5}
+    assert trader.get_results()['final_value'] == 1e6
+
+
+def make_trader(handle_data=noop, **kwargs):
+    data = {'000001.SZ': make_daily(10.0), '600000.SH': make_daily(20.0)}
+    kwargs.setdefault('max_workers', 1)
+    return TraderV1(data, '2024-01-02', '2024-01-15', noop, noop, noop, handle_data, noop, noop, noop,
+                    capital_base=1e6, benchmark=None, plot_charts=False, **kwargs)
+
+
+def test_handle_data_receives_bar_list():
+    received = []
+    make_trader(lambda context, data: received.append(data)).run()
+    assert len(received) == 20
+    assert all(isinstance(data, list) and len(data) == 1 for data in received)
+    assert {data[0].symbol for data in received} == {'000001', '600000'}
+
+
+def test_bars_cached_per_stock():
+    trader = make_trader()
+    bars = trader._get_bars('000001.SZ')
+    assert trader._get_bars('000001.SZ') is bars
+    # 数据替换后重新转换
+    trader.stock_data['000001.SZ'] = make_daily(11.0)
+    assert trader._get_bars('000001.SZ') is not bars
+
+
+def test_bars_converted_before_fork():
+    trader = make_trader(max_workers=2)
+    trader.run()
+    assert set(trader.bar_cache) == {'000001.SZ', '600000.SH'}
+    assert trader.get_results()['final_value'] == 1e6
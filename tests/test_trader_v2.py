@@ -0,0 +1,132 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from m.core.slippage import FixedSlippage
+from m.trader.trader_v2 import TraderV2
+
+
+def noop(*args):
+    pass
+
+
+def make_daily(start_price, days=6):
+    dates = pd.bdate_range('2024-01-02', periods=days)
+    close = start_price + np.arange(days, dtype=float)
+    return pd.DataFrame({'date': dates, 'open': close, 'high': close + 0.5, 'low': close - 0.5,
+                         'close': close, 'volume': 1e6})
+
+
+def make_trader(handle_data, **kwargs):
+    kwargs.setdefault('slippage_model', FixedSlippage(0.0))
+    trader = TraderV2(
+        data={'000001.SZ': make_daily(20.0), '600000.SH': make_daily(50.0)},
+        start_date='2024-01-02', end_date='2024-01-09',
+        initialize=noop, before_trading_start=noop, handle_data=handle_data, handle_tick=noop,
+        handle_trade=noop, handle_order=noop, after_trading=noop,
+        benchmark=None, plot_charts=False, **kwargs)
+    return trader
+
+
+def test_orders_in_handle_data_filled_together():
+    def handle_data(context, data):
+        if len(context['trader'].orders) == 0:
+            for code in sorted(data):
+                context['trader'].place_order(code, 100)
+
+    trader = make_trader(handle_data)
+    trader.context['trader'] = trader
+    trader.run()
+    first, second = trader.orders
+    # 订单记录在handle_data返回后按批量撮合的结果更新
+    assert first['status'] == second['status'] == 'filled'
+    assert (first['filled_price'], first['filled_amount']) == (20.0, 100)
+    assert (second['filled_price'], second['filled_amount']) == (50.0, 100)
+
+
+class Crash(Exception):
+    pass
+
+
+def trading_strategy(crash_at=None):
+    def handle_data(context, data):
+        day = context['day'] = context.get('day', 0) + 1
+        if day == crash_at:
+            raise Crash()
+        for code in sorted(data):
+            context['order'].order(code, 100 if day % 2 else -100, timestamp=context['current_datetime'])
+
+    return handle_data
+
+
+def test_resume_from_checkpoint_matches_full_run(tmp_path):
+    expected = make_trader(trading_strategy())
+    expected.run()
+
+    path = str(tmp_path / 'run.npz')
+    crashed = make_trader(trading_strategy(crash_at=5), checkpoint_path=path, checkpoint_interval=2)
+    with pytest.raises(Crash):
+        crashed.run()
+
+    # 从第4个交易日结束时的检查点继续
+    resumed = make_trader(trading_strategy(), checkpoint_path=path, resume=True)
+    resumed.run()
+    assert resumed.context['day'] == expected.context['day'] == 6
+    trades = expected.order.get_trade_history()
+    assert len(trades) == 12
+    assert resumed.order.get_trade_history() == trades
+    assert resumed.equity_values == expected.equity_values
+
+
+def test_unpicklable_context_skips_checkpoint(tmp_path, capsys):
+    def handle_data(context, data):
+        context['lock'] = threading.Lock()
+
+    path = tmp_path / 'run.npz'
+    trader = make_trader(handle_data, checkpoint_path=str(path), checkpoint_interval=2)
+    trader.run()
+    assert not path.exists()
+    assert '[WARNING] 保存检查点失败' in capsys.readouterr().out
+
+
+def test_handle_data_called_only_on_triggered_bars():
+    calls = []
+
+    def handle_data(context, data):
+        calls.append((context['current_datetime'], sorted(data)))
+
+    a, b = make_daily(20.0), make_daily(50.0)
+    a['signal'] = [0, 1, 0, 0, np.nan, 1]
+    b['signal'] = [0, 0, 0, 1, 0, 1]
+    trader = TraderV2(
+        data={'000001.SZ': a, '600000.SH': b},
+        start_date='2024-01-02', end_date='2024-01-09',
+        initialize=noop, before_trading_start=noop, handle_data=handle_data, handle_tick=noop,
+        handle_trade=noop, handle_order=noop, after_trading=noop,
+        benchmark=None, plot_charts=False, slippage_model=FixedSlippage(0.0), triggers='signal')
+    trader.run()
+    dates = pd.bdate_range('2024-01-02', periods=6)
+    assert [(pd.Timestamp(when).normalize(), codes) for when, codes in calls] == [
+        (dates[1], ['000001.SZ']),
+        (dates[3], ['600000.SH']),
+        (dates[5], ['000001.SZ', '600000.SH']),
+    ]
+
+
+def test_liquidation_ignores_volume_limit(capsys):
+    def handle_data(context, data):
+        day = context['day'] = context.get('day', 0) + 1
+        if day == 3:
+            context['order'].order('000001.SZ', 5000, timestamp=context['current_datetime'])
+
+    trader = make_trader(handle_data, volume_limit=0.001)
+    trader.run()
+    # 每根K线最多成交1000股，回测结束时买单还有剩余；平仓不受成交量限制，挂单全部撤销
+    assert trader.order.positions == {}
+    assert trader.order.get_open_orders() == []
+    sold = [trade for trade in trader.order.get_trade_history() if trade['direction'] == 'sell']
+    assert sum(trade['volume'] for trade in sold) == 4000
+    assert trader.get_results()['final_value'] == pytest.approx(trader.order.current_capital)
+    assert '未能平仓' not in capsys.readouterr().out
@@ -0,0 +1,54 @@
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from m.db.udf import TS_FUNCTIONS
+
+
+@pytest.fixture(scope='module')
+def con():
+    con = duckdb.connect()
+    for name, func in TS_FUNCTIONS.items():
+        con.create_function(name, func, parameters=['DOUBLE[]', 'INTEGER'], return_type='DOUBLE[]', type='arrow')
+    rng = np.random.default_rng(1)
+    frames = []
+    for code, size in [('a', 2), ('b', 30), ('c', 300)]:
+        close = 10 + rng.standard_normal(size).cumsum()
+        if size > 20:
+            close[[5, 17]] = np.nan
+        frames.append(pd.DataFrame({'code': code, 'date': pd.bdate_range('2020-01-01', periods=size),
+                                    'close': close}))
+    daily = pd.concat(frames).sample(frac=1, random_state=1).reset_index(drop=True)
+    con.register('daily', daily)
+    return con, daily
+
+
+def query(con, name, n):
+    return con.sql(f"""
+        SELECT code, UNNEST(dates) AS date, UNNEST({name}(closes, {n})) AS value
+        FROM (
+            SELECT code, list(date ORDER BY date) AS dates, list(close ORDER BY date) AS closes
+            FROM daily GROUP BY code
+        )
+    """).df()
+
+
+@pytest.mark.parametrize('name, func', [
+    ('ts_sum', lambda s, n: s.rolling(n).sum()),
+    ('ts_mean', lambda s, n: s.rolling(n).mean()),
+    ('ts_std', lambda s, n: s.rolling(n).std()),
+    ('ts_max', lambda s, n: s.rolling(n).max()),
+    ('ts_min', lambda s, n: s.rolling(n).min()),
+    ('ts_delay', lambda s, n: s.shift(n)),
+    ('ts_delta', lambda s, n: s - s.shift(n)),
+])
+@pytest.mark.parametrize('n', [1, 3, 20])
+def test_matches_pandas(con, name, func, n):
+    con, daily = con
+    ordered = daily.sort_values(['code', 'date'])
+    expected = ordered.assign(expected=ordered.groupby('code')['close'].transform(lambda s: func(s, n)))
+    merged = expected.merge(query(con, name, n), on=['code', 'date'])
+    assert len(merged) == len(ordered)
+    np.testing.assert_array_equal(merged['value'].isna(), merged['expected'].isna())
+    np.testing.assert_allclose(merged['value'].dropna(), merged['expected'].dropna(), rtol=1e-9, atol=1e-9)